@@ -0,0 +1,60 @@
+"""
+Benchmark the vectorized RFM aggregation against the per-group lambda it replaced.
+
+Run with: python -m benchmarks.bench_aggregation [n_rows] [n_customers]
+"""
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.data_preparation import prepare_data_for_modeling
+
+def legacy_prepare_data_for_modeling(df):
+    """
+    The original groupby/lambda implementation, kept for comparison.
+    """
+    last_date = df['InvoiceDate'].max()
+    summary = df.groupby('CustomerID').agg({
+        'InvoiceDate': lambda x: (last_date - x.max()).days,
+        'InvoiceNo': 'count',
+        'TotalAmount': 'sum'
+    })
+    summary.columns = ['recency', 'frequency', 'monetary']
+    summary['T'] = (last_date - df.groupby('CustomerID')['InvoiceDate'].min()).dt.days
+    summary = summary[summary['frequency'] > 1]
+    summary['monetary'] = np.log1p(summary['monetary'])
+    return summary
+
+def make_cleaned_transactions(n_rows, n_customers, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'CustomerID': rng.integers(0, n_customers, n_rows),
+        'InvoiceDate': pd.Timestamp('2010-12-01') + pd.to_timedelta(rng.integers(0, 373 * 86400, n_rows), unit='s'),
+        'InvoiceNo': rng.integers(500000, 600000, n_rows).astype(str),
+        'TotalAmount': np.round(rng.lognormal(2.5, 1.0, n_rows), 2),
+    })
+
+def best_of(func, *args, repeat=3):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+def main(n_rows=1_000_000, n_customers=100_000):
+    df = make_cleaned_transactions(n_rows, n_customers)
+    pd.testing.assert_frame_equal(
+        prepare_data_for_modeling(df), legacy_prepare_data_for_modeling(df), check_exact=False
+    )
+    legacy = best_of(legacy_prepare_data_for_modeling, df)
+    vectorized = best_of(prepare_data_for_modeling, df)
+    print(f"rows={n_rows} customers={n_customers}")
+    print(f"legacy groupby/lambda: {legacy:.3f}s")
+    print(f"vectorized segments:   {vectorized:.3f}s")
+    print(f"speedup:               {legacy / vectorized:.1f}x")
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:3]])
@@ -0,0 +1,51 @@
+"""
+Measure CLV lookup throughput and latency through the Flask API.
+
+Run with: python -m benchmarks.bench_serving [n_customers] [n_requests]
+"""
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+from flask import Flask
+from lifetimes import BetaGeoFitter, GammaGammaFitter
+
+from src.serving import CLVService, register_routes
+
+def main(n_customers=100_000, n_requests=20_000):
+    rng = np.random.default_rng(0)
+    result_df = pd.DataFrame({
+        'frequency': rng.integers(1, 20, n_customers).astype(float),
+        'recency': rng.integers(0, 300, n_customers).astype(float),
+        'T': np.full(n_customers, 373.0),
+        'monetary_value': rng.uniform(5, 500, n_customers),
+        'CLV': rng.lognormal(5, 1, n_customers),
+    }, index=pd.Index(np.arange(10_000, 10_000 + n_customers), name='CustomerID'))
+    bgf = BetaGeoFitter()
+    bgf.params_ = pd.Series({'r': 0.8, 'alpha': 60.0, 'a': 0.1, 'b': 1.5})
+    bgf.predict = bgf.conditional_expected_number_of_purchases_up_to_time
+    ggf = GammaGammaFitter()
+    ggf.params_ = pd.Series({'p': 3.0, 'q': 4.0, 'v': 40.0})
+
+    service = CLVService(result_df, bgf, ggf, 'bench')
+    server = Flask(__name__)
+    register_routes(server, lambda: service)
+    client = server.test_client()
+
+    ids = rng.choice(result_df.index.to_numpy(), n_requests)
+    start = time.perf_counter()
+    for customer_id in ids:
+        client.get(f'/api/clv/customers/{customer_id}')
+    elapsed = time.perf_counter() - start
+
+    print(f"lookups through the test client: {n_requests / elapsed:,.0f}/s")
+    print(f"handler latency: {service.latency['lookup'].summary()}")
+
+    start = time.perf_counter()
+    for customer_id in ids:
+        service.lookup(customer_id)
+    print(f"index lookups alone: {n_requests / (time.perf_counter() - start):,.0f}/s")
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:3]])
@@ -0,0 +1,52 @@
+"""
+Compare peak memory of load + clean with and without low_memory.
+
+Each mode runs in a fresh interpreter that imports only data_preparation, so
+the growth of its peak RSS is the cost of loading and cleaning. tracemalloc
+is not used here because it does not see the string objects pyarrow creates
+for the default path.
+
+Run one mode with: python -m benchmarks.low_memory DATA_PATH CACHE_DIR [--low-memory]
+"""
+import argparse
+import json
+import subprocess
+import sys
+import time
+
+from src.instrumentation import peak_rss_mb
+
+def measure_load_clean(data_path, cache_dir, low_memory):
+    from src.data_preparation import clean_data, load_data, memory_mb
+
+    base = peak_rss_mb()
+    start = time.perf_counter()
+    df = clean_data(load_data(data_path, cache_dir=cache_dir, low_memory=low_memory), low_memory=low_memory)
+    return {'seconds': time.perf_counter() - start, 'peak_rss_mb': peak_rss_mb() - base,
+            'frame_mb': memory_mb(df), 'rows_out': len(df)}
+
+def compare_low_memory(data_path, cache_dir):
+    """
+    Run load + clean in both modes; return one benchmark record per mode.
+    """
+    records = []
+    for low_memory in (False, True):
+        command = [sys.executable, '-m', 'benchmarks.low_memory', data_path, cache_dir]
+        if low_memory:
+            command.append('--low-memory')
+        output = subprocess.run(command, capture_output=True, text=True, check=True).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        records.append(dict(result, stage='load_clean_low_memory' if low_memory else 'load_clean', peak_mb=None,
+                            rows_in=None, status='ok'))
+    return records
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('data_path')
+    parser.add_argument('cache_dir')
+    parser.add_argument('--low-memory', action='store_true')
+    args = parser.parse_args(argv)
+    print(json.dumps(measure_load_clean(args.data_path, args.cache_dir, args.low_memory)))
+
+if __name__ == "__main__":
+    main()
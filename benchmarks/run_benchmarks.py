@@ -0,0 +1,165 @@
+"""
+Time and memory-profile every pipeline stage on synthetic Online Retail data.
+
+Run with: python -m benchmarks.run_benchmarks [--rows 10000 100000 ...] [--history PATH]
+
+Each run appends one JSON line per (size, stage) to the history file, and
+stages that got slower than the previous run at the same size by more than
+--threshold are reported as regressions (with a non-zero exit status when
+--fail-on-regression is set).
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+from src.cltv_calculation import calculate_cltv
+from benchmarks.low_memory import compare_low_memory
+from src.data_preparation import calculate_rfm_scores, clean_data, load_data, prepare_data_for_modeling
+from src.figure_cache import OverviewFigures
+from src.model_fitting import fit_bg_nbd_model, fit_gamma_gamma_model
+from src.synthetic import write_transactions
+
+DEFAULT_HISTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'history.jsonl')
+
+def measure(func, *args, trace_memory=True, **kwargs):
+    """
+    Run func once and return (result, seconds, peak traced MB).
+    """
+    if trace_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    seconds = time.perf_counter() - start
+    peak_mb = None
+    if trace_memory:
+        peak_mb = tracemalloc.get_traced_memory()[1] / 2**20
+        tracemalloc.stop()
+    return result, seconds, peak_mb
+
+def overview_figures(result_df, n_customers=20):
+    # What the dashboard's update_graphs callback does per model version: build the memoized figures, then
+    # serve one slider value. The Dash callback itself is not run, as importing the app fits on the real data.
+    overview = OverviewFigures(result_df, 'bench', size_column='monetary')
+    return overview.figures(n_customers)
+
+def run_pipeline(n_rows, workdir, seed=0, frequency='days', compressed=True, trace_memory=True):
+    """
+    Run every stage once on n_rows synthetic transactions; return one record per stage.
+    """
+    data_path = os.path.join(workdir, f"transactions_{n_rows}_{seed}.csv")
+    if not os.path.exists(data_path):
+        write_transactions(data_path, n_rows, seed=seed)
+    cache_dir = os.path.join(workdir, 'cache')
+    shutil.rmtree(cache_dir, ignore_errors=True)
+
+    records = []
+
+    def stage(name, func, *args, rows_in=None, **kwargs):
+        result, seconds, peak_mb = measure(func, *args, trace_memory=trace_memory, **kwargs)
+        rows_out = len(result) if hasattr(result, '__len__') and not isinstance(result, tuple) else None
+        records.append({'stage': name, 'seconds': seconds, 'peak_mb': peak_mb, 'rows_in': rows_in,
+                        'rows_out': rows_out, 'status': 'ok' if result is not None else 'failed'})
+        return result
+
+    stage('load_data_cold', load_data, data_path, cache_dir=cache_dir)
+    df = stage('load_data', load_data, data_path, cache_dir=cache_dir)
+    df_clean = stage('clean_data', clean_data, df, rows_in=len(df))
+    records.extend(compare_low_memory(data_path, cache_dir))
+    summary_data = stage('prepare_data_for_modeling', prepare_data_for_modeling, df_clean, frequency=frequency,
+                         rows_in=len(df_clean))
+    stage('calculate_rfm_scores', calculate_rfm_scores, summary_data, rows_in=len(summary_data))
+    bgf = stage('fit_bg_nbd_model', fit_bg_nbd_model, summary_data, compressed=compressed,
+                rows_in=len(summary_data))
+    ggf = stage('fit_gamma_gamma_model', fit_gamma_gamma_model, summary_data, compressed=compressed,
+                rows_in=len(summary_data))
+    if bgf is not None and ggf is not None:
+        cltv_df = stage('calculate_cltv', calculate_cltv, bgf, ggf, summary_data, rows_in=len(summary_data))
+        result_df = summary_data.join(cltv_df.set_index('CustomerID')['CLV'])
+        stage('overview_figures', overview_figures, result_df, rows_in=len(result_df))
+    return records
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def _previous_seconds(history_path):
+    # Latest recorded time per (n_rows, stage)
+    previous = {}
+    if os.path.exists(history_path):
+        with open(history_path) as f:
+            for line in f:
+                record = json.loads(line)
+                if record.get('status') == 'ok':
+                    previous[(record['n_rows'], record['stage'])] = record['seconds']
+    return previous
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[10_000, 100_000])
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--frequency', choices=['invoices', 'days'], default='days')
+    parser.add_argument('--lifetimes-fitters', action='store_true', help="fit with lifetimes instead of the compressed fitters")
+    parser.add_argument('--no-memory', action='store_true', help="skip tracemalloc, which slows large runs")
+    parser.add_argument('--workdir', default=None, help="where synthetic data is written (default: a temp dir)")
+    parser.add_argument('--history', default=DEFAULT_HISTORY)
+    parser.add_argument('--threshold', type=float, default=1.5)
+    parser.add_argument('--fail-on-regression', action='store_true')
+    args = parser.parse_args(argv)
+
+    previous = _previous_seconds(args.history)
+    run = {
+        'run_at': datetime.now(timezone.utc).isoformat(),
+        'commit': _git_commit(),
+        'python': platform.python_version(),
+        'frequency': args.frequency,
+        'compressed': not args.lifetimes_fitters,
+    }
+
+    regressions = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        workdir = args.workdir or tmp_dir
+        os.makedirs(workdir, exist_ok=True)
+        with open(args.history, 'a') as history:
+            for n_rows in args.rows:
+                records = run_pipeline(n_rows, workdir, args.seed, args.frequency, not args.lifetimes_fitters,
+                                       trace_memory=not args.no_memory)
+                for record in records:
+                    record = dict(run, n_rows=n_rows, **record)
+                    history.write(json.dumps(record) + '\n')
+
+                    before = previous.get((n_rows, record['stage']))
+                    flag = ''
+                    if before and record['status'] == 'ok' and record['seconds'] > args.threshold * before:
+                        regressions.append(record)
+                        flag = f"  REGRESSION (was {before:.3f}s)"
+                    peak = '' if record['peak_mb'] is None else f"{record['peak_mb']:9.1f} MB"
+                    if record.get('peak_rss_mb') is not None:
+                        peak = f"{record['peak_rss_mb']:9.1f} MB RSS, frame {record['frame_mb']:.1f} MB"
+                    print(f"{n_rows:>11} {record['stage']:<26} {record['status']:<6} "
+                          f"{record['seconds']:9.3f}s {peak}{flag}")
+
+                default, lean = [r for r in records if r['stage'].startswith('load_clean')]
+                saved = default['peak_rss_mb'] - lean['peak_rss_mb']
+                print(f"{n_rows:>11} low_memory saved {saved:.1f} MB of peak RSS "
+                      f"({saved / max(default['peak_rss_mb'], 1e-9):.0%}) on load + clean")
+
+    print("overview_figures times OverviewFigures, which backs the dashboard's update_graphs callback, "
+          "not the Dash callback itself.")
+    print(f"Results appended to {args.history}")
+    if regressions and args.fail_on_regression:
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
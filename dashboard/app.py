@@ -1,3 +1,5 @@
+import os
+import sys
 import dash
 from dash import dcc, html, dash_table
 from dash.dependencies import Input, Output, State
@@ -9,140 +11,246 @@ from lifetimes import BetaGeoFitter, GammaGammaFitter
 from lifetimes.utils import summary_data_from_transaction_data
 import logging
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.data_preparation import load_data
+from src.ingest_cache import source_fingerprint
+from src.model_registry import data_fingerprint, load_artifact, load_latest, save_artifact
+from src.rfm import RFMScorer
+from src.segmentation import segment_labels
+from src.figure_cache import OverviewFigures
+from src.instrumentation import configure_from_env
+from src.matrix_engine import MatrixEngine
+from src.result_store import DEFAULT_STORE_DIR, ResultStore, current_version, open_snapshot, publish_results
+from src.serving import CLVService, register_routes
+from src.table_query import ResultTable
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
+configure_from_env()
 
-# Load data
-logger.info("Loading data...")
-df = pd.read_excel('data/Online Retail.xlsx')
+DATA_PATH = 'data/Online Retail.xlsx'
+ARTIFACT_NAME = 'dashboard'
+STORE_DIR = os.environ.get('CLTV_RESULT_STORE', DEFAULT_STORE_DIR)
 
-# Data preparation
-logger.info("Preparing data for CLTV analysis...")
-df['TotalAmount'] = df['Quantity'] * df['UnitPrice']
-summary_data = summary_data_from_transaction_data(
-    df, 'CustomerID', 'InvoiceDate', 'TotalAmount', 
-    observation_period_end=df['InvoiceDate'].max()
-)
+def fit_and_score(data_path):
+    """
+    Fit the models from the raw data and compute the CLV result table.
 
-# Fit models and calculate CLTV
-logger.info("Fitting models and calculating CLTV...")
-bgf = BetaGeoFitter(penalizer_coef=0.01)
-bgf.fit(summary_data['frequency'], summary_data['recency'], summary_data['T'])
+    The raw transactions only live inside this function; what is kept is
+    the per-customer result table.
+    """
+    # Load data
+    logger.info("Loading data...")
+    df = load_data(data_path)
 
-ggf = GammaGammaFitter(penalizer_coef=0.01)
-ggf.fit(summary_data['frequency'], summary_data['monetary_value'])
+    # Data preparation
+    logger.info("Preparing data for CLTV analysis...")
+    df['TotalAmount'] = df['Quantity'] * df['UnitPrice']
+    summary_data = summary_data_from_transaction_data(
+        df, 'CustomerID', 'InvoiceDate', 'TotalAmount', 
+        observation_period_end=df['InvoiceDate'].max()
+    )
+    countries = segment_labels(df, by='Country').rename('Country')
+    del df
 
-time_horizon = 12  # months
-cltv = ggf.customer_lifetime_value(
-    bgf, summary_data['frequency'], summary_data['recency'], summary_data['T'], 
-    summary_data['monetary_value'], time=time_horizon, freq='D', discount_rate=0.01
-)
+    # Fit models and calculate CLTV
+    logger.info("Fitting models and calculating CLTV...")
+    bgf = BetaGeoFitter(penalizer_coef=0.01)
+    bgf.fit(summary_data['frequency'], summary_data['recency'], summary_data['T'])
+
+    ggf = GammaGammaFitter(penalizer_coef=0.01)
+    ggf.fit(summary_data['frequency'], summary_data['monetary_value'])
+
+    time_horizon = 12  # months
+    cltv = ggf.customer_lifetime_value(
+        bgf, summary_data['frequency'], summary_data['recency'], summary_data['T'], 
+        summary_data['monetary_value'], time=time_horizon, freq='D', discount_rate=0.01
+    )
+
+    # RFM edges are learned once and saved with the models
+    rfm_scorer = RFMScorer(monetary_column='monetary_value').fit(summary_data)
+
+    result_df = (summary_data.join(cltv.rename('CLV')).join(rfm_scorer.transform(summary_data))
+                 .join(countries))
+    return bgf, ggf, rfm_scorer, result_df, data_fingerprint(summary_data)
+
+def publish_if_needed():
+    """
+    Make sure the result store serves results for the current data file.
+
+    The saved artifact for this file is reused when there is one, and the
+    models are fitted only when there is none. Workers that find the
+    version already published just map it; run gunicorn with --preload so
+    this happens once, before the workers fork.
+    """
+    source_fp = source_fingerprint(DATA_PATH)
+    version = current_version(STORE_DIR)
+    if version is not None and open_snapshot(version, STORE_DIR).meta['source_fingerprint'] == source_fp:
+        return
+    artifact = load_latest(ARTIFACT_NAME, source_fingerprint=source_fp)
+    if artifact is None:
+        bgf, ggf, rfm_scorer, result_df, summary_fp = fit_and_score(DATA_PATH)
+        version = save_artifact(bgf, ggf, result_df, summary_fp, source_fp, name=ARTIFACT_NAME,
+                                rfm_scorer=rfm_scorer)
+        artifact = load_artifact(version, ARTIFACT_NAME)
+    manifest = artifact.manifest
+    if not manifest.get('rfm'):
+        # Artifacts saved before RFM edges were stored get them from their results
+        manifest = dict(manifest, rfm=RFMScorer(monetary_column='monetary_value').fit(artifact.results).to_dict())
+    publish_results(artifact.results, manifest, STORE_DIR)
 
-result_df = summary_data.join(cltv.rename('CLV'))
+def build_views(snapshot):
+    """
+    Per-version serving state over a memory-mapped result snapshot.
+    """
+    result_df = snapshot.results
+    # Overview figures for every slider value, built before the first request; the top customers
+    # come from the aggregate index published with the version
+    overview_figures = OverviewFigures(result_df, snapshot.version, aggregates=snapshot.aggregates)
+    overview_figures.warm(range(10, 101, 10))
+    return {
+        # JSON API for per-customer lookups, batch scoring and top-N / distribution queries
+        'service': CLVService(result_df, snapshot.bg_nbd_model, snapshot.gamma_gamma_model, snapshot.version,
+                              rfm_scorer=snapshot.rfm_scorer, aggregates=snapshot.aggregates),
+        # Pre-sorted index behind the server-side Customer Details table
+        'table': ResultTable(result_df, orders=snapshot.orders),
+        'overview': overview_figures,
+        # Frequency/recency and probability-alive surfaces on a bounded log-spaced grid
+        'matrices': MatrixEngine(snapshot.bg_nbd_model, snapshot.version, log=True),
+    }
 
-logger.info(f"CLTV calculation completed. Result shape: {result_df.shape}")
-logger.info(f"Result dataframe head:\n{result_df.head()}")
+# Every worker maps the published result table read-only and follows new versions as they are published
+publish_if_needed()
+result_store = ResultStore(STORE_DIR, build=build_views)
+snapshot = result_store.current()
+
+logger.info(f"CLTV results ready (model version {snapshot.version}). Result shape: {snapshot.results.shape}")
+if logger.isEnabledFor(logging.DEBUG):
+    logger.debug(f"Result dataframe head:\n{snapshot.results.head()}")
 
 # Initialize the Dash app
 app = dash.Dash(__name__, suppress_callback_exceptions=True)
 server = app.server
 
-# Define the layout
-app.layout = html.Div([
-    html.H1("Customer Lifetime Value (CLTV) Analysis Dashboard"),
+register_routes(server, lambda: result_store.current().views['service'])
+
+def segment_options(aggregates):
+    """
+    Dropdown options for the top customers chart: everyone, then every indexed segment.
+    """
+    options = [{'label': 'All customers', 'value': 'all'}]
+    if aggregates is not None:
+        for column, group in aggregates.groups.items():
+            options += [{'label': f"{column}: {name}", 'value': f"{column}:{name}"} for name in group['names']]
+    return options
+
+def serve_layout():
+    """
+    Page layout, built per page load from the current result version.
+    """
+    snapshot = result_store.current()
+    matrix_engine = snapshot.views['matrices']
+    return html.Div([
+        html.H1("Customer Lifetime Value (CLTV) Analysis Dashboard"),
     
-    html.Div([
-        html.Label("Select number of customers to display:"),
-        dcc.Slider(
-            id='customer-slider',
-            min=10,
-            max=100,
-            step=10,
-            value=20,
-            marks={i: str(i) for i in range(10, 101, 10)},
-        ),
-    ], style={'width': '50%', 'margin': '20px auto'}),
+        html.Div([
+            html.Label("Select number of customers to display:"),
+            dcc.Slider(
+                id='customer-slider',
+                min=10,
+                max=100,
+                step=10,
+                value=20,
+                marks={i: str(i) for i in range(10, 101, 10)},
+            ),
+        ], style={'width': '50%', 'margin': '20px auto'}),
     
-    dcc.Tabs([
-        dcc.Tab(label='CLTV Overview', children=[
-            html.Div([
-                html.H3('CLTV Distribution'),
-                dcc.Graph(id='cltv-distribution-plot'),
+        dcc.Tabs([
+            dcc.Tab(label='CLTV Overview', children=[
+                html.Div([
+                    html.H3('CLTV Distribution'),
+                    dcc.Graph(id='cltv-distribution-plot'),
                 
-                html.H3('Recency vs Frequency'),
-                dcc.Graph(id='recency-frequency-plot'),
+                    html.H3('Recency vs Frequency'),
+                    dcc.Graph(id='recency-frequency-plot'),
                 
-                html.H3('Top Customers by CLTV'),
-                dcc.Graph(id='top-customers'),
-            ])
-        ]),
-        dcc.Tab(label='Customer Details', children=[
-            html.Div([
-                html.H3('Customer Information'),
-                dash_table.DataTable(
-                    id='customer-table',
-                    columns=[{"name": i, "id": i} for i in result_df.reset_index().columns],
-                    data=result_df.reset_index().to_dict('records'),
-                    page_size=10,
-                    style_table={'overflowX': 'auto'},
-                    style_cell={'textAlign': 'left'},
-                    style_header={
-                        'backgroundColor': 'rgb(230, 230, 230)',
-                        'fontWeight': 'bold'
-                    },
-                    sort_action='native',
-                    filter_action='native'
-                )
+                    html.H3('Top Customers by CLTV'),
+                    dcc.Dropdown(id='top-segment', options=segment_options(snapshot.aggregates),
+                                 value='all', clearable=False),
+                    dcc.Graph(id='top-customers'),
+                ])
+            ]),
+            dcc.Tab(label='Customer Matrices', children=[
+                html.Div([
+                    html.H3('Expected Purchases by Frequency and Recency'),
+                    dcc.Graph(id='frequency-recency-matrix',
+                              figure=matrix_engine.to_figure('frequency_recency', snapshot.results)),
+
+                    html.H3('Probability Alive by Frequency and Recency'),
+                    dcc.Graph(id='probability-alive-matrix',
+                              figure=matrix_engine.to_figure('probability_alive', snapshot.results)),
+                ])
+            ]),
+            dcc.Tab(label='Customer Details', children=[
+                html.Div([
+                    html.H3('Customer Information'),
+                    dash_table.DataTable(
+                        id='customer-table',
+                        columns=[{"name": i, "id": i} for i in snapshot.views['table'].columns],
+                        data=[],
+                        page_current=0,
+                        page_size=10,
+                        page_action='custom',
+                        style_table={'overflowX': 'auto'},
+                        style_cell={'textAlign': 'left'},
+                        style_header={
+                            'backgroundColor': 'rgb(230, 230, 230)',
+                            'fontWeight': 'bold'
+                        },
+                        sort_action='custom',
+                        sort_mode='single',
+                        sort_by=[],
+                        filter_action='custom',
+                        filter_query=''
+                    )
+                ])
             ])
         ])
     ])
-])
+
+app.layout = serve_layout
 
 @app.callback(
     [Output('cltv-distribution-plot', 'figure'),
      Output('recency-frequency-plot', 'figure'),
      Output('top-customers', 'figure')],
-    Input('customer-slider', 'value')
+    [Input('customer-slider', 'value'),
+     Input('top-segment', 'value')]
 )
-def update_graphs(n_customers):
+def update_graphs(n_customers, top_segment):
     logger.info(f"Updating graphs for {n_customers} randomly selected customers")
     try:
-        # Randomly select customers
-        selected_customers = result_df.sample(n=n_customers)
-        
-        # CLTV Distribution
-        cltv_dist = px.histogram(selected_customers, x='CLV', nbins=20,
-                                 title=f'CLTV Distribution (Random {n_customers} Customers)')
-        cltv_dist.update_layout(
-            xaxis_title="Customer Lifetime Value",
-            yaxis_title="Count",
-            bargap=0.2
-        )
-        
-        # Recency vs Frequency
-        recency_freq = px.scatter(selected_customers, x='recency', y='frequency', 
-                                  size='monetary_value', color='CLV', hover_name=selected_customers.index,
-                                  title=f'Recency vs Frequency (Random {n_customers} Customers)')
-        recency_freq.update_layout(
-            xaxis_title="Recency (days)",
-            yaxis_title="Frequency",
-            coloraxis_colorbar_title="CLTV"
-        )
-        
-        # Top Customers
-        top_customers = selected_customers.nlargest(10, 'CLV')
-        top_cust_plot = px.bar(top_customers, x=top_customers.index, y='CLV',
-                               title=f'Top 10 Customers by CLTV (from Random {n_customers} Customers)')
-        top_cust_plot.update_layout(
-            xaxis_title="Customer ID",
-            yaxis_title="Customer Lifetime Value"
-        )
-        
-        return cltv_dist, recency_freq, top_cust_plot
+        overview_figures = result_store.current().views['overview']
+        cltv_dist, recency_freq, top_customers = overview_figures.figures(n_customers)
+        if top_segment and top_segment != 'all':
+            column, value = top_segment.split(':', 1)
+            top_customers = overview_figures.top_customers(n_customers, column, value)
+        return cltv_dist, recency_freq, top_customers
     except Exception as e:
         logger.error(f"Error in update_graphs: {e}")
         return px.histogram(title="Error in generating plot"), px.scatter(title="Error in generating plot"), px.bar(title="Error in generating plot")
 
+@app.callback(
+    [Output('customer-table', 'data'),
+     Output('customer-table', 'page_count')],
+    [Input('customer-table', 'page_current'),
+     Input('customer-table', 'page_size'),
+     Input('customer-table', 'sort_by'),
+     Input('customer-table', 'filter_query')]
+)
+def update_table(page_current, page_size, sort_by, filter_query):
+    return result_store.current().views['table'].page(page_current, page_size, sort_by, filter_query)
+
 logger.info("Dashboard setup completed.")
 
 if __name__ == '__main__':
@@ -16,7 +16,7 @@ setup(
     ],
     entry_points={
         'console_scripts': [
-            'run_cltv_analysis=src.cltv_calculation:main',
+            'run_cltv_analysis=src.pipeline:main',
         ],
     },
 )
\ No newline at end of file
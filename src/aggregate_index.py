@@ -0,0 +1,180 @@
+import json
+import logging
+import os
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Per-customer columns the index groups by, when the result table has them
+GROUP_COLUMNS = ('Country', 'segment', 'RFM_Score')
+AGGREGATES_FILE = 'aggregates.json'
+
+class AggregateIndex:
+    """
+    Precomputed CLV order, per-group orders, quantiles and totals of a result table.
+
+    Built once per model version. Customers with a CLV are kept sorted by
+    CLV overall and, for every group column (Country, segment and RFM_Score
+    when present), sorted by group and then CLV, with each group's offsets.
+    The top N overall or in a group is then a slice of an order, a
+    customer's CLV percentile or the number of customers in a CLV range is a
+    binary search, and quantile bins, a histogram and per-group totals
+    (customers, total, mean and max CLV) are stored as they are. Customers
+    without a CLV are left out of the orders and the aggregates.
+    """
+
+    def __init__(self, results, order, groups, quantiles, histogram):
+        self.results = results
+        self.order = order
+        self.groups = groups
+        self.quantiles = quantiles
+        self.histogram = histogram
+        self._group_positions = {column: {name: i for i, name in enumerate(group['names'])}
+                                 for column, group in groups.items()}
+        self._sorted_clv = None
+
+    @classmethod
+    def build(cls, results, group_columns=GROUP_COLUMNS, n_quantiles=10, nbins=50):
+        """
+        Index a result table with a CLV column; group values are compared as strings.
+        """
+        clv = results['CLV'].to_numpy(dtype=float)
+        valid = np.flatnonzero(~np.isnan(clv))
+        # Ascending by CLV with ties in reverse table order, so reading it backwards lists the highest
+        # CLV first and ties in table order
+        ascending = valid[np.lexsort((-valid, clv[valid]))]
+        order = np.ascontiguousarray(ascending[::-1])
+        sorted_clv = clv[ascending]
+
+        groups = {}
+        for column in group_columns:
+            if column not in results.columns:
+                continue
+            codes, names = pd.factorize(results[column].to_numpy()[valid], sort=True)
+            # Sorted by group, then like the overall order; customers without a group (code -1) come first
+            group_order = np.lexsort((-valid, clv[valid], codes))
+            known = codes >= 0
+            counts = np.bincount(codes[known], minlength=len(names))
+            offsets = np.concatenate([[len(codes) - known.sum()], len(codes) - known.sum() + np.cumsum(counts)])
+            totals = np.bincount(codes[known], weights=clv[valid][known], minlength=len(names))
+            maxima = np.full(len(names), -np.inf)
+            np.maximum.at(maxima, codes[known], clv[valid][known])
+            groups[column] = {
+                'names': [str(name) for name in names],
+                'order': valid[group_order],
+                'offsets': offsets,
+                'totals': pd.DataFrame({
+                    'customers': counts,
+                    'total_CLV': totals,
+                    'mean_CLV': totals / np.maximum(counts, 1),
+                    'max_CLV': maxima,
+                    'share_of_CLV': totals / sorted_clv.sum() if len(sorted_clv) else 0.0,
+                }, index=pd.Index([str(name) for name in names], name=column)),
+            }
+
+        probabilities = np.linspace(0, 1, n_quantiles + 1)
+        quantiles = {
+            'probabilities': probabilities.tolist(),
+            'edges': np.quantile(sorted_clv, probabilities).tolist() if len(sorted_clv) else [],
+        }
+        counts, edges = np.histogram(sorted_clv, bins=nbins)
+        index = cls(results, order, groups, quantiles, {'edges': edges.tolist(), 'counts': counts.tolist()})
+        index._sorted_clv = sorted_clv
+        logger.info(f"Built CLV aggregate index over {len(order)} customers, grouped by {list(groups)}")
+        return index
+
+    @property
+    def sorted_clv(self):
+        # CLV in ascending order, gathered on first use when the index was loaded from disk
+        if self._sorted_clv is None:
+            self._sorted_clv = self.results['CLV'].to_numpy(dtype=float)[self.order[::-1]]
+        return self._sorted_clv
+
+    def _positions(self, n, column=None, value=None):
+        if n < 0:
+            raise ValueError(f"n must be non-negative, got {n}")
+        if column is None:
+            return self.order[:n]
+        if column not in self.groups:
+            raise KeyError(f"No aggregate index for column {column!r}")
+        group = self.groups[column]
+        i = self._group_positions[column].get(str(value))
+        if i is None:
+            return self.order[:0]
+        start, stop = group['offsets'][i], group['offsets'][i + 1]
+        # Within a group the order is ascending, so its top is read from the end
+        return group['order'][max(start, stop - n):stop][::-1]
+
+    def top(self, n, column=None, value=None):
+        """
+        The n customers with the highest CLV, overall or where column == value.
+
+        Fewer rows come back when there are fewer customers; n < 0 raises ValueError.
+        """
+        return self.results.take(self._positions(n, column, value))
+
+    def percentile(self, clv):
+        """
+        Share of customers whose CLV is at most clv.
+        """
+        if not len(self.order):
+            return float('nan')
+        return float(np.searchsorted(self.sorted_clv, clv, side='right') / len(self.order))
+
+    def count_between(self, low, high):
+        """
+        Number of customers with low <= CLV <= high.
+        """
+        return int(np.searchsorted(self.sorted_clv, high, side='right')
+                   - np.searchsorted(self.sorted_clv, low, side='left'))
+
+    def totals(self, column):
+        """
+        Customers, total, mean and max CLV and share of total CLV per group.
+        """
+        return self.groups[column]['totals']
+
+    def distribution(self):
+        """
+        CLV quantile edges and the fixed-width histogram, as plain values.
+        """
+        return {'customers': len(self.order), 'quantiles': self.quantiles, 'histogram': self.histogram}
+
+    def save(self, directory):
+        """
+        Write the orders as .npy files and the rest as JSON into directory.
+        """
+        np.save(os.path.join(directory, 'order.npy'), self.order)
+        meta = {'quantiles': self.quantiles, 'histogram': self.histogram, 'groups': []}
+        for i, (column, group) in enumerate(self.groups.items()):
+            file_name = f"group_{i:04d}.npy"
+            np.save(os.path.join(directory, file_name), group['order'])
+            meta['groups'].append({
+                'column': column,
+                'file': file_name,
+                'names': group['names'],
+                'offsets': group['offsets'].tolist(),
+                'totals': group['totals'].reset_index(drop=True).to_dict('list'),
+            })
+        with open(os.path.join(directory, AGGREGATES_FILE), 'w') as f:
+            json.dump(meta, f)
+
+    @classmethod
+    def load(cls, directory, results):
+        """
+        Memory-map an index written by save, over the results it was built from.
+        """
+        with open(os.path.join(directory, AGGREGATES_FILE)) as f:
+            meta = json.load(f)
+        groups = {}
+        for entry in meta['groups']:
+            groups[entry['column']] = {
+                'names': entry['names'],
+                'order': np.load(os.path.join(directory, entry['file']), mmap_mode='r'),
+                'offsets': np.asarray(entry['offsets']),
+                'totals': pd.DataFrame(entry['totals'], index=pd.Index(entry['names'], name=entry['column'])),
+            }
+        order = np.load(os.path.join(directory, 'order.npy'), mmap_mode='r')
+        return cls(results, order, groups, meta['quantiles'], meta['histogram'])
@@ -0,0 +1,145 @@
+import logging
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+STATE_COLUMNS = ['first_purchase', 'last_purchase', 'frequency', 'monetary_sum']
+FREQUENCY_MODES = ('invoices', 'days')
+
+def aggregate_customers(customer_ids, invoice_dates, amounts, counted=None, frequency='invoices'):
+    """
+    Per-customer first/last purchase, frequency and monetary sum in one pass.
+
+    The rows are sorted once by customer and every statistic is a segment
+    reduction (np.*.reduceat) over the sorted arrays, so there is no Python
+    work per customer. counted optionally marks the rows that count towards
+    frequency (e.g. non-null InvoiceNo). With frequency='days' the frequency
+    is the number of distinct purchase days instead of invoice rows.
+    """
+    if frequency not in FREQUENCY_MODES:
+        raise ValueError(f"frequency must be one of {FREQUENCY_MODES}, got {frequency!r}")
+
+    customer_ids = np.asarray(customer_ids)
+    dates = np.asarray(invoice_dates, dtype='datetime64[ns]')
+    amounts = np.asarray(amounts, dtype=float)
+    if counted is not None:
+        counted = np.asarray(counted, dtype=bool)
+    if len(customer_ids) == 0:
+        return pd.DataFrame(columns=STATE_COLUMNS).rename_axis('CustomerID')
+
+    if frequency == 'days':
+        days = dates.astype('datetime64[D]')
+        # Counted rows sort first within a day, so a day counts if any of its rows does
+        keys = (days, customer_ids) if counted is None else (~counted, days, customer_ids)
+        order = np.lexsort(keys)
+    else:
+        order = np.argsort(customer_ids, kind='stable')
+    sorted_ids = customer_ids[order]
+    sorted_dates = dates[order].view('int64')
+
+    new_customer = np.empty(len(sorted_ids), dtype=bool)
+    new_customer[0] = True
+    np.not_equal(sorted_ids[1:], sorted_ids[:-1], out=new_customer[1:])
+    starts = np.flatnonzero(new_customer)
+
+    if frequency == 'days':
+        sorted_days = days[order]
+        new_day = new_customer.copy()
+        new_day[1:] |= sorted_days[1:] != sorted_days[:-1]
+        if counted is not None:
+            new_day &= counted[order]
+        freq_values = np.add.reduceat(new_day.astype(np.int64), starts)
+    elif counted is not None:
+        freq_values = np.add.reduceat(counted[order].astype(np.int64), starts)
+    else:
+        freq_values = np.diff(np.append(starts, len(sorted_ids)))
+
+    state = pd.DataFrame({
+        'first_purchase': np.minimum.reduceat(sorted_dates, starts).view('datetime64[ns]'),
+        'last_purchase': np.maximum.reduceat(sorted_dates, starts).view('datetime64[ns]'),
+        'frequency': freq_values.astype(np.int64),
+        'monetary_sum': np.add.reduceat(amounts[order], starts),
+    }, index=pd.Index(sorted_ids[starts], name='CustomerID'))
+    return state
+
+def customer_state(df, frequency='invoices'):
+    """
+    Aggregate a cleaned transaction frame into per-customer state.
+    """
+    return aggregate_customers(
+        df['CustomerID'].to_numpy(),
+        df['InvoiceDate'].to_numpy(),
+        df['TotalAmount'].to_numpy(),
+        counted=df['InvoiceNo'].notna().to_numpy(),
+        frequency=frequency,
+    )
+
+def merge_customer_states(states):
+    """
+    Merge per-customer states computed over disjoint sets of transactions.
+
+    Only valid for invoice-row frequency; distinct-day counts do not add up
+    when the same day spans two states.
+    """
+    states = [state for state in states if len(state)]
+    if not states:
+        return pd.DataFrame(columns=STATE_COLUMNS).rename_axis('CustomerID')
+    if len(states) == 1:
+        return states[0]
+    return pd.concat(states).groupby(level=0).agg({
+        'first_purchase': 'min',
+        'last_purchase': 'max',
+        'frequency': 'sum',
+        'monetary_sum': 'sum',
+    })
+
+def fold_customer_state(state, batch):
+    """
+    Fold the state of a batch of new transactions into an existing state.
+
+    Same result as merge_customer_states([state, batch]) without its
+    concat and group-by over every customer: the batch's returning
+    customers are found with a hash lookup on the state index and only
+    their rows are recomputed. The input state is not modified; a new
+    frame is returned, so a caller still holding the old state (e.g. to
+    retry a failed save) keeps the old values. Customers seen for the
+    first time are appended, keeping the state sorted by CustomerID. Same
+    invoice-row frequency caveat as merge_customer_states.
+    """
+    if not len(batch):
+        return state.copy()
+    if not len(state):
+        return batch.copy()
+    positions = state.index.get_indexer(batch.index)
+    known = positions >= 0
+    rows, returning = positions[known], batch[known]
+    folded = {}
+    for col, combine in [('first_purchase', np.minimum), ('last_purchase', np.maximum),
+                         ('frequency', np.add), ('monetary_sum', np.add)]:
+        values = state[col].to_numpy().copy()
+        values[rows] = combine(values[rows], returning[col].to_numpy())
+        folded[col] = values
+    folded = pd.DataFrame(folded, index=state.index)
+    if known.all():
+        return folded
+    return pd.concat([folded, batch[~known]]).sort_index(kind='stable')
+
+def summary_from_state(state, last_date=None):
+    """
+    Turn per-customer state into the prepare_data_for_modeling summary.
+
+    last_date defaults to the latest purchase in the state.
+    """
+    if last_date is None:
+        last_date = state['last_purchase'].max()
+    summary = pd.DataFrame({
+        'recency': (last_date - state['last_purchase']).dt.days,
+        'frequency': state['frequency'],
+        'monetary': state['monetary_sum'],
+        'T': (last_date - state['first_purchase']).dt.days,
+    })
+    summary = summary[summary['frequency'] > 1]
+    summary['monetary'] = np.log1p(summary['monetary'])
+    return summary
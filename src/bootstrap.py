@@ -0,0 +1,192 @@
+import json
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from lifetimes.utils import ConvergenceError
+from src.cltv_calculation import cltv_grid_array
+from src.compressed_fitters import CompressedBetaGeoFitter, CompressedGammaGammaFitter
+from src.model_registry import data_fingerprint, restore_model
+from src.penalizer_search import initial_params
+
+logger = logging.getLogger(__name__)
+
+# Compressed summary shared with worker processes through the pool initializer
+_patterns = {}
+
+def _init_worker(patterns):
+    _patterns.update(patterns)
+
+def _compress(summary_data):
+    """
+    Unique BG/NBD patterns and Gamma-Gamma pairs, with each customer's pattern index.
+    """
+    bg_values, bg_inverse = np.unique(
+        summary_data[['frequency', 'recency', 'T']].to_numpy(dtype=float), axis=0, return_inverse=True
+    )
+    repeat = summary_data['frequency'].to_numpy() > 0
+    gg_values, gg_inverse = np.unique(
+        summary_data.loc[repeat, ['frequency', 'monetary']].to_numpy(dtype=float), axis=0, return_inverse=True
+    )
+    return {
+        'n_customers': len(summary_data),
+        'bg_values': bg_values,
+        'bg_inverse': bg_inverse.ravel(),
+        'gg_values': gg_values,
+        'gg_inverse': gg_inverse.ravel(),
+        'repeat': repeat,
+    }
+
+def _fit_replicate(replicate, seed, penalizer_coef, start_params):
+    """
+    Fit both models on one bootstrap resample, expressed as pattern weights.
+
+    Fits start from the full-sample parameters when those are available.
+    Returns a dict of fitted parameters, or None if either fit fails.
+    """
+    patterns = _patterns
+    rng = np.random.default_rng([seed, replicate])
+    n = patterns['n_customers']
+    counts = rng.multinomial(n, np.full(n, 1.0 / n))
+
+    bg_weights = np.bincount(patterns['bg_inverse'], weights=counts, minlength=len(patterns['bg_values']))
+    gg_weights = np.bincount(patterns['gg_inverse'], weights=counts[patterns['repeat']],
+                             minlength=len(patterns['gg_values']))
+    bg_used, gg_used = bg_weights > 0, gg_weights > 0
+    bg_values, gg_values = patterns['bg_values'][bg_used], patterns['gg_values'][gg_used]
+    try:
+        bgf = CompressedBetaGeoFitter(penalizer_coef=penalizer_coef).fit(
+            bg_values[:, 0], bg_values[:, 1], bg_values[:, 2], weights=bg_weights[bg_used],
+            initial_params=initial_params('bg_nbd', start_params['bg_nbd'], bg_values.T)
+        )
+        ggf = CompressedGammaGammaFitter(penalizer_coef=penalizer_coef).fit(
+            gg_values[:, 0], gg_values[:, 1], weights=gg_weights[gg_used],
+            initial_params=initial_params('gamma_gamma', start_params['gamma_gamma'], gg_values.T)
+        )
+    except ConvergenceError:
+        return None
+    return {
+        'bg_nbd': {name: float(value) for name, value in bgf.params_.items()},
+        'gamma_gamma': {name: float(value) for name, value in ggf.params_.items()},
+    }
+
+def _full_sample_params(patterns, penalizer_coef):
+    # Fit once on the full sample to warm-start every replicate
+    params = {'bg_nbd': None, 'gamma_gamma': None}
+    bg_values, gg_values = patterns['bg_values'], patterns['gg_values']
+    try:
+        params['bg_nbd'] = CompressedBetaGeoFitter(penalizer_coef=penalizer_coef).fit(
+            bg_values[:, 0], bg_values[:, 1], bg_values[:, 2],
+            weights=np.bincount(patterns['bg_inverse'], minlength=len(bg_values))
+        ).params_.to_numpy()
+        params['gamma_gamma'] = CompressedGammaGammaFitter(penalizer_coef=penalizer_coef).fit(
+            gg_values[:, 0], gg_values[:, 1], weights=np.bincount(patterns['gg_inverse'], minlength=len(gg_values))
+        ).params_.to_numpy()
+    except ConvergenceError:
+        logger.warning("Full-sample fit did not converge; bootstrap replicates start from the default parameters.")
+    return params
+
+def _checkpoint_path(checkpoint_dir, replicate):
+    return os.path.join(checkpoint_dir, f"replicate_{replicate:05d}.json")
+
+def _load_checkpoints(checkpoint_dir, config):
+    """
+    Read finished replicates, refusing checkpoints written for other inputs.
+    """
+    os.makedirs(checkpoint_dir, exist_ok=True)
+    config_path = os.path.join(checkpoint_dir, 'config.json')
+    if os.path.exists(config_path):
+        with open(config_path) as f:
+            saved = json.load(f)
+        if saved != config:
+            raise ValueError(f"Checkpoints in {checkpoint_dir} were written for different inputs: {saved}")
+    else:
+        with open(config_path, 'w') as f:
+            json.dump(config, f)
+
+    results = {}
+    for entry in os.listdir(checkpoint_dir):
+        if entry.startswith('replicate_') and entry.endswith('.json'):
+            with open(os.path.join(checkpoint_dir, entry)) as f:
+                results[int(entry[len('replicate_'):-len('.json')])] = json.load(f)
+    return results
+
+def _save_checkpoint(checkpoint_dir, replicate, params):
+    path = _checkpoint_path(checkpoint_dir, replicate)
+    with open(f"{path}.tmp", 'w') as f:
+        json.dump(params, f)
+    os.replace(f"{path}.tmp", path)
+
+def bootstrap_params(summary_data, n_replicates=200, penalizer_coef=0.01, n_jobs=None, seed=0,
+                     checkpoint_dir=None):
+    """
+    Refit BG/NBD and Gamma-Gamma on bootstrap resamples of customers.
+
+    Each resample is drawn as multinomial customer counts and folded into
+    weights on the compressed patterns, so no resampled frame is built and
+    only the compressed summary is shipped to the worker processes. With a
+    checkpoint_dir every finished replicate is written to disk, and a rerun
+    resumes from the replicates already there. Returns a list of parameter
+    dicts (None for replicates that did not converge).
+    """
+    patterns = _compress(summary_data)
+    config = {'data_fingerprint': data_fingerprint(summary_data[['frequency', 'recency', 'T', 'monetary']]),
+              'penalizer_coef': penalizer_coef, 'seed': seed}
+    results = _load_checkpoints(checkpoint_dir, config) if checkpoint_dir else {}
+    todo = [i for i in range(n_replicates) if i not in results]
+    logger.info(f"Bootstrapping {len(todo)} replicates ({len(results)} resumed from checkpoints)")
+    if not todo:
+        return [results[i] for i in range(n_replicates)]
+
+    start_params = _full_sample_params(patterns, penalizer_coef)
+    with ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_worker, initargs=(patterns,)) as pool:
+        futures = {i: pool.submit(_fit_replicate, i, seed, penalizer_coef, start_params) for i in todo}
+        for i, future in futures.items():
+            results[i] = future.result()
+            if checkpoint_dir:
+                _save_checkpoint(checkpoint_dir, i, results[i])
+    return [results[i] for i in range(n_replicates)]
+
+def bootstrap_cltv_intervals(summary_data, n_replicates=200, percentiles=(5, 50, 95), time_horizon=12,
+                             discount_rate=0.01, penalizer_coef=0.01, n_jobs=None, seed=0, checkpoint_dir=None,
+                             chunk_size=20_000):
+    """
+    Per-customer CLV percentile intervals from bootstrap refits of both models.
+
+    Returns a DataFrame indexed like summary_data with one CLV_p<q> column
+    per percentile and the number of converged replicates used.
+    """
+    replicates = [params for params in bootstrap_params(
+        summary_data, n_replicates, penalizer_coef, n_jobs, seed, checkpoint_dir
+    ) if params is not None]
+    if not replicates:
+        logger.error("No bootstrap replicate converged.")
+        return pd.DataFrame(index=summary_data.index)
+    if len(replicates) < n_replicates:
+        logger.warning(f"{n_replicates - len(replicates)} of {n_replicates} bootstrap replicates did not converge")
+
+    models = [
+        (restore_model({'class': 'BetaGeoFitter', 'penalizer_coef': penalizer_coef, 'params': params['bg_nbd']}),
+         restore_model({'class': 'GammaGammaFitter', 'penalizer_coef': penalizer_coef,
+                        'params': params['gamma_gamma']}))
+        for params in replicates
+    ]
+
+    # Score customers in chunks so only chunk_size x replicates values are held at once
+    intervals = []
+    for start in range(0, len(summary_data), chunk_size):
+        chunk = summary_data.iloc[start:start + chunk_size]
+        clv = np.column_stack([
+            cltv_grid_array(bgf, ggf, chunk['frequency'], chunk['recency'], chunk['T'], chunk['monetary'],
+                            [time_horizon], [discount_rate])[:, 0, 0]
+            for bgf, ggf in models
+        ])
+        intervals.append(np.percentile(clv, percentiles, axis=1).T)
+
+    result = pd.DataFrame(np.concatenate(intervals), index=summary_data.index,
+                          columns=[f"CLV_p{q:g}" for q in percentiles])
+    result['n_replicates'] = len(models)
+    logger.info(f"Bootstrap CLV intervals computed from {len(models)} replicates")
+    return result
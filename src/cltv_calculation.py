@@ -1,9 +1,68 @@
 import pandas as pd
+import numpy as np
 import logging
+from src.instrumentation import instrumented
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+TIME_UNITS_PER_MONTH = {"W": 4.345, "M": 1.0, "D": 30, "H": 30 * 24}
+
+def cltv_grid_array(bg_nbd_model, gamma_gamma_model, frequency, recency, T, monetary_value,
+                    time_horizons, discount_rates, freq='D'):
+    """
+    CLV for every customer, horizon (in months) and monthly discount rate.
+
+    Follows lifetimes' customer_lifetime_value: the expected purchases in
+    each month times the Gamma-Gamma expected average profit, discounted
+    per month. The cumulative expected purchases are computed once per
+    month step for all customers at once and shared by every horizon and
+    rate. Returns an array of shape (customers, horizons, rates).
+    """
+    frequency = np.asarray(frequency, dtype=float)[:, None]
+    recency = np.asarray(recency, dtype=float)[:, None]
+    T = np.asarray(T, dtype=float)[:, None]
+    monetary_value = np.asarray(monetary_value, dtype=float)
+    factor = TIME_UNITS_PER_MONTH[freq]
+    horizons = np.asarray(time_horizons, dtype=int)
+    rates = np.asarray(discount_rates, dtype=float)
+
+    adjusted_monetary_value = np.asarray(
+        gamma_gamma_model.conditional_expected_average_profit(frequency[:, 0], monetary_value), dtype=float
+    )
+    steps = np.arange(1, horizons.max() + 1) * factor
+    expected = bg_nbd_model.predict(steps[None, :], frequency, recency, T)
+    expected_per_month = np.diff(expected, axis=1, prepend=0.0)
+
+    # (customers, months, rates), summed over months in order and read off at each horizon
+    discount = (1 + rates[None, :]) ** (steps / factor)[:, None]
+    monthly_value = (adjusted_monetary_value[:, None] * expected_per_month)[:, :, None] / discount[None, :, :]
+    return np.cumsum(monthly_value, axis=1)[:, horizons - 1, :]
+
+@instrumented()
+def calculate_cltv_grid(bg_nbd_model, gamma_gamma_model, summary_data, time_horizons=(3, 6, 12, 24, 36),
+                        discount_rates=(0.01,), freq='D', chunk_size=50_000):
+    """
+    Calculate CLV over a grid of time horizons and discount rates in one call.
+
+    Customers are scored in chunks of chunk_size so memory stays bounded
+    by chunk_size x months x rates. Returns a DataFrame indexed like
+    summary_data with (time_horizon, discount_rate) column pairs.
+    """
+    logger.info(f"Calculating CLTV grid for horizons {list(time_horizons)} and discount rates {list(discount_rates)}")
+    chunks = []
+    for start in range(0, len(summary_data), chunk_size):
+        chunk = summary_data.iloc[start:start + chunk_size]
+        chunks.append(cltv_grid_array(
+            bg_nbd_model, gamma_gamma_model,
+            chunk['frequency'], chunk['recency'], chunk['T'], chunk['monetary'],
+            time_horizons, discount_rates, freq=freq
+        ))
+    values = np.concatenate(chunks) if chunks else np.empty((0, len(time_horizons), len(discount_rates)))
+    columns = pd.MultiIndex.from_product([list(time_horizons), list(discount_rates)],
+                                         names=['time_horizon', 'discount_rate'])
+    return pd.DataFrame(values.reshape(len(summary_data), -1), index=summary_data.index, columns=columns)
+
+@instrumented()
 def calculate_cltv(bg_nbd_model, gamma_gamma_model, summary_data, time_horizon=12, discount_rate=0.01):
     """
     Calculate Customer Lifetime Value.
@@ -11,23 +70,22 @@ def calculate_cltv(bg_nbd_model, gamma_gamma_model, summary_data, time_horizon=1
     logger.info("Calculating CLTV")
     
     try:
-        cltv = gamma_gamma_model.customer_lifetime_value(
+        cltv = calculate_cltv_grid(
             bg_nbd_model,
-            summary_data['frequency'],
-            summary_data['recency'],
-            summary_data['T'],
-            summary_data['monetary'],
-            time=time_horizon,
-            freq='D',
-            discount_rate=discount_rate
-        )
+            gamma_gamma_model,
+            summary_data,
+            time_horizons=[time_horizon],
+            discount_rates=[discount_rate],
+            freq='D'
+        ).iloc[:, 0].rename('clv')
         
         cltv_df = pd.DataFrame(cltv).reset_index()
         cltv_df.columns = ['CustomerID', 'CLV']
         
         logger.info("CLTV calculation completed successfully")
-        logger.info(f"CLTV statistics:\n{cltv_df['CLV'].describe()}")
-        logger.info(f"Sample of CLTV results:\n{cltv_df.sample(5)}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"CLTV statistics:\n{cltv_df['CLV'].describe()}")
+            logger.debug(f"Sample of CLTV results:\n{cltv_df.sample(5)}")
         
         return cltv_df
     except Exception as e:
@@ -35,7 +93,9 @@ def calculate_cltv(bg_nbd_model, gamma_gamma_model, summary_data, time_horizon=1
         return pd.DataFrame(columns=['CustomerID', 'CLV'])
 
 def main():
-    pass
+    # The full load -> clean -> summarize -> fit -> score -> report pipeline
+    from src.pipeline import main as run_pipeline
+    run_pipeline()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,248 @@
+import logging
+
+import numpy as np
+import pandas as pd
+from lifetimes import BetaGeoFitter, GammaGammaFitter
+from lifetimes.generate_data import beta_geometric_nbd_model
+from lifetimes.utils import ConvergenceError
+from scipy.optimize import minimize
+from scipy.special import digamma, gammaln
+
+logger = logging.getLogger(__name__)
+
+def compress_rows(*columns, weights=None):
+    """
+    Collapse identical rows into unique patterns with summed weights.
+
+    Returns the unique value of each column and the weight of each pattern.
+    """
+    stacked = np.column_stack([np.asarray(col, dtype=float) for col in columns])
+    patterns, inverse = np.unique(stacked, axis=0, return_inverse=True)
+    inverse = inverse.ravel()
+    if weights is None:
+        pattern_weights = np.bincount(inverse, minlength=len(patterns)).astype(float)
+    else:
+        pattern_weights = np.bincount(inverse, weights=np.asarray(weights, dtype=float), minlength=len(patterns))
+    return [patterns[:, i] for i in range(patterns.shape[1])], pattern_weights
+
+def check_inputs(frequency, recency=None, T=None, monetary_value=None):
+    """
+    Validate summary columns before fitting; raises ValueError like lifetimes does.
+
+    All columns must be non-empty and of the same length, frequency must be
+    non-negative whole numbers, recency must lie in [0, T] and be zero when
+    frequency is, and monetary values must be positive.
+    """
+    frequency = np.asarray(frequency, dtype=float)
+    columns = {name: np.asarray(col, dtype=float) for name, col in
+               (('recency', recency), ('T', T), ('monetary_value', monetary_value)) if col is not None}
+    if len(frequency) == 0:
+        raise ValueError("There exists a zero length vector in the inputs.")
+    for name, col in columns.items():
+        if col.shape != frequency.shape:
+            raise ValueError(f"{name} has shape {col.shape}, expected {frequency.shape} like frequency.")
+    if np.any(frequency < 0) or np.any(frequency != np.round(frequency)):
+        raise ValueError("There exist negative or non-integer values in the frequency vector.")
+    if 'recency' in columns:
+        recency = columns['recency']
+        if np.any(recency < 0):
+            raise ValueError("There exist negative recency (ex: last order set before first order)")
+        if 'T' in columns and np.any(recency > columns['T']):
+            raise ValueError("Some values in recency vector are larger than T vector.")
+        if np.any(recency[frequency == 0] != 0):
+            raise ValueError("There exist non-zero recency values when frequency is zero.")
+    if 'monetary_value' in columns and np.any(columns['monetary_value'] <= 0):
+        raise ValueError("There exist non-positive (<= 0) values in the monetary_value vector.")
+
+def _numerical_hessian(gradient, x, eps=1e-5):
+    """
+    Central-difference Hessian of an analytic gradient.
+    """
+    n = len(x)
+    hessian = np.empty((n, n))
+    for i in range(n):
+        step = np.zeros(n)
+        step[i] = eps
+        hessian[:, i] = (gradient(x + step) - gradient(x - step)) / (2 * eps)
+    return (hessian + hessian.T) / 2
+
+def _prior_penalty(log_params, prior, prior_strength, total_weight):
+    """
+    Quadratic pull of the log-parameters towards a prior, and its gradient.
+
+    The strength is divided by the total weight, so it acts like
+    prior_strength extra pseudo-customers and fades as the data grows.
+    """
+    if prior is None or not prior_strength:
+        return 0.0, 0.0
+    diff = log_params - prior
+    scale = prior_strength / total_weight
+    return scale * (diff ** 2).sum(), 2 * scale * diff
+
+def _minimize(objective, n_params, initial_params, tol, bounds=None, **kwargs):
+    x0 = 0.1 * np.ones(n_params) if initial_params is None else np.asarray(initial_params, dtype=float)
+    output = minimize(objective, x0=x0, jac=True, method=None, tol=tol, bounds=bounds, options=kwargs)
+    if not output.success:
+        raise ConvergenceError(
+            "The model did not converge. Try adding a larger penalizer to see if that helps convergence."
+        )
+    return output
+
+class CompressedBetaGeoFitter(BetaGeoFitter):
+    """
+    BG/NBD fitter that works on unique (frequency, recency, T) patterns.
+
+    Customers sharing a pattern are collapsed into one weighted row and the
+    weighted log-likelihood is maximised with an analytic gradient, so fit
+    time depends on the number of distinct patterns rather than customers.
+    The fitted object is a BetaGeoFitter, with the same params_, predict and
+    other methods.
+
+    prior_params (r, alpha, a, b) with prior_strength > 0 shrink the fit
+    towards those parameters, e.g. a global model when fitting a small segment.
+    """
+
+    def __init__(self, penalizer_coef=0.0, prior_params=None, prior_strength=0.0):
+        super().__init__(penalizer_coef=penalizer_coef)
+        self.prior_params = prior_params
+        self.prior_strength = prior_strength
+
+    @staticmethod
+    def _value_and_gradient(log_params, freq, rec, T, weights, penalizer_coef, prior=None, prior_strength=0.0):
+        params = np.exp(log_params)
+        r, alpha, a, b = params
+        b_x = b + np.maximum(freq, 1) - 1
+
+        A_1 = gammaln(r + freq) - gammaln(r) + r * np.log(alpha)
+        A_2 = gammaln(a + b) + gammaln(b + freq) - gammaln(b) - gammaln(a + b + freq)
+        A_3 = -(r + freq) * np.log(alpha + T)
+        A_4 = np.log(a) - np.log(b_x) - (r + freq) * np.log(rec + alpha)
+        max_A_3_A_4 = np.maximum(A_3, A_4)
+        exp_3 = np.exp(A_3 - max_A_3_A_4)
+        exp_4 = np.exp(A_4 - max_A_3_A_4) * (freq > 0)
+        log_sum = np.log(exp_3 + exp_4)
+        ll = A_1 + A_2 + log_sum + max_A_3_A_4
+
+        # Share of each mixture term in the likelihood; they add up to one
+        w_3 = exp_3 / (exp_3 + exp_4)
+        w_4 = 1 - w_3
+        d_r = digamma(r + freq) - digamma(r) + np.log(alpha) - w_3 * np.log(alpha + T) - w_4 * np.log(rec + alpha)
+        d_alpha = r / alpha - (r + freq) * (w_3 / (alpha + T) + w_4 / (rec + alpha))
+        d_a = digamma(a + b) - digamma(a + b + freq) + w_4 / a
+        d_b = digamma(a + b) + digamma(b + freq) - digamma(b) - digamma(a + b + freq) - w_4 / b_x
+
+        total_weight = weights.sum()
+        value = -(weights * ll).sum() / total_weight + penalizer_coef * (params ** 2).sum()
+        gradient = -np.array([(weights * d).sum() for d in (d_r, d_alpha, d_a, d_b)]) * params / total_weight
+        gradient += 2 * penalizer_coef * params ** 2
+        prior_value, prior_gradient = _prior_penalty(log_params, prior, prior_strength, total_weight)
+        return value + prior_value, gradient + prior_gradient
+
+    def fit(self, frequency, recency, T, weights=None, initial_params=None, verbose=False, tol=1e-7, index=None,
+            **kwargs):
+        """
+        Fit the BG/NBD model on compressed (frequency, recency, T) patterns.
+
+        Arguments match BetaGeoFitter.fit; weights multiply the pattern counts.
+        After fitting, data holds the unique patterns and their weights.
+        """
+        frequency = np.asarray(frequency).astype(int)
+        recency = np.asarray(recency, dtype=float)
+        T = np.asarray(T, dtype=float)
+        check_inputs(frequency, recency, T)
+
+        (frequency, recency, T), weights = compress_rows(frequency, recency, T, weights=weights)
+        frequency = frequency.astype(int)
+        logger.info(f"Fitting BG/NBD model on {len(weights)} unique patterns for {int(weights.sum())} customers")
+
+        self._scale = 1.0 / T.max()
+        prior = None
+        if self.prior_params is not None:
+            # Same scaled log-space as the optimizer; the prior is also the default start
+            prior = np.log(np.asarray(self.prior_params, dtype=float) * [1, self._scale, 1, 1])
+            initial_params = prior if initial_params is None else initial_params
+        args = (frequency, recency * self._scale, T * self._scale, weights, self.penalizer_coef, prior,
+                self.prior_strength)
+        output = _minimize(lambda x: self._value_and_gradient(x, *args), 4, initial_params, tol,
+                           disp=verbose, **kwargs)
+
+        self._negative_log_likelihood_ = output.fun
+        self._hessian_ = _numerical_hessian(lambda x: self._value_and_gradient(x, *args)[1], output.x)
+        self.n_iterations_ = output.nit
+        self.params_ = pd.Series(np.exp(output.x), index=["r", "alpha", "a", "b"])
+        self.params_["alpha"] /= self._scale
+
+        self.data = pd.DataFrame({"frequency": frequency, "recency": recency, "T": T, "weights": weights})
+        self.generate_new_data = lambda size=1: beta_geometric_nbd_model(
+            T, *self._unload_params("r", "alpha", "a", "b"), size=size
+        )
+        self.predict = self.conditional_expected_number_of_purchases_up_to_time
+        self.variance_matrix_ = self._compute_variance_matrix()
+        self.standard_errors_ = self._compute_standard_errors()
+        self.confidence_intervals_ = self._compute_confidence_intervals()
+        return self
+
+class CompressedGammaGammaFitter(GammaGammaFitter):
+    """
+    Gamma-Gamma fitter that works on unique (frequency, monetary_value) pairs.
+
+    Same approach as CompressedBetaGeoFitter; the fitted object is a
+    GammaGammaFitter with params_, conditional_expected_average_profit and
+    customer_lifetime_value. prior_params (p, q, v) and prior_strength work
+    as for CompressedBetaGeoFitter.
+    """
+
+    def __init__(self, penalizer_coef=0.0, prior_params=None, prior_strength=0.0):
+        super().__init__(penalizer_coef=penalizer_coef)
+        self.prior_params = prior_params
+        self.prior_strength = prior_strength
+
+    @staticmethod
+    def _value_and_gradient(log_params, x, m, weights, penalizer_coef, prior=None, prior_strength=0.0):
+        params = np.exp(log_params)
+        p, q, v = params
+        log_xm_v = np.log(x * m + v)
+
+        ll = (gammaln(p * x + q) - gammaln(p * x) - gammaln(q) + q * np.log(v)
+              + (p * x - 1) * np.log(m) + (p * x) * np.log(x) - (p * x + q) * log_xm_v)
+        d_p = x * (digamma(p * x + q) - digamma(p * x) + np.log(m) + np.log(x) - log_xm_v)
+        d_q = digamma(p * x + q) - digamma(q) + np.log(v) - log_xm_v
+        d_v = q / v - (p * x + q) / (x * m + v)
+
+        total_weight = weights.sum()
+        value = -(weights * ll).sum() / total_weight + penalizer_coef * (params ** 2).sum()
+        gradient = -np.array([(weights * d).sum() for d in (d_p, d_q, d_v)]) * params / total_weight
+        gradient += 2 * penalizer_coef * params ** 2
+        prior_value, prior_gradient = _prior_penalty(log_params, prior, prior_strength, total_weight)
+        return value + prior_value, gradient + prior_gradient
+
+    def fit(self, frequency, monetary_value, weights=None, initial_params=None, verbose=False, tol=1e-7,
+            index=None, q_constraint=False, **kwargs):
+        """
+        Fit the Gamma-Gamma model on compressed (frequency, monetary_value) pairs.
+
+        Arguments match GammaGammaFitter.fit; weights multiply the pair counts.
+        """
+        check_inputs(frequency, monetary_value=monetary_value)
+        (frequency, monetary_value), weights = compress_rows(frequency, monetary_value, weights=weights)
+        logger.info(f"Fitting Gamma-Gamma model on {len(weights)} unique pairs for {int(weights.sum())} customers")
+
+        prior = None
+        if self.prior_params is not None:
+            prior = np.log(np.asarray(self.prior_params, dtype=float))
+            initial_params = prior if initial_params is None else initial_params
+        args = (frequency, monetary_value, weights, self.penalizer_coef, prior, self.prior_strength)
+        output = _minimize(lambda x: self._value_and_gradient(x, *args), 3, initial_params, tol,
+                           bounds=((None, None), (0, None), (None, None)) if q_constraint else None,
+                           disp=verbose, **kwargs)
+
+        self._negative_log_likelihood_ = output.fun
+        self._hessian_ = _numerical_hessian(lambda x: self._value_and_gradient(x, *args)[1], output.x)
+        self.n_iterations_ = output.nit
+        self.data = pd.DataFrame({"monetary_value": monetary_value, "frequency": frequency, "weights": weights})
+        self.params_ = pd.Series(np.exp(output.x), index=["p", "q", "v"])
+
+        self.variance_matrix_ = self._compute_variance_matrix()
+        self.standard_errors_ = self._compute_standard_errors()
+        self.confidence_intervals_ = self._compute_confidence_intervals()
+        return self
@@ -1,116 +1,174 @@
 import pandas as pd
 import numpy as np
 import logging
+from src.aggregation import customer_state, summary_from_state
+from src.ingest_cache import DEFAULT_CACHE_DIR, load_cached, read_source
+from src.instrumentation import configure_from_env, instrumented
+from src.rfm import RFMScorer
+from src.streaming import STREAM_COLUMNS
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def load_data(file_path):
+# Columns kept by the low-memory mode: what modeling needs, plus Country for segmenting
+LEAN_COLUMNS = STREAM_COLUMNS + ['Country']
+LEAN_CATEGORIES = ['InvoiceNo', 'Country']
+
+def memory_mb(df):
+    """
+    Deep memory usage of a frame in MB.
+    """
+    return df.memory_usage(deep=True).sum() / 2**20
+
+def _shrink(series):
+    if series.dtype == object:
+        return series.astype('category')
+    if pd.api.types.is_integer_dtype(series.dtype) and series.dtype.itemsize > 4:
+        info = np.iinfo(np.int32)
+        if series.empty or (series.min() >= info.min and series.max() <= info.max):
+            return series.astype(np.int32)
+    if series.dtype == np.float64:
+        shrunk = series.astype(np.float32)
+        if np.array_equal(shrunk.to_numpy(np.float64), series.to_numpy(), equal_nan=True):
+            return shrunk
+    return series
+
+def optimize_dtypes(df):
+    """
+    Shrink a transaction frame's dtypes without changing any value.
+
+    Strings become categoricals, 64-bit integers become int32 when they fit,
+    and floats become float32 only when every value round-trips exactly
+    (e.g. CustomerID with missing values; prices with cents usually do not).
+    """
+    dtypes = {col: _shrink(df[col]).dtype for col in df.columns}
+    changed = {col: dtype for col, dtype in dtypes.items() if dtype != df[col].dtype}
+    return df.astype(changed) if changed else df
+
+def _widen(series):
+    # Arithmetic and quantiles run at full precision on shrunk columns
+    if pd.api.types.is_integer_dtype(series.dtype):
+        return series.astype(np.int64, copy=False)
+    return series.astype(np.float64, copy=False)
+
+@instrumented()
+def load_data(file_path, columns=None, use_cache=True, cache_dir=DEFAULT_CACHE_DIR, low_memory=False):
     """
-    Load the online retail dataset from an Excel file.
+    Load the online retail dataset from an Excel or CSV file.
+
+    By default the file goes through the columnar ingest cache, so the
+    workbook is parsed only once per version of the source file. With
+    low_memory=True only LEAN_COLUMNS are read (unless columns is given),
+    strings are decoded as categoricals and dtypes are shrunk losslessly.
     """
     logger.info(f"Loading data from {file_path}")
-    df = pd.read_excel(file_path, engine='openpyxl')
-    logger.info(f"Data loaded. Shape: {df.shape}")
+    categories = None
+    if low_memory:
+        columns = columns or LEAN_COLUMNS
+        categories = [col for col in LEAN_CATEGORIES if col in columns]
+    if use_cache:
+        df = load_cached(file_path, columns=columns, cache_dir=cache_dir, categories=categories)
+    else:
+        df = read_source(file_path, columns=columns, categories=categories)
+    if low_memory:
+        df = optimize_dtypes(df)
+    logger.info(f"Data loaded. Shape: {df.shape}, memory: {memory_mb(df):.1f} MB")
     return df
 
-def clean_data(df):
+@instrumented()
+def clean_data(df, low_memory=False):
     """
     Clean and preprocess the data.
+
+    Rows with non-positive quantities or prices or no CustomerID are removed,
+    then outliers of Quantity, UnitPrice and TotalAmount, each IQR computed
+    on the rows kept so far. The filters are combined into one mask that is
+    applied once, and the input frame is not modified. With low_memory=True
+    only LEAN_COLUMNS are kept, dtypes are shrunk as in optimize_dtypes and
+    CustomerID is int32.
     """
     logger.info("Starting data cleaning")
     initial_shape = df.shape
-    
-    # Convert InvoiceDate to datetime if it's not already
-    if df['InvoiceDate'].dtype != 'datetime64[ns]':
-        df['InvoiceDate'] = pd.to_datetime(df['InvoiceDate'])
-    
-    # Calculate total amount
-    df['TotalAmount'] = df['Quantity'] * df['UnitPrice']
-    
-    # Remove rows with negative quantities or prices
-    df = df[(df['Quantity'] > 0) & (df['UnitPrice'] > 0)]
-    
-    # Remove rows with missing CustomerID
-    df = df.dropna(subset=['CustomerID'])
-    
-    # Convert CustomerID to int
-    df['CustomerID'] = df['CustomerID'].astype(int)
-    
+
+    if low_memory:
+        keep = [col for col in LEAN_COLUMNS if col in df.columns]
+        df = optimize_dtypes(df[keep] if len(keep) < len(df.columns) else df)
+
+    invoice_dates = df['InvoiceDate']
+    if invoice_dates.dtype != 'datetime64[ns]':
+        invoice_dates = pd.to_datetime(invoice_dates)
+    quantity, unit_price = _widen(df['Quantity']), _widen(df['UnitPrice'])
+    total_amount = quantity * unit_price
+
+    # Remove rows with negative quantities or prices, or missing CustomerID
+    mask = ((quantity > 0) & (unit_price > 0) & df['CustomerID'].notna()).to_numpy()
+
     # Remove outliers
-    for col in ['Quantity', 'UnitPrice', 'TotalAmount']:
-        Q1 = df[col].quantile(0.25)
-        Q3 = df[col].quantile(0.75)
+    for values in [quantity, unit_price, total_amount]:
+        kept = values[mask]
+        Q1 = kept.quantile(0.25)
+        Q3 = kept.quantile(0.75)
         IQR = Q3 - Q1
         lower_bound = Q1 - (1.5 * IQR)
         upper_bound = Q3 + (1.5 * IQR)
-        df = df[(df[col] >= lower_bound) & (df[col] <= upper_bound)]
-    
+        mask &= ((values >= lower_bound) & (values <= upper_bound)).to_numpy()
+
+    rows = np.flatnonzero(mask)
+    df = df.take(rows)
+    df['InvoiceDate'] = invoice_dates.take(rows)
+    df['TotalAmount'] = total_amount.take(rows)
+    df['CustomerID'] = df['CustomerID'].astype(np.int32 if low_memory else int)
+
     logger.info(f"Data cleaning completed. Initial shape: {initial_shape}, Final shape: {df.shape}")
+    if low_memory:
+        logger.info(f"Cleaned data memory: {memory_mb(df):.1f} MB")
     return df
 
-def prepare_data_for_modeling(df):
+@instrumented()
+def prepare_data_for_modeling(df, frequency='invoices'):
     """
     Prepare the data for CLTV modeling.
+
+    Recency, frequency, monetary value and T come from a single vectorized
+    grouped pass. frequency='days' counts distinct purchase days, as
+    lifetimes does, instead of invoice rows.
     """
     logger.info("Preparing data for modeling")
-    # Set the last date of the dataset
-    last_date = df['InvoiceDate'].max()
-    
-    # Group by CustomerID and calculate recency, frequency, and monetary value
-    summary = df.groupby('CustomerID').agg({
-        'InvoiceDate': lambda x: (last_date - x.max()).days,  # recency
-        'InvoiceNo': 'count',  # frequency
-        'TotalAmount': 'sum'  # monetary value
-    })
-    
-    summary.columns = ['recency', 'frequency', 'monetary']
-    
-    # Calculate T (age of the customer in days)
-    summary['T'] = (last_date - df.groupby('CustomerID')['InvoiceDate'].min()).dt.days
-    
-    # Remove customers with frequency = 1 as they can cause issues in the model
-    summary = summary[summary['frequency'] > 1]
-    
-    # Log transform monetary values
-    summary['monetary'] = np.log1p(summary['monetary'])
-    
+    state = customer_state(df, frequency=frequency)
+
+    # Recency and T are measured from the last date of the dataset; customers
+    # with frequency = 1 are removed as they can cause issues in the model,
+    # and monetary values are log transformed
+    summary = summary_from_state(state, last_date=df['InvoiceDate'].max())
+
     logger.info(f"Data prepared for modeling. Shape: {summary.shape}")
     return summary
 
-def calculate_rfm_scores(summary):
+@instrumented()
+def calculate_rfm_scores(summary, scorer=None):
     """
     Calculate RFM scores as a fallback method.
+
+    Scores come from a fitted RFMScorer; when none is given, one is fitted
+    on this summary, which gives the same quartile scores as pd.qcut.
     """
     logger.info("Calculating RFM scores")
-    
-    # Ensure we're working with a copy of the data
-    summary = summary.copy()
-    
-    # Recency: lower is better
-    summary['R_Score'] = pd.qcut(summary['recency'], q=4, labels=[4, 3, 2, 1])
-    
-    # Frequency: higher is better
-    summary['F_Score'] = pd.qcut(summary['frequency'], q=4, labels=[1, 2, 3, 4])
-    
-    # Monetary: higher is better
-    summary['M_Score'] = pd.qcut(summary['monetary'], q=4, labels=[1, 2, 3, 4])
-    
-    # Convert labels to integers
-    summary['R_Score'] = summary['R_Score'].astype(int)
-    summary['F_Score'] = summary['F_Score'].astype(int)
-    summary['M_Score'] = summary['M_Score'].astype(int)
-    
-    # Calculate RFM Score (for ranking purposes)
-    summary['RFM_Score'] = summary['R_Score'] + summary['F_Score'] + summary['M_Score']
-    
+    if scorer is None:
+        scorer = RFMScorer().fit(summary)
+
+    # Recency: lower is better; frequency and monetary: higher is better
+    summary = summary.join(scorer.transform(summary))
+
     logger.info("RFM scores calculated")
-    logger.info(f"RFM score statistics:\n{summary['RFM_Score'].describe()}")
-    logger.info(f"Sample of RFM scores:\n{summary[['recency', 'frequency', 'monetary', 'R_Score', 'F_Score', 'M_Score', 'RFM_Score']].sample(5)}")
-    
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(f"RFM score statistics:\n{summary['RFM_Score'].describe()}")
+        rfm_columns = ['recency', 'frequency', 'monetary', 'R_Score', 'F_Score', 'M_Score', 'RFM_Score']
+        logger.debug(f"Sample of RFM scores:\n{summary[rfm_columns].sample(min(5, len(summary)))}")
     return summary
 
 def main():
+    logging.basicConfig(level=logging.INFO)
+    configure_from_env()
+
     # Load data
     df = load_data('data/Online Retail.xlsx')
     
@@ -125,7 +183,8 @@ def main():
     
     logger.info("Data preparation completed.")
     logger.info(f"Final summary data shape: {summary_data_with_rfm.shape}")
-    logger.info(f"Sample of final data:\n{summary_data_with_rfm.sample(5)}")
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(f"Sample of final data:\n{summary_data_with_rfm.sample(5)}")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,156 @@
+import logging
+from collections import OrderedDict
+
+import numpy as np
+import plotly.express as px
+import plotly.graph_objs as go
+
+logger = logging.getLogger(__name__)
+
+class LRUCache:
+    """
+    Small least-recently-used cache with a bounded number of entries.
+    """
+
+    def __init__(self, maxsize=128):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key, default=None):
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key]
+        self.misses += 1
+        return default
+
+    def put(self, key, value):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+class OverviewFigures:
+    """
+    Precomputed, memoized figures for the dashboard's CLTV Overview tab.
+
+    The customers shown for a slider value n are the first n of one random
+    permutation drawn with a fixed seed, so the samples are reproducible and
+    nested. The sample, histogram bin edges and every customer's bin are
+    computed once per model version, so a histogram is a bincount over a
+    prefix and a top-K list is a partial sort of at most max_customers
+    values. Figures are built on first request (or by warm) and kept in an
+    LRU cache keyed by (model version, n).
+
+    With an AggregateIndex, the top customers chart shows the top n of all
+    customers, or of one segment through top_customers, read from the
+    index's precomputed CLV orders.
+    """
+
+    def __init__(self, result_df, model_version, max_customers=100, seed=0, nbins=20, top_k=10,
+                 size_column='monetary_value', cache=None, aggregates=None):
+        self.model_version = model_version
+        self.aggregates = aggregates
+        self.top_k = top_k
+        self.size_column = size_column
+        self.cache = cache if cache is not None else LRUCache(maxsize=64)
+
+        rng = np.random.default_rng(seed)
+        n_pool = min(max_customers, len(result_df))
+        self.pool = result_df.iloc[rng.permutation(len(result_df))[:n_pool]]
+
+        clv = self.pool['CLV'].to_numpy()
+        self.bin_edges = np.histogram_bin_edges(clv, bins=nbins)
+        self.bin_index = np.clip(np.searchsorted(self.bin_edges, clv, side='right') - 1, 0, nbins - 1)
+
+    def _top_positions(self, n):
+        clv = self.pool['CLV'].to_numpy()[:n]
+        return np.argsort(-clv, kind='stable')[:self.top_k]
+
+    def _build(self, n):
+        selected_customers = self.pool.iloc[:n]
+
+        # CLTV Distribution, from the precomputed bins
+        counts = np.bincount(self.bin_index[:n], minlength=len(self.bin_edges) - 1)
+        centers = (self.bin_edges[:-1] + self.bin_edges[1:]) / 2
+        cltv_dist = go.Figure(go.Bar(x=centers, y=counts, width=np.diff(self.bin_edges) * 0.8))
+        cltv_dist.update_layout(
+            title=f'CLTV Distribution (Random {n} Customers)',
+            xaxis_title="Customer Lifetime Value",
+            yaxis_title="Count",
+            bargap=0.2
+        )
+
+        # Recency vs Frequency
+        recency_freq = px.scatter(selected_customers, x='recency', y='frequency',
+                                  size=self.size_column, color='CLV', hover_name=selected_customers.index,
+                                  title=f'Recency vs Frequency (Random {n} Customers)')
+        recency_freq.update_layout(
+            xaxis_title="Recency (days)",
+            yaxis_title="Frequency",
+            coloraxis_colorbar_title="CLTV"
+        )
+
+        # Top Customers
+        if self.aggregates is not None:
+            return cltv_dist.to_dict(), recency_freq.to_dict(), self._top_figure(n)
+        top_customers = selected_customers.iloc[self._top_positions(n)]
+        top_cust_plot = px.bar(top_customers, x=top_customers.index, y='CLV',
+                               title=f'Top {self.top_k} Customers by CLTV (from Random {n} Customers)')
+        top_cust_plot.update_layout(
+            xaxis_title="Customer ID",
+            yaxis_title="Customer Lifetime Value"
+        )
+
+        return cltv_dist.to_dict(), recency_freq.to_dict(), top_cust_plot.to_dict()
+
+    def _top_figure(self, n, column=None, value=None):
+        top_customers = self.aggregates.top(n, column, value)
+        scope = 'All Customers' if column is None else f'{column} {value}'
+        top_cust_plot = px.bar(top_customers, x=top_customers.index.astype(str), y='CLV',
+                               title=f'Top {len(top_customers)} Customers by CLTV ({scope})')
+        top_cust_plot.update_layout(
+            xaxis_title="Customer ID",
+            yaxis_title="Customer Lifetime Value"
+        )
+        return top_cust_plot.to_dict()
+
+    def top_customers(self, n, column=None, value=None):
+        """
+        Top n customers by CLV, overall or where column == value, as a plotly dict.
+        """
+        if column is None:
+            return self.figures(n)[2]
+        key = (self.model_version, n, column, str(value))
+        figure = self.cache.get(key)
+        if figure is None:
+            figure = self._top_figure(n, column, value)
+            self.cache.put(key, figure)
+        return figure
+
+    def figures(self, n):
+        """
+        Return the three overview figures for a slider value, as plotly dicts.
+        """
+        key = (self.model_version, n)
+        figures = self.cache.get(key)
+        if figures is None:
+            figures = self._build(n)
+            self.cache.put(key, figures)
+        return figures
+
+    def warm(self, values):
+        """
+        Build the figures for every slider value ahead of the first request.
+        """
+        for n in values:
+            self.figures(n)
+        logger.info(f"Warmed overview figure cache for model version {self.model_version}")
@@ -0,0 +1,197 @@
+import functools
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+METRIC_FIELDS = ['seconds', 'rss_start_mb', 'rss_end_mb', 'peak_rss_increase_mb', 'process_peak_rss_mb',
+                 'rows_in', 'rows_out', 'iterations']
+
+# Entry points register sinks for these paths when the variables are set
+JSONL_ENV = 'CLTV_METRICS_JSONL'
+PROMETHEUS_ENV = 'CLTV_METRICS_PROM'
+
+_sinks = []
+_lock = threading.Lock()
+
+def _proc_status_mb(field):
+    # VmRSS / VmHWM from /proc/self/status (Linux), in MB
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith(f"{field}:"):
+                    return int(line.split()[1]) / 2**10
+    except OSError:
+        pass
+    return None
+
+def rss_mb():
+    """
+    Current resident set size of this process in MB, or None if unknown.
+    """
+    return _proc_status_mb('VmRSS')
+
+def peak_rss_mb():
+    """
+    Peak resident set size of this process so far, in MB, or None if unknown.
+
+    On Linux this is VmHWM, because ru_maxrss survives exec and can report
+    the parent's peak.
+    """
+    peak = _proc_status_mb('VmHWM')
+    if peak is not None or resource is None:
+        return peak
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return peak / 2**20 if sys.platform == 'darwin' else peak / 2**10
+
+def _difference(end, start):
+    return None if end is None or start is None else end - start
+
+class JsonLinesSink:
+    """
+    Append each stage record as one JSON line to a file.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def emit(self, record):
+        with _lock, open(self.path, 'a') as f:
+            f.write(json.dumps(record) + '\n')
+
+class PrometheusTextSink:
+    """
+    Keep the latest value of every stage metric and write them in the
+    Prometheus text exposition format, e.g. for the node exporter's
+    textfile collector. The file is replaced atomically on every update.
+    """
+
+    def __init__(self, path, prefix='cltv_stage'):
+        self.path = path
+        self.prefix = prefix
+        self._latest = {}
+
+    def emit(self, record):
+        with _lock:
+            self._latest[record['stage']] = record
+            lines = []
+            for field in METRIC_FIELDS:
+                name = f"{self.prefix}_{field}"
+                lines.append(f"# TYPE {name} gauge")
+                for stage, latest in sorted(self._latest.items()):
+                    if latest.get(field) is not None:
+                        lines.append(f'{name}{{stage="{stage}"}} {latest[field]}')
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w') as f:
+                f.write('\n'.join(lines) + '\n')
+            os.replace(tmp_path, self.path)
+
+class MemorySink:
+    """
+    Collect stage records in a list, for tests and notebooks.
+    """
+
+    def __init__(self):
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+def add_sink(sink):
+    """
+    Send stage metrics to a sink (any object with an emit(record) method).
+    """
+    _sinks.append(sink)
+    return sink
+
+def remove_sink(sink):
+    _sinks.remove(sink)
+
+def configure_from_env():
+    """
+    Register the sinks named by the CLTV_METRICS_JSONL and CLTV_METRICS_PROM
+    environment variables, once per process.
+    """
+    configured = {getattr(sink, 'path', None) for sink in _sinks}
+    if os.environ.get(JSONL_ENV) and os.environ[JSONL_ENV] not in configured:
+        add_sink(JsonLinesSink(os.environ[JSONL_ENV]))
+    if os.environ.get(PROMETHEUS_ENV) and os.environ[PROMETHEUS_ENV] not in configured:
+        add_sink(PrometheusTextSink(os.environ[PROMETHEUS_ENV]))
+
+def _rows(value):
+    # Row count of frames and arrays; None for models and scalars
+    shape = getattr(value, 'shape', None)
+    return int(shape[0]) if shape else None
+
+def _emit(record):
+    for sink in list(_sinks):
+        try:
+            sink.emit(record)
+        except Exception as e:
+            logger.warning(f"Metrics sink {type(sink).__name__} failed: {e}")
+
+@contextmanager
+def stage(name, rows_in=None):
+    """
+    Measure a block of work as a pipeline stage.
+
+    Yields the record, so the block can fill in rows_out or iterations.
+    On exit the record gets the wall time, the RSS at the start and end of
+    the stage, how far the stage raised the process's peak RSS
+    (peak_rss_increase_mb, 0 when it stayed below an earlier peak) and that
+    peak so far (process_peak_rss_mb). Memory is per process, so stages
+    running concurrently show up in each other's figures. The record is
+    sent to every registered sink, and logged at DEBUG level.
+    """
+    record = {'stage': name, 'rows_in': rows_in, 'rows_out': None, 'error': None}
+    start = time.perf_counter()
+    record['rss_start_mb'] = rss_mb()
+    peak_start = peak_rss_mb()
+    try:
+        yield record
+    except Exception as e:
+        record['error'] = type(e).__name__
+        raise
+    finally:
+        record['seconds'] = time.perf_counter() - start
+        record['rss_end_mb'] = rss_mb()
+        record['process_peak_rss_mb'] = peak_rss_mb()
+        record['peak_rss_increase_mb'] = _difference(record['process_peak_rss_mb'], peak_start)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Stage metrics: {record}")
+        _emit(record)
+
+def instrumented(name=None):
+    """
+    Decorator recording a function call as a pipeline stage.
+
+    Rows in are taken from the first positional argument with a shape,
+    rows out from the result, and optimizer iterations from a fitted
+    model's n_iterations_. Only the compressed fitters report iterations;
+    lifetimes does not expose them, so the field is left out for its fits.
+    """
+    def decorator(func):
+        stage_name = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            rows_in = next((rows for rows in map(_rows, args) if rows is not None), None)
+            with stage(stage_name, rows_in=rows_in) as record:
+                result = func(*args, **kwargs)
+                record['rows_out'] = _rows(result)
+                if hasattr(result, 'n_iterations_'):
+                    record['iterations'] = result.n_iterations_
+            return result
+        return wrapper
+    return decorator
@@ -0,0 +1,138 @@
+import io
+import logging
+
+import numpy as np
+import plotly.graph_objs as go
+from matplotlib.figure import Figure
+from src.figure_cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+MATRIX_TITLES = {
+    'frequency_recency': 'Expected Number of Future Purchases for 1 Unit of Time,\nby Frequency and Recency of a Customer',
+    'probability_alive': 'Probability Customer is Alive,\nby Frequency and Recency of a Customer',
+}
+
+# Matrices per (model version, kind, grid settings), shared by report and dashboard
+_matrix_cache = LRUCache(maxsize=32)
+
+def matrix_grid(max_value, bins=100, log=False):
+    """
+    Integer grid from 0 to max_value with at most bins points.
+
+    Small ranges keep every integer. Larger ones are binned evenly, or on a
+    log scale with log=True so that low values, where most customers are,
+    keep full resolution while the long tail of heavy buyers is coarse.
+    """
+    max_value = int(max_value)
+    if max_value + 1 <= bins:
+        return np.arange(max_value + 1)
+    if log:
+        grid = np.geomspace(1, max_value + 1, bins) - 1
+    else:
+        grid = np.linspace(0, max_value, bins)
+    return np.unique(np.round(grid).astype(int))
+
+class MatrixEngine:
+    """
+    Frequency/recency and probability-alive surfaces of a BG/NBD model.
+
+    Each surface is evaluated in one vectorized call over a bounded grid
+    (rows are recency, columns frequency, as in lifetimes), so its cost no
+    longer grows with max_frequency x max(T). Customers are taken to be
+    max_recency old, as in lifetimes' plots. Results are cached per model
+    version and can be rendered without a display, as PNG bytes or as a
+    plotly figure dict.
+    """
+
+    def __init__(self, bg_nbd_model, model_version=None, bins=100, log=False, t=1):
+        self.bg_nbd_model = bg_nbd_model
+        self.model_version = model_version
+        self.bins = bins
+        self.log = log
+        self.t = t
+
+    def _evaluate(self, kind, frequency, recency, T):
+        F, R = np.meshgrid(frequency, recency)
+        # Large frequencies overflow to a zero probability of being dead, which is the right limit
+        with np.errstate(over='ignore'):
+            return self._evaluate_kind(kind, F, R, T)
+
+    def _evaluate_kind(self, kind, F, R, T):
+        if kind == 'frequency_recency':
+            return self.bg_nbd_model.conditional_expected_number_of_purchases_up_to_time(self.t, F, R, T)
+        if kind == 'probability_alive':
+            return self.bg_nbd_model.conditional_probability_alive(F, R, T)
+        raise ValueError(f"Unknown matrix kind {kind!r}; expected one of {sorted(MATRIX_TITLES)}")
+
+    def matrix(self, kind, max_frequency, max_recency):
+        """
+        Return (frequency grid, recency grid, values) for one surface.
+        """
+        key = (self.model_version, kind, int(max_frequency), int(max_recency), self.bins, self.log, self.t)
+        cached = _matrix_cache.get(key) if self.model_version is not None else None
+        if cached is not None:
+            return cached
+
+        frequency = matrix_grid(max_frequency, self.bins, self.log)
+        recency = matrix_grid(max_recency, self.bins, self.log)
+        values = np.asarray(self._evaluate(kind, frequency, recency, max_recency), dtype=float)
+        result = (frequency, recency, values)
+        if self.model_version is not None:
+            _matrix_cache.put(key, result)
+        logger.info(f"Computed {kind} matrix on a {values.shape[0]}x{values.shape[1]} grid")
+        return result
+
+    def matrix_for(self, kind, summary_data):
+        """
+        Matrix sized to the observed maximum frequency and customer age.
+        """
+        return self.matrix(kind, summary_data['frequency'].max(), summary_data['T'].max())
+
+    def plot(self, kind, summary_data, ax):
+        """
+        Draw a surface on a matplotlib axis as a heatmap.
+        """
+        frequency, recency, values = self.matrix_for(kind, summary_data)
+        mesh = ax.pcolormesh(_cell_edges(frequency), _cell_edges(recency), values, shading='flat')
+        ax.invert_yaxis()
+        if self.log:
+            ax.set_xscale('symlog')
+            ax.set_yscale('symlog')
+        ax.set_xlabel("Customer's Historical Frequency")
+        ax.set_ylabel("Customer's Recency")
+        ax.set_title(MATRIX_TITLES[kind])
+        ax.figure.colorbar(mesh, ax=ax)
+        return ax
+
+    def to_png(self, kind, summary_data, figsize=(12, 8), dpi=100):
+        """
+        Render a surface to PNG bytes without a display.
+        """
+        fig = Figure(figsize=figsize)
+        self.plot(kind, summary_data, fig.subplots())
+        buffer = io.BytesIO()
+        fig.savefig(buffer, format='png', dpi=dpi, bbox_inches='tight')
+        return buffer.getvalue()
+
+    def to_figure(self, kind, summary_data):
+        """
+        Render a surface as a plotly heatmap, as a figure dict for Dash.
+        """
+        frequency, recency, values = self.matrix_for(kind, summary_data)
+        figure = go.Figure(go.Heatmap(x=frequency, y=recency, z=values, colorbar_title=''))
+        figure.update_layout(
+            title=MATRIX_TITLES[kind].replace('\n', ' '),
+            xaxis_title="Customer's Historical Frequency",
+            yaxis_title="Customer's Recency",
+            yaxis_autorange='reversed'
+        )
+        if self.log:
+            # Equal-width cells labelled with their grid values
+            figure.update_xaxes(type='category')
+            figure.update_yaxes(type='category')
+        return figure.to_dict()
+
+def _cell_edges(grid):
+    # Each grid point covers the values up to the next one
+    return np.append(grid, grid[-1] + 1) - 0.5
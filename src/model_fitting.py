@@ -1,21 +1,39 @@
 from lifetimes import BetaGeoFitter, GammaGammaFitter
 from lifetimes.utils import ConvergenceError
+from src.compressed_fitters import CompressedBetaGeoFitter, CompressedGammaGammaFitter
+from src.penalizer_search import DEFAULT_PENALIZER_COEFS, search_penalizer
 from src.data_preparation import load_data, clean_data, prepare_data_for_modeling, calculate_rfm_scores
+from src.cltv_calculation import calculate_cltv
+from src.ingest_cache import source_fingerprint
+from src.model_registry import data_fingerprint, load_latest, save_artifact
+from src.rfm import RFMScorer
+from src.instrumentation import configure_from_env, instrumented
 import logging
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def fit_bg_nbd_model(summary_data, max_attempts=5):
+DATA_PATH = 'data/Online Retail.xlsx'
+ARTIFACT_NAME = 'model_fitting'
+
+@instrumented()
+def fit_bg_nbd_model(summary_data, max_attempts=5, compressed=False, search=False, n_jobs=None):
     """
     Fit the BG/NBD model with error handling and multiple attempts.
+
+    With compressed=True customers are collapsed into unique
+    (frequency, recency, T) patterns and fitted with an analytic gradient.
+    With search=True all penalizers are fitted in parallel and the one with
+    the best holdout log-likelihood is kept (see search_penalizer).
     """
-    penalizer_coefs = [0.0, 0.001, 0.01, 0.1, 1.0]
+    if search:
+        return search_penalizer(summary_data, 'bg_nbd', DEFAULT_PENALIZER_COEFS[:max_attempts],
+                                n_jobs=n_jobs, compressed=compressed)
+    fitter_class = CompressedBetaGeoFitter if compressed else BetaGeoFitter
     
-    for attempt, penalizer_coef in enumerate(penalizer_coefs[:max_attempts], 1):
+    for attempt, penalizer_coef in enumerate(DEFAULT_PENALIZER_COEFS[:max_attempts], 1):
         try:
             logger.info(f"Attempting to fit BG/NBD model with penalizer_coef = {penalizer_coef}")
-            bgf = BetaGeoFitter(penalizer_coef=penalizer_coef)
+            bgf = fitter_class(penalizer_coef=penalizer_coef)
             bgf.fit(summary_data['frequency'], summary_data['recency'], summary_data['T'])
             logger.info(f"BG/NBD model fitted successfully with penalizer_coef = {penalizer_coef}")
             return bgf
@@ -25,16 +43,24 @@ def fit_bg_nbd_model(summary_data, max_attempts=5):
     logger.error("Failed to fit BG/NBD model after multiple attempts. Falling back to RFM analysis.")
     return None
 
-def fit_gamma_gamma_model(summary_data, max_attempts=5):
+@instrumented()
+def fit_gamma_gamma_model(summary_data, max_attempts=5, compressed=False, search=False, n_jobs=None):
     """
     Fit the Gamma-Gamma model with error handling and multiple attempts.
+
+    With compressed=True customers are collapsed into unique
+    (frequency, monetary) pairs and fitted with an analytic gradient.
+    With search=True penalizers are searched in parallel as for BG/NBD.
     """
-    penalizer_coefs = [0.0, 0.001, 0.01, 0.1, 1.0]
+    if search:
+        return search_penalizer(summary_data, 'gamma_gamma', DEFAULT_PENALIZER_COEFS[:max_attempts],
+                                n_jobs=n_jobs, compressed=compressed)
+    fitter_class = CompressedGammaGammaFitter if compressed else GammaGammaFitter
     
-    for attempt, penalizer_coef in enumerate(penalizer_coefs[:max_attempts], 1):
+    for attempt, penalizer_coef in enumerate(DEFAULT_PENALIZER_COEFS[:max_attempts], 1):
         try:
             logger.info(f"Attempting to fit Gamma-Gamma model with penalizer_coef = {penalizer_coef}")
-            ggf = GammaGammaFitter(penalizer_coef=penalizer_coef)
+            ggf = fitter_class(penalizer_coef=penalizer_coef)
             ggf.fit(summary_data['frequency'], summary_data['monetary'])
             logger.info(f"Gamma-Gamma model fitted successfully with penalizer_coef = {penalizer_coef}")
             return ggf
@@ -45,29 +71,57 @@ def fit_gamma_gamma_model(summary_data, max_attempts=5):
     return None
 
 def main():
-    # Load and prepare the actual data
-    df = load_data('data/Online Retail.xlsx')
-    df_clean = clean_data(df)
-    summary_data = prepare_data_for_modeling(df_clean)
-    
-    logger.info(f"Summary data shape: {summary_data.shape}")
-    logger.info(f"Summary data head:\n{summary_data.head()}")
-    logger.info(f"Summary data info:\n{summary_data.info()}")
+    """
+    Fit or reuse the models; returns the BG/NBD and Gamma-Gamma models, None for a model that failed to fit.
+    """
+    logging.basicConfig(level=logging.INFO)
+    configure_from_env()
+
+    # Reuse saved models for an unchanged source file without reading it
+    source_fp = source_fingerprint(DATA_PATH)
+    artifact = load_latest(ARTIFACT_NAME, source_fingerprint=source_fp, load_results=False)
+    if artifact is None:
+        # Load and prepare the actual data
+        df = load_data(DATA_PATH)
+        df_clean = clean_data(df)
+        summary_data = prepare_data_for_modeling(df_clean)
+
+        logger.info(f"Summary data shape: {summary_data.shape}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Summary data head:\n{summary_data.head()}")
+            logger.debug(f"Summary data description:\n{summary_data.describe()}")
+
+        # A rewritten file can still summarize to the same data
+        fingerprint = data_fingerprint(summary_data)
+        artifact = load_latest(ARTIFACT_NAME, data_fingerprint=fingerprint, load_results=False)
+    if artifact is not None:
+        logger.info(f"Using saved models from artifact {artifact.version}")
+        logger.info(f"BG/NBD model parameters: {artifact.bg_nbd_model.params_}")
+        logger.info(f"Gamma-Gamma model parameters: {artifact.gamma_gamma_model.params_}")
+        return artifact.bg_nbd_model, artifact.gamma_gamma_model
     
     bg_nbd_model = fit_bg_nbd_model(summary_data)
     if bg_nbd_model is None:
         summary_data_with_rfm = calculate_rfm_scores(summary_data)
         logger.info("RFM analysis completed as a fallback method.")
-        logger.info(summary_data_with_rfm.head())
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(summary_data_with_rfm.head())
+        return None, None
     else:
         gamma_gamma_model = fit_gamma_gamma_model(summary_data)
         if gamma_gamma_model is not None:
             logger.info("Both models fitted successfully.")
             logger.info(f"BG/NBD model parameters: {bg_nbd_model.params_}")
             logger.info(f"Gamma-Gamma model parameters: {gamma_gamma_model.params_}")
+            cltv_df = calculate_cltv(bg_nbd_model, gamma_gamma_model, summary_data)
+            rfm_scorer = RFMScorer().fit(summary_data)
+            results = summary_data.join(cltv_df.set_index('CustomerID')['CLV']).join(rfm_scorer.transform(summary_data))
+            save_artifact(bg_nbd_model, gamma_gamma_model, results, fingerprint,
+                          source_fp, name=ARTIFACT_NAME, rfm_scorer=rfm_scorer)
         else:
             logger.info("Only BG/NBD model fitted successfully.")
             logger.info(f"BG/NBD model parameters: {bg_nbd_model.params_}")
+        return bg_nbd_model, gamma_gamma_model
 
 if __name__ == "__main__":
     main()
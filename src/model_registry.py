@@ -0,0 +1,162 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+from datetime import datetime, timezone
+
+import pandas as pd
+from lifetimes import BetaGeoFitter, GammaGammaFitter
+from src.rfm import RFMScorer
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_REGISTRY_DIR = 'artifacts'
+MANIFEST_FILE = 'manifest.json'
+RESULTS_FILE = 'results.parquet'
+
+MODEL_CLASSES = {
+    'BetaGeoFitter': BetaGeoFitter,
+    'GammaGammaFitter': GammaGammaFitter,
+}
+
+def data_fingerprint(summary_data):
+    """
+    Content hash of a summary frame, including its index and column names.
+    """
+    digest = hashlib.sha1()
+    digest.update(json.dumps([str(col) for col in summary_data.columns]).encode())
+    digest.update(pd.util.hash_pandas_object(summary_data, index=True).values.tobytes())
+    return digest.hexdigest()[:16]
+
+class ModelArtifact:
+    """
+    A fitted BG/NBD and Gamma-Gamma model pair with its CLV result table.
+
+    rfm_scorer holds the RFM edges saved with the models, if any.
+    """
+
+    def __init__(self, version, bg_nbd_model, gamma_gamma_model, results, manifest, rfm_scorer=None):
+        self.version = version
+        self.bg_nbd_model = bg_nbd_model
+        self.gamma_gamma_model = gamma_gamma_model
+        self.results = results
+        self.manifest = manifest
+        self.rfm_scorer = rfm_scorer
+
+def describe_model(model):
+    """
+    Class, penalizer and fitted parameters of a model, as restore_model reads them.
+
+    Compressed fitters are described as their lifetimes base class.
+    """
+    base = next(cls for cls in type(model).__mro__ if cls.__name__ in MODEL_CLASSES)
+    return {
+        'class': base.__name__,
+        'penalizer_coef': model.penalizer_coef,
+        'params': {name: float(value) for name, value in model.params_.items()},
+    }
+
+def restore_model(description):
+    """
+    Rebuild a fitted lifetimes model from its saved parameters.
+
+    The restored model predicts like the original but carries no fit data,
+    so methods that default to the training data need explicit arguments.
+    """
+    model = MODEL_CLASSES[description['class']](penalizer_coef=description['penalizer_coef'])
+    model.params_ = pd.Series(description['params'])
+    if isinstance(model, BetaGeoFitter):
+        model.predict = model.conditional_expected_number_of_purchases_up_to_time
+    return model
+
+def save_artifact(bg_nbd_model, gamma_gamma_model, results, data_fingerprint, source_fingerprint=None,
+                  name='cltv', registry_dir=DEFAULT_REGISTRY_DIR, metadata=None, rfm_scorer=None):
+    """
+    Save fitted parameters, fingerprints and the CLV table as a new version.
+
+    A fitted RFMScorer's edges are stored in the manifest next to the model
+    parameters, so online and batch RFM scoring use the same edges.
+
+    The version directory is written under a temporary name and renamed into
+    place, so readers never see a partial artifact. Returns the version.
+    """
+    version = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S%fZ')
+    base_dir = os.path.join(registry_dir, name)
+    tmp_dir = os.path.join(base_dir, f".{version}.tmp")
+    os.makedirs(tmp_dir)
+
+    manifest = {
+        'version': version,
+        'created_at': datetime.now(timezone.utc).isoformat(),
+        'data_fingerprint': data_fingerprint,
+        'source_fingerprint': source_fingerprint,
+        'models': {
+            'bg_nbd': describe_model(bg_nbd_model),
+            'gamma_gamma': describe_model(gamma_gamma_model),
+        },
+        'rfm': rfm_scorer.to_dict() if rfm_scorer is not None else None,
+        'metadata': metadata or {},
+    }
+    results.to_parquet(os.path.join(tmp_dir, RESULTS_FILE))
+    with open(os.path.join(tmp_dir, MANIFEST_FILE), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.rename(tmp_dir, os.path.join(base_dir, version))
+
+    logger.info(f"Saved model artifact {name}/{version}")
+    return version
+
+def list_versions(name='cltv', registry_dir=DEFAULT_REGISTRY_DIR):
+    """
+    Return the saved versions of an artifact, oldest first.
+    """
+    base_dir = os.path.join(registry_dir, name)
+    if not os.path.isdir(base_dir):
+        return []
+    return sorted(entry for entry in os.listdir(base_dir) if not entry.startswith('.'))
+
+def load_artifact(version, name='cltv', registry_dir=DEFAULT_REGISTRY_DIR, load_results=True):
+    """
+    Load one artifact version.
+    """
+    version_dir = os.path.join(registry_dir, name, version)
+    with open(os.path.join(version_dir, MANIFEST_FILE)) as f:
+        manifest = json.load(f)
+    results = pd.read_parquet(os.path.join(version_dir, RESULTS_FILE)) if load_results else None
+    return ModelArtifact(
+        version,
+        restore_model(manifest['models']['bg_nbd']),
+        restore_model(manifest['models']['gamma_gamma']),
+        results,
+        manifest,
+        RFMScorer.from_dict(manifest['rfm']) if manifest.get('rfm') else None,
+    )
+
+def load_latest(name='cltv', registry_dir=DEFAULT_REGISTRY_DIR, data_fingerprint=None, source_fingerprint=None,
+                load_results=True):
+    """
+    Load the newest valid artifact, or None if there is none.
+
+    When fingerprints are given, only artifacts built from the same summary
+    data (or source file) qualify. Unreadable versions are skipped.
+    """
+    for version in reversed(list_versions(name, registry_dir)):
+        try:
+            artifact = load_artifact(version, name, registry_dir, load_results=load_results)
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Skipping invalid model artifact {name}/{version}: {e}")
+            continue
+        if data_fingerprint is not None and artifact.manifest['data_fingerprint'] != data_fingerprint:
+            continue
+        if source_fingerprint is not None and artifact.manifest['source_fingerprint'] != source_fingerprint:
+            continue
+        logger.info(f"Loaded model artifact {name}/{version}")
+        return artifact
+    return None
+
+def prune(name='cltv', registry_dir=DEFAULT_REGISTRY_DIR, keep=5):
+    """
+    Remove all but the newest keep versions of an artifact.
+    """
+    for version in list_versions(name, registry_dir)[:-keep]:
+        shutil.rmtree(os.path.join(registry_dir, name, version))
@@ -0,0 +1,140 @@
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from lifetimes import BetaGeoFitter, GammaGammaFitter
+from lifetimes.utils import ConvergenceError
+from src.compressed_fitters import CompressedBetaGeoFitter, CompressedGammaGammaFitter
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PENALIZER_COEFS = [0.0, 0.001, 0.01, 0.1, 1.0]
+
+MODELS = {
+    'bg_nbd': (BetaGeoFitter, CompressedBetaGeoFitter, ['frequency', 'recency', 'T']),
+    'gamma_gamma': (GammaGammaFitter, CompressedGammaGammaFitter, ['frequency', 'monetary']),
+}
+
+def initial_params(model, params, columns):
+    """
+    Convert fitted parameters into the log-space starting point the optimizer expects.
+
+    The BG/NBD fitters rescale time so that max(T) is 1, which rescales alpha.
+    """
+    if params is None:
+        return None
+    params = np.asarray(params, dtype=float).copy()
+    if model == 'bg_nbd':
+        params[1] /= np.max(columns[2])
+    return np.log(params)
+
+def _fit_candidate(model, compressed, penalizer_coef, columns, params=None):
+    """
+    Fit one candidate penalizer in a worker process.
+
+    Returns the fitted parameters, or None when the fit does not converge.
+    """
+    fitter_class = MODELS[model][1] if compressed else MODELS[model][0]
+    try:
+        fitter = fitter_class(penalizer_coef=penalizer_coef)
+        fitter.fit(*columns, initial_params=initial_params(model, params, columns))
+    except ConvergenceError:
+        return None
+    return fitter.params_.to_numpy()
+
+def holdout_negative_log_likelihood(model, params, columns):
+    """
+    Unpenalized mean negative log-likelihood of held-out customers.
+    """
+    fitter_class = MODELS[model][0]
+    weights = np.ones(len(columns[0]))
+    return float(fitter_class._negative_log_likelihood(np.log(params), *columns, weights, 0.0))
+
+def _nearest_converged(penalizer_coef, converged, penalizer_coefs):
+    """
+    Parameters of the converged candidate with the closest penalizer on a log scale.
+    """
+    # Penalizers span decades, so closeness is the distance between their logs. A penalizer of 0
+    # has no log; it is placed one decade below the smallest positive candidate.
+    positive = [coef for coef in penalizer_coefs if coef > 0]
+    floor = min(positive) / 10 if positive else 1.0
+    nearest = min(converged, key=lambda other: abs(np.log(max(other, floor)) - np.log(max(penalizer_coef, floor))))
+    return converged[nearest]
+
+def search_penalizer(summary_data, model='bg_nbd', penalizer_coefs=DEFAULT_PENALIZER_COEFS,
+                     holdout_fraction=0.2, n_jobs=None, compressed=False, seed=0):
+    """
+    Fit all candidate penalizers in parallel and pick the best on a holdout.
+
+    Customers are split at random into training and holdout sets. Every
+    penalizer is fitted on the training set at the same time in a process
+    pool; candidates that fail to converge are retried, again in parallel,
+    warm-started from the converged candidate with the nearest penalizer.
+    The chosen penalizer minimises the unpenalized mean negative
+    log-likelihood of the holdout customers, and the final model is refitted
+    on all customers warm-started from its training solution.
+
+    Like fit_bg_nbd_model and fit_gamma_gamma_model, this fits with the
+    lifetimes fitters unless compressed=True.
+
+    The returned model carries a penalizer_search_ DataFrame with the
+    per-candidate results, or None if no candidate converged.
+    """
+    columns = MODELS[model][2]
+    if model == 'gamma_gamma':
+        summary_data = summary_data[summary_data['frequency'] > 0]
+    values = [summary_data[col].to_numpy() for col in columns]
+
+    rng = np.random.default_rng(seed)
+    order = rng.permutation(len(summary_data))
+    n_holdout = max(1, int(len(order) * holdout_fraction))
+    holdout, train = order[:n_holdout], order[n_holdout:]
+    train_values = [col[train] for col in values]
+    holdout_values = [col[holdout] for col in values]
+
+    max_workers = n_jobs or min(len(penalizer_coefs), os.cpu_count() or 1)
+    results = {}
+    warm_started = set()
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        futures = {coef: pool.submit(_fit_candidate, model, compressed, coef, train_values)
+                   for coef in penalizer_coefs}
+        for coef, future in futures.items():
+            results[coef] = future.result()
+
+        converged = {coef: params for coef, params in results.items() if params is not None}
+        failed = [coef for coef in penalizer_coefs if results[coef] is None]
+        if converged and failed:
+            logger.info(f"Retrying penalizers {failed} warm-started from the nearest converged fit")
+            futures = {coef: pool.submit(_fit_candidate, model, compressed, coef, train_values,
+                                         _nearest_converged(coef, converged, penalizer_coefs))
+                       for coef in failed}
+            for coef, future in futures.items():
+                results[coef] = future.result()
+                warm_started.add(coef)
+
+    search = pd.DataFrame({
+        'penalizer_coef': penalizer_coefs,
+        'converged': [results[coef] is not None for coef in penalizer_coefs],
+        'warm_started': [coef in warm_started for coef in penalizer_coefs],
+        'holdout_nll': [np.nan if results[coef] is None
+                        else holdout_negative_log_likelihood(model, results[coef], holdout_values)
+                        for coef in penalizer_coefs],
+    })
+    logger.info(f"Penalizer search results for {model}:\n{search}")
+    if not search['converged'].any():
+        logger.error(f"No penalizer converged for the {model} model.")
+        return None
+
+    best = search.loc[search['holdout_nll'].idxmin(), 'penalizer_coef']
+    fitter_class = MODELS[model][1] if compressed else MODELS[model][0]
+    fitter = fitter_class(penalizer_coef=best)
+    try:
+        fitter.fit(*values, initial_params=initial_params(model, results[best], values))
+    except ConvergenceError:
+        logger.error(f"Refit of the {model} model with penalizer_coef = {best} did not converge.")
+        return None
+    fitter.penalizer_search_ = search
+    logger.info(f"Selected penalizer_coef = {best} for the {model} model")
+    return fitter
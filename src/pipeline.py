@@ -0,0 +1,310 @@
+import argparse
+import hashlib
+import json
+import logging
+import os
+import shutil
+import sys
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import pandas as pd
+from src.cltv_calculation import calculate_cltv_grid
+from src.data_preparation import clean_data, load_data, prepare_data_for_modeling
+from src.ingest_cache import source_fingerprint
+from src.instrumentation import configure_from_env
+from src.model_fitting import fit_bg_nbd_model, fit_gamma_gamma_model
+from src.model_registry import describe_model, restore_model
+from src.rfm import RFMScorer
+from src.segmentation import fit_segmented_models, segment_labels
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PIPELINE_DIR = 'data/.pipeline'
+DEFAULT_OUTPUT_DIR = 'reports'
+
+# Bump when a stage's code changes in a way that invalidates cached outputs
+PIPELINE_VERSION = 1
+
+class Stage:
+    """
+    One node of the pipeline DAG.
+
+    func receives the outputs of deps, in order, followed by params as
+    keyword arguments. kind selects how the output is cached: 'frame'
+    (Parquet), 'model' (a fitted model, saved as its parameters) or
+    'json'. Stages with cache=False always run when they are needed.
+    """
+
+    def __init__(self, name, func, deps=(), params=None, kind='frame', cache=True, key_extra=None):
+        self.name = name
+        self.func = func
+        self.deps = list(deps)
+        self.params = params or {}
+        self.kind = kind
+        self.cache = cache
+        self.key_extra = key_extra
+
+def _save_output(output, kind, path):
+    if kind == 'frame':
+        output.to_parquet(os.path.join(path, 'output.parquet'))
+        return
+    if kind == 'model':
+        output = None if output is None else describe_model(output)
+    with open(os.path.join(path, 'output.json'), 'w') as f:
+        json.dump(output, f)
+
+def _load_output(kind, path):
+    if kind == 'frame':
+        return pd.read_parquet(os.path.join(path, 'output.parquet'))
+    with open(os.path.join(path, 'output.json')) as f:
+        output = json.load(f)
+    if kind == 'model' and output is not None:
+        output = restore_model(output)
+    return output
+
+class PipelineRun:
+    """
+    Outcome of a pipeline run: stage keys, which stages ran, and their outputs.
+    """
+
+    def __init__(self, keys, executed, outputs):
+        self.keys = keys
+        self.executed = executed
+        self.outputs = outputs
+
+class Pipeline:
+    """
+    Runs a DAG of stages with content-addressed caching.
+
+    A stage's key hashes its name, parameters and the keys of its
+    dependencies, so changing a parameter invalidates that stage and
+    everything downstream of it and nothing else. Cached stages are skipped,
+    and their outputs are read from disk only when a stage that does run
+    needs them. Stages whose dependencies are ready run concurrently on a
+    thread pool.
+    """
+
+    def __init__(self, stages, cache_dir=DEFAULT_PIPELINE_DIR, max_workers=4):
+        self.stages = {stage.name: stage for stage in stages}
+        self.cache_dir = cache_dir
+        self.max_workers = max_workers
+        self._lock = threading.Lock()
+
+    def keys(self):
+        """
+        Content key of every stage, computed from the sources down.
+        """
+        keys = {}
+        for name in self._topological_order():
+            stage = self.stages[name]
+            payload = {
+                'version': PIPELINE_VERSION,
+                'stage': name,
+                'params': stage.params,
+                'extra': stage.key_extra,
+                'deps': [keys[dep] for dep in stage.deps],
+            }
+            keys[name] = hashlib.sha1(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()[:16]
+        return keys
+
+    def _topological_order(self):
+        order, visiting = [], set()
+
+        def visit(name):
+            if name in order:
+                return
+            if name in visiting:
+                raise ValueError(f"Pipeline has a cycle through stage {name}")
+            visiting.add(name)
+            for dep in self.stages[name].deps:
+                visit(dep)
+            visiting.discard(name)
+            order.append(name)
+
+        for name in self.stages:
+            visit(name)
+        return order
+
+    def _path(self, name, key):
+        return os.path.join(self.cache_dir, name, key)
+
+    def _is_cached(self, name, key):
+        return self.stages[name].cache and os.path.isdir(self._path(name, key))
+
+    def _to_run(self, keys, force):
+        # Terminal stages and uncached stages run; their dependencies run only if not cached
+        dependents = {name: [] for name in self.stages}
+        for stage in self.stages.values():
+            for dep in stage.deps:
+                dependents[dep].append(stage.name)
+
+        to_run = set()
+        for name in reversed(self._topological_order()):
+            needed = not dependents[name] or any(d in to_run for d in dependents[name])
+            if name in force or (needed and not self._is_cached(name, keys[name])):
+                to_run.add(name)
+        return to_run
+
+    def _output(self, name, keys, outputs):
+        with self._lock:
+            if name not in outputs:
+                outputs[name] = _load_output(self.stages[name].kind, self._path(name, keys[name]))
+            return outputs[name]
+
+    def _execute(self, name, keys, outputs):
+        stage = self.stages[name]
+        inputs = [self._output(dep, keys, outputs) for dep in stage.deps]
+        logger.info(f"Running pipeline stage {name} ({keys[name]})")
+        output = stage.func(*inputs, **stage.params)
+        if stage.cache:
+            path = self._path(name, keys[name])
+            tmp_path = f"{path}.tmp-{threading.get_ident()}"
+            os.makedirs(tmp_path, exist_ok=True)
+            _save_output(output, stage.kind, tmp_path)
+            shutil.rmtree(path, ignore_errors=True)
+            os.rename(tmp_path, path)
+        return output
+
+    def run(self, force=()):
+        """
+        Run every stage that is not cached, in dependency order.
+        """
+        keys = self.keys()
+        to_run = self._to_run(keys, set(force))
+        logger.info(f"Pipeline stages to run: {sorted(to_run)}; cached: {sorted(set(self.stages) - to_run)}")
+
+        outputs, executed, running = {}, [], {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            pending = [name for name in self._topological_order() if name in to_run]
+            while pending or running:
+                for name in list(pending):
+                    if not any(dep in pending or dep in running.values() for dep in self.stages[name].deps):
+                        pending.remove(name)
+                        running[pool.submit(self._execute, name, keys, outputs)] = name
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    output = future.result()
+                    with self._lock:
+                        outputs[name] = output
+                    executed.append(name)
+        return PipelineRun(keys, executed, outputs)
+
+def score(summary, bg_nbd_model, gamma_gamma_model, time_horizon=12, discount_rate=0.01):
+    if bg_nbd_model is None or gamma_gamma_model is None:
+        logger.warning("Models did not converge; CLV is left empty and the report falls back to RFM scores.")
+        return pd.DataFrame({'CLV': float('nan')}, index=summary.index)
+    cltv = calculate_cltv_grid(bg_nbd_model, gamma_gamma_model, summary,
+                               time_horizons=[time_horizon], discount_rates=[discount_rate])
+    return pd.DataFrame({'CLV': cltv.iloc[:, 0]})
+
+def rfm_scores(summary):
+    return RFMScorer().fit_transform(summary)
+
+def segments(clean, by='Country'):
+    return segment_labels(clean, by).to_frame()
+
+def segment_scores(summary, labels, bg_nbd_model, gamma_gamma_model, time_horizon=12, discount_rate=0.01,
+                   min_customers=200):
+    """
+    Per-segment CLV, with the global models as the prior and fallback.
+    """
+    segmented = None
+    if bg_nbd_model is not None and gamma_gamma_model is not None:
+        segmented = fit_segmented_models(summary, labels['segment'], min_customers=min_customers,
+                                         time_horizon=time_horizon, discount_rate=discount_rate,
+                                         global_models=(bg_nbd_model, gamma_gamma_model))
+    if segmented is None:
+        return pd.DataFrame({'segment': labels['segment'].reindex(summary.index), 'segment_CLV': float('nan')})
+    return segmented.clv.rename(columns={'CLV': 'segment_CLV'})
+
+def report(summary, clv, rfm, *extra, output_dir=DEFAULT_OUTPUT_DIR):
+    """
+    Join the summary, CLV, RFM scores and any extra per-customer frames and
+    write them as the results table.
+    """
+    results = summary.join(clv).join(rfm)
+    for frame in extra:
+        results = results.join(frame)
+    os.makedirs(output_dir, exist_ok=True)
+    path = os.path.join(output_dir, 'cltv_results.csv')
+    results.sort_values(['CLV', 'RFM_Score'], ascending=False).to_csv(path)
+    logger.info(f"Wrote CLTV results for {len(results)} customers to {path}")
+    return results
+
+def build_stages(data_path, frequency='invoices', compressed=True, time_horizon=12, discount_rate=0.01,
+                 output_dir=DEFAULT_OUTPUT_DIR, hash_contents=False, low_memory=False, segment_by=None):
+    """
+    The load -> clean -> summarize -> fit/rfm -> score -> report DAG.
+
+    The two fits and the RFM scores only depend on the summary, so they run
+    concurrently. load is not cached by the pipeline because load_data has its own
+    ingest cache; its key follows the source file's fingerprint. With
+    segment_by ('Country' or 'cohort'), per-segment models are fitted as
+    well and their CLV is added to the report as segment_CLV.
+    """
+    stages = [
+        Stage('load', lambda: load_data(data_path, low_memory=low_memory), cache=False,
+              key_extra=[source_fingerprint(data_path, hash_contents=hash_contents), low_memory]),
+        Stage('clean', clean_data, deps=['load'], params={'low_memory': low_memory}),
+        Stage('summarize', prepare_data_for_modeling, deps=['clean'], params={'frequency': frequency}),
+        Stage('fit_bg_nbd', fit_bg_nbd_model, deps=['summarize'], params={'compressed': compressed}, kind='model'),
+        Stage('fit_gamma_gamma', fit_gamma_gamma_model, deps=['summarize'], params={'compressed': compressed},
+              kind='model'),
+        Stage('rfm', rfm_scores, deps=['summarize']),
+        Stage('score', score, deps=['summarize', 'fit_bg_nbd', 'fit_gamma_gamma'],
+              params={'time_horizon': time_horizon, 'discount_rate': discount_rate}),
+    ]
+    report_deps = ['summarize', 'score', 'rfm']
+    if segment_by is not None:
+        stages += [
+            Stage('segments', segments, deps=['clean'], params={'by': segment_by}),
+            Stage('segment_score', segment_scores, deps=['summarize', 'segments', 'fit_bg_nbd', 'fit_gamma_gamma'],
+                  params={'time_horizon': time_horizon, 'discount_rate': discount_rate}),
+        ]
+        report_deps.append('segment_score')
+    stages.append(Stage('report', report, deps=report_deps, params={'output_dir': output_dir}, cache=False))
+    return stages
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run the CLTV pipeline: load, clean, summarize, fit, score, report.")
+    parser.add_argument('--data', default='data/Online Retail.xlsx')
+    parser.add_argument('--frequency', choices=['invoices', 'days'], default='invoices')
+    parser.add_argument('--time-horizon', type=int, default=12)
+    parser.add_argument('--discount-rate', type=float, default=0.01)
+    parser.add_argument('--lifetimes-fitters', action='store_true',
+                        help="fit with lifetimes instead of the compressed fitters")
+    parser.add_argument('--low-memory', action='store_true',
+                        help="read only the needed columns with compact dtypes")
+    parser.add_argument('--segment-by', choices=['Country', 'cohort'], default=None,
+                        help="also fit models per segment and report segment_CLV")
+    parser.add_argument('--cache-dir', default=DEFAULT_PIPELINE_DIR)
+    parser.add_argument('--output-dir', default=DEFAULT_OUTPUT_DIR)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--force', nargs='*', default=[], help="stages to rerun even if cached")
+    return parser.parse_args(argv)
+
+def run(argv=None):
+    """
+    Run the pipeline with command-line arguments and return the PipelineRun.
+    """
+    args = parse_args(argv)
+    stages = build_stages(args.data, args.frequency, not args.lifetimes_fitters, args.time_horizon,
+                          args.discount_rate, args.output_dir, low_memory=args.low_memory,
+                          segment_by=args.segment_by)
+    pipeline_run = Pipeline(stages, cache_dir=args.cache_dir, max_workers=args.workers).run(force=args.force)
+    logger.info(f"Pipeline finished; ran {pipeline_run.executed}")
+    return pipeline_run
+
+def main(argv=None):
+    """
+    Console entry point (run_cltv_analysis); returns the process exit status.
+    """
+    logging.basicConfig(level=logging.INFO)
+    configure_from_env()
+    run(argv)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,223 @@
+import argparse
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+from src.aggregate_index import AGGREGATES_FILE, AggregateIndex
+from src.model_registry import DEFAULT_REGISTRY_DIR, load_artifact, load_latest, restore_model
+from src.rfm import RFMScorer
+from src.table_query import sort_orders
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STORE_DIR = os.path.join('data', 'result_store')
+CURRENT_FILE = 'CURRENT'
+META_FILE = 'meta.json'
+
+def _write_column(values, directory, name, file_name):
+    """
+    Save one column as .npy; strings and categoricals as integer codes.
+
+    Returns the column's entry for meta.json.
+    """
+    entry = {'name': name, 'file': file_name}
+    if isinstance(values.dtype, pd.CategoricalDtype) or values.dtype == object:
+        categorical = pd.Categorical(values)
+        entry['categories'] = [str(category) for category in categorical.categories]
+        values = categorical.codes
+    np.save(os.path.join(directory, entry['file']), np.ascontiguousarray(values))
+    return entry
+
+def _write_orders(results, directory):
+    # Sort orders for the Customer Details table, so serving workers map them instead of sorting
+    entries = []
+    for i, (name, (ascending, descending, valid)) in enumerate(sort_orders(results).items()):
+        entry = {'name': name, 'ascending': f"sort_asc_{i:04d}.npy", 'descending': f"sort_desc_{i:04d}.npy",
+                 'valid': valid}
+        np.save(os.path.join(directory, entry['ascending']), ascending)
+        np.save(os.path.join(directory, entry['descending']), descending)
+        entries.append(entry)
+    return entries
+
+def _read_orders(directory, entries):
+    return {
+        entry['name']: (np.load(os.path.join(directory, entry['ascending']), mmap_mode='r'),
+                        np.load(os.path.join(directory, entry['descending']), mmap_mode='r'),
+                        entry['valid'])
+        for entry in entries
+    }
+
+def _read_column(directory, entry):
+    values = np.load(os.path.join(directory, entry['file']), mmap_mode='r')
+    if 'categories' in entry:
+        return pd.Categorical.from_codes(values, entry['categories'])
+    return values
+
+class ResultSnapshot:
+    """
+    One published version of the CLV result table, memory-mapped read-only.
+
+    results is a DataFrame whose columns are views of the mapped .npy files,
+    so every process mapping the same version shares one copy in the page
+    cache. The models and RFM edges saved with the version are restored from
+    its manifest, aggregates is its AggregateIndex when the table has a CLV
+    column, and orders are the mapped column sort orders for ResultTable
+    (None for versions published without them).
+    """
+
+    def __init__(self, version, results, meta, aggregates=None, orders=None):
+        self.version = version
+        self.results = results
+        self.meta = meta
+        self.aggregates = aggregates
+        self.orders = orders
+        self.bg_nbd_model = restore_model(meta['models']['bg_nbd'])
+        self.gamma_gamma_model = restore_model(meta['models']['gamma_gamma'])
+        self.rfm_scorer = RFMScorer.from_dict(meta['rfm']) if meta.get('rfm') else None
+
+def publish_results(results, manifest, store_dir=DEFAULT_STORE_DIR, keep=3):
+    """
+    Write a result table as memory-mappable columns and make it current.
+
+    manifest is a model artifact manifest (version, models, rfm, fingerprints).
+    Rows are stored sorted by index so lookups can binary-search the mapped
+    index. The version directory is written under a temporary name and
+    renamed into place, then the CURRENT pointer is swapped with os.replace,
+    so readers see either the old or the new version, never a mix. The CLV
+    aggregate index is built here, once per version, and mapped by readers
+    like the columns, and so are the column sort orders of the Customer
+    Details table. Versions beyond the newest keep are removed; processes
+    still mapping them keep their mapping. Returns the version.
+    """
+    version = manifest['version']
+    results = results.sort_index(kind='stable')
+    tmp_dir = os.path.join(store_dir, f".{version}.tmp")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    meta = {
+        'version': version,
+        'n_rows': len(results),
+        'index': _write_column(results.index.to_numpy(), tmp_dir, results.index.name, 'index.npy'),
+        'columns': [_write_column(results[col].to_numpy(), tmp_dir, col, f"column_{i:04d}.npy")
+                    for i, col in enumerate(results.columns)],
+        'orders': _write_orders(results, tmp_dir),
+        'models': manifest['models'],
+        'rfm': manifest.get('rfm'),
+        'data_fingerprint': manifest.get('data_fingerprint'),
+        'source_fingerprint': manifest.get('source_fingerprint'),
+    }
+    with open(os.path.join(tmp_dir, META_FILE), 'w') as f:
+        json.dump(meta, f, indent=2)
+    if 'CLV' in results.columns:
+        AggregateIndex.build(results).save(tmp_dir)
+    version_dir = os.path.join(store_dir, version)
+    shutil.rmtree(version_dir, ignore_errors=True)
+    os.rename(tmp_dir, version_dir)
+
+    current_tmp = os.path.join(store_dir, f"{CURRENT_FILE}.{os.getpid()}.tmp")
+    with open(current_tmp, 'w') as f:
+        f.write(version)
+    os.replace(current_tmp, os.path.join(store_dir, CURRENT_FILE))
+    logger.info(f"Published {len(results)} results as version {version} in {store_dir}")
+
+    versions = sorted(entry for entry in os.listdir(store_dir)
+                      if os.path.isdir(os.path.join(store_dir, entry)) and not entry.startswith('.'))
+    for stale in versions[:-keep]:
+        if stale != version:
+            shutil.rmtree(os.path.join(store_dir, stale), ignore_errors=True)
+    return version
+
+def current_version(store_dir=DEFAULT_STORE_DIR):
+    """
+    Version the CURRENT pointer names, or None if nothing is published.
+    """
+    try:
+        with open(os.path.join(store_dir, CURRENT_FILE)) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+def open_snapshot(version, store_dir=DEFAULT_STORE_DIR):
+    """
+    Map one published version read-only, without copying its columns.
+    """
+    version_dir = os.path.join(store_dir, version)
+    with open(os.path.join(version_dir, META_FILE)) as f:
+        meta = json.load(f)
+    index = pd.Index(_read_column(version_dir, meta['index']), name=meta['index']['name'], copy=False)
+    columns = {entry['name']: _read_column(version_dir, entry) for entry in meta['columns']}
+    results = pd.DataFrame(columns, index=index, copy=False)
+    aggregates = None
+    if os.path.exists(os.path.join(version_dir, AGGREGATES_FILE)):
+        aggregates = AggregateIndex.load(version_dir, results)
+    elif 'CLV' in results.columns:
+        # Versions published before the index existed get one built in this process
+        aggregates = AggregateIndex.build(results)
+    orders = _read_orders(version_dir, meta['orders']) if 'orders' in meta else None
+    return ResultSnapshot(version, results, meta, aggregates, orders)
+
+class ResultStore:
+    """
+    Per-process handle on the published result table that follows CURRENT.
+
+    current() returns the mapped snapshot of the current version and
+    switches to a newer one when CURRENT changes, checking at most every
+    check_interval seconds. build(snapshot), if given, is called once per
+    version before it is served, and its result is kept as snapshot.views
+    (e.g. the serving index and figure caches), so callers read a snapshot
+    and its views together and never mix versions.
+    """
+
+    def __init__(self, store_dir=DEFAULT_STORE_DIR, check_interval=1.0, build=None):
+        self.store_dir = store_dir
+        self.check_interval = check_interval
+        self.build = build
+        self._snapshot = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def current(self):
+        now = time.monotonic()
+        if self._snapshot is not None and now - self._checked_at < self.check_interval:
+            return self._snapshot
+        with self._lock:
+            self._checked_at = now
+            version = current_version(self.store_dir)
+            if version is None:
+                return self._snapshot
+            if self._snapshot is None or version != self._snapshot.version:
+                snapshot = open_snapshot(version, self.store_dir)
+                if self.build is not None:
+                    snapshot.views = self.build(snapshot)
+                self._snapshot = snapshot
+                logger.info(f"Serving result version {version} from {self.store_dir}")
+        return self._snapshot
+
+def publish_artifact(name, version=None, registry_dir=DEFAULT_REGISTRY_DIR, store_dir=DEFAULT_STORE_DIR):
+    """
+    Publish a saved model artifact (the latest by default) to the result store.
+    """
+    artifact = load_latest(name, registry_dir) if version is None else load_artifact(version, name, registry_dir)
+    if artifact is None:
+        raise ValueError(f"No saved artifact named {name!r} in {registry_dir}")
+    return publish_results(artifact.results, artifact.manifest, store_dir)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Publish a model artifact's results for the serving workers.")
+    parser.add_argument('--artifact', default='dashboard', help="artifact name in the model registry")
+    parser.add_argument('--version', default=None, help="artifact version (default: the latest)")
+    parser.add_argument('--registry-dir', default=DEFAULT_REGISTRY_DIR)
+    parser.add_argument('--store-dir', default=DEFAULT_STORE_DIR)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    return publish_artifact(args.artifact, args.version, args.registry_dir, args.store_dir)
+
+if __name__ == "__main__":
+    main()
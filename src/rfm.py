@@ -0,0 +1,105 @@
+import logging
+
+import numpy as np
+import pandas as pd
+from src.streaming import weighted_quantile
+
+logger = logging.getLogger(__name__)
+
+SCORE_COLUMNS = ['R_Score', 'F_Score', 'M_Score', 'RFM_Score']
+
+class RFMScorer:
+    """
+    Quantile RFM scorer with edges learned once and reused for every batch.
+
+    fit learns the inner quantile edges of recency, frequency and monetary
+    value; transform scores any batch against those fixed edges, so scores
+    stay comparable between runs and a single new customer can be scored on
+    its own. Bins are right-closed like pd.qcut, and values outside the
+    fitted range fall into the lowest or highest bin. Edges are computed
+    from per-value counts, which partial_fit accumulates chunk by chunk;
+    with decimals set, values are rounded before counting so the sketch
+    stays small on very large data at the cost of exactness.
+    """
+
+    def __init__(self, q=4, monetary_column='monetary', decimals=None):
+        self.q = q
+        self.monetary_column = monetary_column
+        self.decimals = decimals
+        self.columns = {'recency': 'recency', 'frequency': 'frequency', 'monetary': monetary_column}
+        self.edges_ = None
+        self._counts = {}
+
+    def partial_fit(self, summary):
+        """
+        Add a batch of customers to the value-count sketch and refresh the edges.
+        """
+        for name, column in self.columns.items():
+            values = summary[column].to_numpy(dtype=float)
+            if self.decimals is not None:
+                values = np.round(values, self.decimals)
+            values, counts = np.unique(values, return_counts=True)
+            if name in self._counts:
+                old_values, old_counts = self._counts[name]
+                values, inverse = np.unique(np.concatenate([old_values, values]), return_inverse=True)
+                counts = np.bincount(inverse, weights=np.concatenate([old_counts, counts])).astype(np.int64)
+            self._counts[name] = (values, counts)
+
+        quantiles = np.arange(1, self.q) / self.q
+        self.edges_ = {
+            name: [float(weighted_quantile(values, counts, p)) for p in quantiles]
+            for name, (values, counts) in self._counts.items()
+        }
+        return self
+
+    def fit(self, summary):
+        """
+        Learn the quantile edges of a summary frame.
+        """
+        self._counts = {}
+        self.partial_fit(summary)
+        logger.info(f"RFM edges fitted on {len(summary)} customers: {self.edges_}")
+        return self
+
+    def _score(self, name, values):
+        # Number of inner edges strictly below each value, i.e. a right-closed bin
+        return np.searchsorted(self.edges_[name], np.asarray(values, dtype=float), side='left') + 1
+
+    def transform(self, summary):
+        """
+        Score a batch of customers against the fitted edges.
+
+        Returns a new frame with R_Score, F_Score, M_Score and RFM_Score on
+        the same index; the input frame is neither copied nor modified.
+        """
+        if self.edges_ is None:
+            raise ValueError("RFMScorer must be fitted before transform")
+        # Recency: lower is better; frequency and monetary: higher is better
+        r_score = self.q + 1 - self._score('recency', summary[self.columns['recency']])
+        f_score = self._score('frequency', summary[self.columns['frequency']])
+        m_score = self._score('monetary', summary[self.columns['monetary']])
+        return pd.DataFrame({
+            'R_Score': r_score,
+            'F_Score': f_score,
+            'M_Score': m_score,
+            'RFM_Score': r_score + f_score + m_score,
+        }, index=summary.index)
+
+    def fit_transform(self, summary):
+        return self.fit(summary).transform(summary)
+
+    def to_dict(self):
+        """
+        Fitted state as plain JSON-serializable values, for model artifacts.
+        """
+        return {'q': self.q, 'monetary_column': self.monetary_column, 'decimals': self.decimals,
+                'edges': self.edges_}
+
+    @classmethod
+    def from_dict(cls, description):
+        """
+        Rebuild a fitted scorer from to_dict output.
+        """
+        scorer = cls(description['q'], description['monetary_column'], description['decimals'])
+        scorer.edges_ = description['edges']
+        return scorer
@@ -0,0 +1,167 @@
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+from lifetimes.utils import ConvergenceError
+from src.cltv_calculation import cltv_grid_array
+from src.compressed_fitters import CompressedBetaGeoFitter, CompressedGammaGammaFitter
+from src.model_fitting import fit_bg_nbd_model, fit_gamma_gamma_model
+from src.model_registry import describe_model, restore_model
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_KEYS = ('Country', 'cohort')
+SUMMARY_COLUMNS = ['frequency', 'recency', 'T', 'monetary']
+BG_PARAMS = ['r', 'alpha', 'a', 'b']
+GG_PARAMS = ['p', 'q', 'v']
+
+# Shared-memory summary and CLV output, attached once per worker process
+_shared = {}
+
+def segment_labels(df, by='Country', cohort_freq='Q'):
+    """
+    One segment label per customer from a cleaned transaction frame.
+
+    by='Country' labels a customer with the country of most of their
+    transactions; by='cohort' with the period (cohort_freq, quarterly by
+    default) of their first purchase.
+    """
+    if by not in SEGMENT_KEYS:
+        raise ValueError(f"by must be one of {SEGMENT_KEYS}, got {by!r}")
+    if by == 'cohort':
+        first_purchase = df.groupby('CustomerID')['InvoiceDate'].min()
+        return first_purchase.dt.to_period(cohort_freq).astype(str).rename('segment')
+    counts = df.groupby(['CustomerID', 'Country'], observed=True).size().rename('n').reset_index()
+    counts = counts.sort_values(['CustomerID', 'n'], ascending=[True, False], kind='stable')
+    return counts.drop_duplicates('CustomerID').set_index('CustomerID')['Country'].astype(str).rename('segment')
+
+def _init_worker(summary_name, clv_name, n_customers):
+    summary_shm = shared_memory.SharedMemory(name=summary_name)
+    clv_shm = shared_memory.SharedMemory(name=clv_name)
+    _shared['handles'] = (summary_shm, clv_shm)
+    _shared['summary'] = np.ndarray((n_customers, len(SUMMARY_COLUMNS)), dtype=np.float64, buffer=summary_shm.buf)
+    _shared['clv'] = np.ndarray(n_customers, dtype=np.float64, buffer=clv_shm.buf)
+
+def _fit_segment(start, stop, global_models, min_customers, prior_strength, time_horizon, discount_rate):
+    """
+    Fit and score the customers in rows start:stop of the shared summary.
+
+    Segments smaller than min_customers, or whose fits do not converge, use
+    the global models. Larger ones are fitted shrunk towards them. CLV is
+    written straight into the shared output array; returns the parameters.
+    """
+    frequency, recency, T, monetary = _shared['summary'][start:stop].T
+    bg_description, gg_description = global_models
+    status = 'fitted'
+    if stop - start < min_customers:
+        status = 'too_small'
+    else:
+        try:
+            bgf = CompressedBetaGeoFitter(
+                penalizer_coef=bg_description['penalizer_coef'], prior_strength=prior_strength,
+                prior_params=[bg_description['params'][name] for name in BG_PARAMS],
+            ).fit(frequency, recency, T)
+            ggf = CompressedGammaGammaFitter(
+                penalizer_coef=gg_description['penalizer_coef'], prior_strength=prior_strength,
+                prior_params=[gg_description['params'][name] for name in GG_PARAMS],
+            ).fit(frequency, monetary)
+        except ConvergenceError:
+            status = 'not_converged'
+    if status != 'fitted':
+        bgf, ggf = restore_model(bg_description), restore_model(gg_description)
+
+    _shared['clv'][start:stop] = cltv_grid_array(bgf, ggf, frequency, recency, T, monetary,
+                                                 [time_horizon], [discount_rate])[:, 0, 0]
+    params = {name: float(value) for model in (bgf, ggf) for name, value in model.params_.items()}
+    return dict({'n_customers': int(stop - start), 'status': status}, **params)
+
+class SegmentedModels:
+    """
+    Per-segment model parameters and CLV from fit_segmented_models.
+
+    segments has one row per segment with its size, how it was modeled
+    ('fitted', or 'too_small' / 'not_converged' for segments that use the
+    global models) and the BG/NBD and Gamma-Gamma parameters. clv holds each
+    customer's segment and CLV, indexed like the summary.
+    """
+
+    def __init__(self, segments, clv, global_models):
+        self.segments = segments
+        self.clv = clv
+        self.global_models = global_models
+
+    def models(self, segment):
+        """
+        Restored (BG/NBD, Gamma-Gamma) models of one segment.
+        """
+        row = self.segments.loc[segment]
+        bg_description, gg_description = (describe_model(model) for model in self.global_models)
+        bg_description['params'] = {name: float(row[name]) for name in BG_PARAMS}
+        gg_description['params'] = {name: float(row[name]) for name in GG_PARAMS}
+        return restore_model(bg_description), restore_model(gg_description)
+
+def fit_segmented_models(summary_data, labels, min_customers=200, prior_strength=50.0, n_jobs=None,
+                         time_horizon=12, discount_rate=0.01, global_models=None):
+    """
+    Fit BG/NBD and Gamma-Gamma models per segment in a process pool and score CLV.
+
+    labels maps CustomerID to a segment (see segment_labels); customers
+    without one form an 'Unknown' segment. The summary is sorted by segment
+    once and placed in shared memory, so each worker reads its segment as a
+    contiguous slice without copying the data through the pool, and writes
+    CLV into a shared output array. Every segment fit is pulled towards the
+    global models with the weight of prior_strength customers, so small
+    segments stay close to them and large ones are dominated by their own
+    data; segments under min_customers use the global models outright.
+
+    global_models is an optional (BG/NBD, Gamma-Gamma) pair, fitted on the
+    whole summary when not given. Returns a SegmentedModels, or None if the
+    global models cannot be fitted.
+    """
+    if global_models is None:
+        global_models = (fit_bg_nbd_model(summary_data, compressed=True),
+                         fit_gamma_gamma_model(summary_data, compressed=True))
+    if any(model is None for model in global_models):
+        logger.error("Global models did not converge; segmented fitting needs them as a fallback.")
+        return None
+
+    segment = labels.reindex(summary_data.index).fillna('Unknown').astype(str)
+    codes, names = pd.factorize(segment, sort=True)
+    order = np.argsort(codes, kind='stable')
+    bounds = np.searchsorted(codes[order], np.arange(len(names) + 1))
+    n_customers = len(summary_data)
+    logger.info(f"Fitting {len(names)} segments for {n_customers} customers")
+
+    descriptions = tuple(describe_model(model) for model in global_models)
+    summary_shm = shared_memory.SharedMemory(create=True, size=max(1, n_customers * len(SUMMARY_COLUMNS) * 8))
+    clv_shm = shared_memory.SharedMemory(create=True, size=max(1, n_customers * 8))
+    shared_summary = clv_sorted = None
+    try:
+        shared_summary = np.ndarray((n_customers, len(SUMMARY_COLUMNS)), dtype=np.float64, buffer=summary_shm.buf)
+        shared_summary[:] = summary_data[SUMMARY_COLUMNS].to_numpy(dtype=np.float64)[order]
+        max_workers = n_jobs or min(len(names), os.cpu_count() or 1)
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker,
+                                 initargs=(summary_shm.name, clv_shm.name, n_customers)) as pool:
+            futures = [pool.submit(_fit_segment, bounds[i], bounds[i + 1], descriptions, min_customers,
+                                   prior_strength, time_horizon, discount_rate)
+                       for i in range(len(names))]
+            rows = [future.result() for future in futures]
+
+        clv_sorted = np.ndarray(n_customers, dtype=np.float64, buffer=clv_shm.buf)
+        clv = np.empty(n_customers)
+        clv[order] = clv_sorted
+    finally:
+        # The views must go before the blocks can be closed
+        shared_summary = clv_sorted = None
+        summary_shm.close()
+        summary_shm.unlink()
+        clv_shm.close()
+        clv_shm.unlink()
+
+    segments = pd.DataFrame(rows, index=pd.Index(names, name='segment'))
+    logger.info(f"Segment fits: {segments['status'].value_counts().to_dict()}")
+    result = pd.DataFrame({'segment': segment, 'CLV': clv}, index=summary_data.index)
+    return SegmentedModels(segments, result, global_models)
@@ -0,0 +1,269 @@
+import logging
+import time
+
+import numpy as np
+import pandas as pd
+from flask import Blueprint, jsonify, request
+from src.cltv_calculation import cltv_grid_array
+
+logger = logging.getLogger(__name__)
+
+SCORE_FIELDS = ['frequency', 'recency', 'T', 'monetary']
+# Largest n the top-N endpoint returns, so one request cannot dump the whole table
+MAX_TOP_N = 1000
+# Scoring allocates customers x months, so both are bounded per request
+MAX_TIME_HORIZON = 120
+MAX_SCORE_ROWS = 10_000
+
+class LatencyTracker:
+    """
+    Rolling window of request latencies with p50/p99 reporting.
+    """
+
+    def __init__(self, window=10_000):
+        self._samples = np.zeros(window)
+        self._count = 0
+
+    def record(self, seconds):
+        self._samples[self._count % len(self._samples)] = seconds
+        self._count += 1
+
+    def summary(self):
+        samples = self._samples[:min(self._count, len(self._samples))]
+        if not len(samples):
+            return {'count': 0, 'p50_ms': None, 'p99_ms': None}
+        p50, p99 = np.percentile(samples, [50, 99]) * 1000
+        return {'count': self._count, 'p50_ms': float(p50), 'p99_ms': float(p99)}
+
+def _normalize_id(customer_id):
+    # Ids arrive as URL strings; the result index may hold ints or floats
+    try:
+        as_float = float(customer_id)
+    except (TypeError, ValueError):
+        return str(customer_id)
+    return int(as_float) if as_float.is_integer() else as_float
+
+def _validate_terms(time_horizon, discount_rate):
+    # Checked before scoring: the engine indexes months by horizon and would fail on 0 or less
+    if isinstance(time_horizon, bool) or not isinstance(time_horizon, (int, float)) \
+            or not np.isfinite(time_horizon) or time_horizon != int(time_horizon) \
+            or not 1 <= time_horizon <= MAX_TIME_HORIZON:
+        raise ValueError(f"time_horizon must be a whole number of months from 1 to {MAX_TIME_HORIZON}, "
+                         f"got {time_horizon!r}")
+    if isinstance(discount_rate, bool) or not isinstance(discount_rate, (int, float)) \
+            or not np.isfinite(discount_rate) or discount_rate < 0:
+        raise ValueError(f"discount_rate must be a non-negative number, got {discount_rate!r}")
+    return int(time_horizon), float(discount_rate)
+
+def _score_columns(rows):
+    if len(rows) > MAX_SCORE_ROWS:
+        raise ValueError(f"At most {MAX_SCORE_ROWS} customers can be scored per request, got {len(rows)}")
+    # Accept lifetimes' monetary_value name as well
+    rows = [row if 'monetary' in row else dict(row, monetary=row['monetary_value']) for row in rows]
+    return {field: np.array([row[field] for row in rows], dtype=float) for field in SCORE_FIELDS}
+
+class CLVService:
+    """
+    Per-customer CLV lookups and batch scoring on top of the loaded models.
+
+    Lookups go through a hash index from CustomerID to row position over
+    the column arrays of the latest CLV table, so a request costs a dict
+    lookup and a handful of scalar reads. When the table is sorted by a
+    numeric CustomerID (as the result store publishes it), the index is
+    binary-searched instead, so workers sharing a memory-mapped table do
+    not each build a dict. Batch scoring runs the vectorized
+    CLV engine on the posted rows, and RFM scores them against the saved
+    edges when an RFMScorer is given. Top-N and distribution queries are
+    answered from an AggregateIndex when one is given.
+    """
+
+    def __init__(self, result_df, bg_nbd_model, gamma_gamma_model, model_version, time_horizon=12,
+                 discount_rate=0.01, rfm_scorer=None, aggregates=None):
+        self.bg_nbd_model = bg_nbd_model
+        self.gamma_gamma_model = gamma_gamma_model
+        self.rfm_scorer = rfm_scorer
+        self.aggregates = aggregates
+        self.model_version = model_version
+        self.time_horizon = time_horizon
+        self.discount_rate = discount_rate
+        self.columns = list(result_df.columns)
+        # Categorical columns are kept as codes and decoded per lookup, so a mapped table is not materialized
+        self._values, self._categories = {}, {}
+        for col in self.columns:
+            values = result_df[col].array
+            if isinstance(values, pd.Categorical):
+                self._values[col], self._categories[col] = np.asarray(values.codes), values.categories
+            else:
+                self._values[col] = np.asarray(values)
+        index = result_df.index
+        self._ids, self._positions = None, None
+        if pd.api.types.is_numeric_dtype(index.dtype) and index.is_monotonic_increasing and index.is_unique:
+            self._ids = index.to_numpy()
+        else:
+            self._positions = {_normalize_id(customer_id): i for i, customer_id in enumerate(index)}
+        self.latency = {'lookup': LatencyTracker(), 'score': LatencyTracker()}
+
+    def _position(self, customer_id):
+        if self._positions is not None:
+            return self._positions.get(customer_id)
+        if isinstance(customer_id, str):
+            return None
+        position = int(np.searchsorted(self._ids, customer_id))
+        if position < len(self._ids) and self._ids[position] == customer_id:
+            return position
+        return None
+
+    def lookup(self, customer_id):
+        """
+        Return the CLV record of one customer, or None if unknown.
+        """
+        position = self._position(_normalize_id(customer_id))
+        if position is None:
+            return None
+        record = {'CustomerID': _normalize_id(customer_id)}
+        for col in self.columns:
+            value = self._values[col][position]
+            if col in self._categories:
+                value = self._categories[col][value] if value >= 0 else None
+            # String columns hold plain Python objects
+            record[col] = value.item() if isinstance(value, np.generic) else value
+        return record
+
+    def top(self, n, column=None, value=None):
+        """
+        Records of the n customers with the highest CLV, overall or where column == value.
+        """
+        return self.aggregates.top(n, column, value).reset_index().to_dict('records')
+
+    def distribution(self, clv=None):
+        """
+        CLV quantiles and histogram, with the percentile of clv when given.
+        """
+        body = self.aggregates.distribution()
+        if clv is not None:
+            body = {**body, 'clv': clv, 'percentile': self.aggregates.percentile(clv)}
+        return body
+
+    def segment_totals(self, column):
+        """
+        Per-group customer counts and CLV totals, as records.
+        """
+        return self.aggregates.totals(column).reset_index().to_dict('records')
+
+    def score(self, rows, time_horizon=None, discount_rate=None):
+        """
+        Score posted (frequency, recency, T, monetary) rows with the loaded models.
+
+        Raises ValueError unless time_horizon is a whole number of months
+        from 1 to MAX_TIME_HORIZON, discount_rate is a non-negative number
+        and there are at most MAX_SCORE_ROWS rows.
+        """
+        time_horizon, discount_rate = _validate_terms(
+            self.time_horizon if time_horizon is None else time_horizon,
+            self.discount_rate if discount_rate is None else discount_rate,
+        )
+        columns = _score_columns(rows)
+        clv = cltv_grid_array(
+            self.bg_nbd_model, self.gamma_gamma_model,
+            columns['frequency'], columns['recency'], columns['T'], columns['monetary'],
+            [time_horizon], [discount_rate]
+        )
+        return clv[:, 0, 0].tolist()
+
+    def score_rfm(self, rows):
+        """
+        RFM scores of posted rows against the saved edges, as records.
+        """
+        columns = _score_columns(rows)
+        columns[self.rfm_scorer.monetary_column] = columns['monetary']
+        return self.rfm_scorer.transform(pd.DataFrame(columns)).to_dict('records')
+
+def create_blueprint(get_service):
+    """
+    Flask blueprint with the CLV lookup, batch scoring, top-N, distribution,
+    segment totals and latency endpoints.
+
+    get_service is called per request, so the service can be swapped when a
+    new model version is loaded.
+    """
+    blueprint = Blueprint('clv_api', __name__, url_prefix='/api/clv')
+
+    @blueprint.route('/customers/<customer_id>', methods=['GET'])
+    def lookup(customer_id):
+        service = get_service()
+        start = time.perf_counter()
+        record = service.lookup(customer_id)
+        if record is None:
+            response = jsonify({'error': f'Unknown CustomerID {customer_id}'}), 404
+        else:
+            response = jsonify({'model_version': service.model_version, 'customer': record})
+        service.latency['lookup'].record(time.perf_counter() - start)
+        return response
+
+    @blueprint.route('/score', methods=['POST'])
+    def score():
+        service = get_service()
+        start = time.perf_counter()
+        payload = request.get_json(silent=True)
+        if isinstance(payload, list):
+            payload = {'customers': payload}
+        if not isinstance(payload, dict) or not payload.get('customers'):
+            return jsonify({'error': 'Expected a JSON list of customers'}), 400
+        try:
+            body = {
+                'model_version': service.model_version,
+                'CLV': service.score(payload['customers'], payload.get('time_horizon'), payload.get('discount_rate')),
+            }
+            if service.rfm_scorer is not None:
+                body['RFM'] = service.score_rfm(payload['customers'])
+        except (KeyError, TypeError, ValueError) as e:
+            return jsonify({'error': f'Invalid score request: {e}'}), 400
+        response = jsonify(body)
+        service.latency['score'].record(time.perf_counter() - start)
+        return response
+
+    @blueprint.route('/top', methods=['GET'])
+    def top():
+        service = get_service()
+        if service.aggregates is None:
+            return jsonify({'error': 'No aggregate index for this model version'}), 404
+        n = request.args.get('n', 10, type=int)
+        if n is None or n < 0:
+            return jsonify({'error': f"n must be a non-negative integer, got {request.args.get('n')}"}), 400
+        column, value = request.args.get('column'), request.args.get('value')
+        if column is not None and column not in service.aggregates.groups:
+            return jsonify({'error': f'Unknown segment column {column}'}), 404
+        customers = service.top(min(n, MAX_TOP_N), column, value)
+        return jsonify({'model_version': service.model_version, 'customers': customers})
+
+    @blueprint.route('/distribution', methods=['GET'])
+    def distribution():
+        service = get_service()
+        if service.aggregates is None:
+            return jsonify({'error': 'No aggregate index for this model version'}), 404
+        clv = request.args.get('clv', type=float)
+        if 'clv' in request.args and (clv is None or not np.isfinite(clv)):
+            return jsonify({'error': f"clv must be a finite number, got {request.args['clv']}"}), 400
+        body = service.distribution(clv)
+        return jsonify({'model_version': service.model_version, **body})
+
+    @blueprint.route('/segments/<column>', methods=['GET'])
+    def segments(column):
+        service = get_service()
+        if service.aggregates is None or column not in service.aggregates.groups:
+            return jsonify({'error': f'Unknown segment column {column}'}), 404
+        return jsonify({'model_version': service.model_version, 'segments': service.segment_totals(column)})
+
+    @blueprint.route('/latency', methods=['GET'])
+    def latency():
+        service = get_service()
+        return jsonify({name: tracker.summary() for name, tracker in service.latency.items()})
+
+    return blueprint
+
+def register_routes(server, get_service):
+    """
+    Register the CLV API on a Flask server (e.g. the Dash app's server).
+    """
+    server.register_blueprint(create_blueprint(get_service))
+    logger.info("Registered CLV API routes under /api/clv")
@@ -0,0 +1,157 @@
+import functools
+import logging
+
+import numpy as np
+import pandas as pd
+from src.aggregation import customer_state, merge_customer_states, summary_from_state
+
+logger = logging.getLogger(__name__)
+
+STREAM_COLUMNS = ['InvoiceNo', 'InvoiceDate', 'CustomerID', 'Quantity', 'UnitPrice']
+OUTLIER_COLUMNS = ['Quantity', 'UnitPrice', 'TotalAmount']
+
+def iter_csv_chunks(file_path, chunksize=500_000, columns=STREAM_COLUMNS):
+    """
+    Yield transaction chunks from a CSV file.
+    """
+    for chunk in pd.read_csv(file_path, usecols=columns, chunksize=chunksize):
+        yield chunk
+
+def iter_parquet_row_groups(file_path, columns=STREAM_COLUMNS):
+    """
+    Yield transaction chunks from the row groups of a Parquet file.
+    """
+    import pyarrow.parquet as pq
+
+    parquet_file = pq.ParquetFile(file_path)
+    for i in range(parquet_file.num_row_groups):
+        yield parquet_file.read_row_group(i, columns=columns).to_pandas()
+
+def csv_chunk_source(file_path, chunksize=500_000):
+    """
+    Return a re-iterable CSV chunk source for streaming_prepare_data_for_modeling.
+    """
+    return functools.partial(iter_csv_chunks, file_path, chunksize=chunksize)
+
+def parquet_chunk_source(file_path):
+    """
+    Return a re-iterable Parquet chunk source for streaming_prepare_data_for_modeling.
+    """
+    return functools.partial(iter_parquet_row_groups, file_path)
+
+def base_filter(chunk):
+    """
+    Apply the row-level filters of clean_data that do not need global statistics.
+    """
+    chunk = chunk[(chunk['Quantity'] > 0) & (chunk['UnitPrice'] > 0) & chunk['CustomerID'].notna()]
+    return chunk
+
+def _lerp(a, b, t):
+    # Same interpolation as numpy's linear quantile, so bounds match clean_data exactly
+    diff = b - a
+    return b - diff * (1 - t) if t >= 0.5 else a + diff * t
+
+def weighted_quantile(values, counts, q):
+    """
+    Linear-interpolated quantile of values repeated counts times.
+
+    Gives the same result as Series.quantile on the expanded data without
+    materialising it.
+    """
+    order = np.argsort(values, kind='stable')
+    values = np.asarray(values)[order]
+    cumulative = np.cumsum(np.asarray(counts)[order])
+    position = q * (cumulative[-1] - 1)
+    lower = int(np.floor(position))
+    upper = min(lower + 1, int(cumulative[-1]) - 1)
+    lower_value = values[np.searchsorted(cumulative, lower, side='right')]
+    upper_value = values[np.searchsorted(cumulative, upper, side='right')]
+    return _lerp(lower_value, upper_value, position - lower)
+
+def _iqr_bounds(values, counts):
+    q1 = weighted_quantile(values, counts, 0.25)
+    q3 = weighted_quantile(values, counts, 0.75)
+    iqr = q3 - q1
+    return q1 - (1.5 * iqr), q3 + (1.5 * iqr)
+
+def price_quantity_counts(chunks):
+    """
+    First pass: count rows per distinct (Quantity, UnitPrice) pair.
+
+    This is an exact, mergeable sketch of everything the IQR filter needs,
+    because TotalAmount is a function of the pair. Its size is the number of
+    distinct pairs, not the number of rows.
+    """
+    counts = None
+    for chunk in chunks:
+        chunk_counts = base_filter(chunk).groupby(['Quantity', 'UnitPrice']).size()
+        counts = chunk_counts if counts is None else counts.add(chunk_counts, fill_value=0)
+    if counts is None:
+        raise ValueError("No transaction chunks to stream")
+    return counts
+
+def outlier_bounds_from_counts(counts):
+    """
+    Derive clean_data's sequential IQR bounds from a (Quantity, UnitPrice) count sketch.
+    """
+    pairs = counts.reset_index(name='count')
+    pairs['TotalAmount'] = pairs['Quantity'] * pairs['UnitPrice']
+
+    bounds = {}
+    for col in OUTLIER_COLUMNS:
+        lower_bound, upper_bound = _iqr_bounds(pairs[col].to_numpy(), pairs['count'].to_numpy())
+        bounds[col] = (lower_bound, upper_bound)
+        pairs = pairs[(pairs[col] >= lower_bound) & (pairs[col] <= upper_bound)]
+    return bounds
+
+def clean_chunk(chunk, bounds):
+    """
+    Clean one chunk the way clean_data does, using precomputed outlier bounds.
+
+    All filters are combined into a single mask.
+    """
+    chunk = chunk.copy()
+    if chunk['InvoiceDate'].dtype != 'datetime64[ns]':
+        chunk['InvoiceDate'] = pd.to_datetime(chunk['InvoiceDate'])
+    chunk['TotalAmount'] = chunk['Quantity'] * chunk['UnitPrice']
+
+    mask = (chunk['Quantity'] > 0) & (chunk['UnitPrice'] > 0) & chunk['CustomerID'].notna()
+    for col, (lower_bound, upper_bound) in bounds.items():
+        mask &= (chunk[col] >= lower_bound) & (chunk[col] <= upper_bound)
+    chunk = chunk[mask]
+    chunk['CustomerID'] = chunk['CustomerID'].astype(int)
+    return chunk
+
+def streaming_customer_state(chunk_source, bounds=None):
+    """
+    Build per-customer state from a re-iterable chunk source in bounded memory.
+
+    chunk_source is a callable returning a fresh iterator of raw transaction
+    chunks. Unless bounds are given, a cheap first pass over Quantity and
+    UnitPrice computes the exact global IQR bounds. Returns (state, bounds).
+    """
+    if bounds is None:
+        bounds = outlier_bounds_from_counts(price_quantity_counts(chunk_source()))
+        logger.info(f"Streaming outlier bounds: {bounds}")
+
+    states = []
+    n_rows = 0
+    for chunk in chunk_source():
+        cleaned = clean_chunk(chunk, bounds)
+        n_rows += len(cleaned)
+        states.append(customer_state(cleaned))
+        # Keep the number of partial states bounded
+        if len(states) >= 16:
+            states = [merge_customer_states(states)]
+    state = merge_customer_states(states)
+    logger.info(f"Streamed {n_rows} cleaned rows into {len(state)} customer states")
+    return state, bounds
+
+def streaming_prepare_data_for_modeling(chunk_source):
+    """
+    Out-of-core equivalent of clean_data followed by prepare_data_for_modeling.
+    """
+    state, _ = streaming_customer_state(chunk_source)
+    summary = summary_from_state(state)
+    logger.info(f"Data prepared for modeling. Shape: {summary.shape}")
+    return summary
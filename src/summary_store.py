@@ -0,0 +1,145 @@
+import json
+import logging
+import os
+import shutil
+
+import pandas as pd
+from src.aggregation import customer_state, fold_customer_state, summary_from_state
+from src.streaming import (OUTLIER_COLUMNS, clean_chunk, outlier_bounds_from_counts, price_quantity_counts,
+                           streaming_customer_state)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STORE_DIR = os.path.join('data', 'summary_store')
+
+def _included_pairs(counts, bounds):
+    """
+    Boolean mask of the (Quantity, UnitPrice) pairs that survive the outlier filter.
+    """
+    quantity = counts.index.get_level_values('Quantity').to_numpy()
+    unit_price = counts.index.get_level_values('UnitPrice').to_numpy()
+    values = {'Quantity': quantity, 'UnitPrice': unit_price, 'TotalAmount': quantity * unit_price}
+    mask = True
+    for col in OUTLIER_COLUMNS:
+        lower_bound, upper_bound = bounds[col]
+        mask = mask & (values[col] >= lower_bound) & (values[col] <= upper_bound)
+    return mask
+
+class CustomerSummaryStore:
+    """
+    Persisted per-customer state that can be updated with new transactions.
+
+    The store keeps first and last purchase, invoice count and monetary sum
+    per customer, plus the (Quantity, UnitPrice) count sketch from which
+    clean_data's outlier bounds are derived. A daily update only touches the
+    new rows, and the summary it produces is identical to a full rebuild.
+    """
+
+    def __init__(self, state, counts, bounds):
+        self.state = state
+        self.counts = counts
+        self.bounds = bounds
+
+    @classmethod
+    def build(cls, chunk_source):
+        """
+        Build the store from the full history.
+
+        chunk_source is a callable returning a fresh iterator of raw
+        transaction chunks, as in src.streaming.
+        """
+        counts = price_quantity_counts(chunk_source())
+        state, bounds = streaming_customer_state(chunk_source, bounds=outlier_bounds_from_counts(counts))
+        logger.info(f"Built customer summary store with {len(state)} customers")
+        return cls(state, counts, bounds)
+
+    @classmethod
+    def from_dataframe(cls, df):
+        """
+        Build the store from raw transactions held in memory.
+        """
+        return cls.build(lambda: iter([df]))
+
+    def summary(self):
+        """
+        Return the prepare_data_for_modeling summary at the latest observation date.
+        """
+        return summary_from_state(self.state)
+
+    def update_summary(self, new_transactions, rebuild_source=None):
+        """
+        Fold one batch of raw transactions into the store and return the new summary.
+
+        Only the new rows are cleaned and aggregated, and only their
+        customers' state is updated; recency and T shift to
+        the new observation end when the summary is produced. If the new rows
+        move the outlier bounds far enough to change whether earlier rows are
+        kept, the state cannot be patched, and the store is rebuilt from
+        rebuild_source (a chunk source over the full history including the
+        new rows). Without one, a ValueError is raised.
+        """
+        counts = self.counts.add(price_quantity_counts([new_transactions]), fill_value=0)
+        bounds = outlier_bounds_from_counts(counts)
+
+        if bounds != self.bounds:
+            old_mask = _included_pairs(self.counts, self.bounds)
+            new_mask = _included_pairs(self.counts, bounds)
+            if (old_mask != new_mask).any():
+                if rebuild_source is None:
+                    raise ValueError("New transactions change which historical rows pass the outlier "
+                                     "filter; pass rebuild_source to rebuild the store")
+                logger.warning("Outlier bounds moved past historical rows; rebuilding customer summary store")
+                rebuilt = CustomerSummaryStore.build(rebuild_source)
+                self.state, self.counts, self.bounds = rebuilt.state, rebuilt.counts, rebuilt.bounds
+                return self.summary()
+
+        cleaned = clean_chunk(new_transactions, bounds)
+        self.state = fold_customer_state(self.state, customer_state(cleaned))
+        self.counts = counts
+        self.bounds = bounds
+        logger.info(f"Folded {len(cleaned)} new rows into customer summary store")
+        return self.summary()
+
+    def save(self, store_dir=DEFAULT_STORE_DIR):
+        """
+        Persist the store to a directory.
+
+        The files are written to a temporary directory that then replaces
+        store_dir, so a crash mid-save leaves the previous store intact.
+        """
+        store_dir = os.path.normpath(store_dir)
+        tmp_dir = f"{store_dir}.tmp-{os.getpid()}"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+        self.state.to_parquet(os.path.join(tmp_dir, 'state.parquet'))
+        self.counts.rename('count').to_frame().to_parquet(os.path.join(tmp_dir, 'counts.parquet'))
+        with open(os.path.join(tmp_dir, 'bounds.json'), 'w') as f:
+            json.dump({col: list(bound) for col, bound in self.bounds.items()}, f)
+
+        old_dir = None
+        if os.path.exists(store_dir):
+            old_dir = f"{store_dir}.old-{os.getpid()}"
+            os.replace(store_dir, old_dir)
+        os.replace(tmp_dir, store_dir)
+        if old_dir is not None:
+            shutil.rmtree(old_dir, ignore_errors=True)
+
+    @classmethod
+    def load(cls, store_dir=DEFAULT_STORE_DIR):
+        """
+        Load a store saved with save().
+        """
+        state = pd.read_parquet(os.path.join(store_dir, 'state.parquet'))
+        counts = pd.read_parquet(os.path.join(store_dir, 'counts.parquet'))['count']
+        with open(os.path.join(store_dir, 'bounds.json')) as f:
+            bounds = {col: tuple(bound) for col, bound in json.load(f).items()}
+        return cls(state, counts, bounds)
+
+def update_summary(new_transactions, store_dir=DEFAULT_STORE_DIR, rebuild_source=None):
+    """
+    Load the persisted store, fold in new transactions, save it and return the summary.
+    """
+    store = CustomerSummaryStore.load(store_dir)
+    summary = store.update_summary(new_transactions, rebuild_source=rebuild_source)
+    store.save(store_dir)
+    return summary
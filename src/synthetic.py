@@ -0,0 +1,139 @@
+import logging
+import os
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+TRANSACTION_COLUMNS = ['InvoiceNo', 'StockCode', 'Description', 'Quantity', 'InvoiceDate', 'UnitPrice',
+                       'CustomerID', 'Country']
+
+COUNTRIES = ['United Kingdom', 'Germany', 'France', 'EIRE', 'Spain', 'Netherlands', 'Belgium', 'Switzerland',
+             'Portugal', 'Australia']
+COUNTRY_WEIGHTS = [0.89, 0.02, 0.02, 0.02, 0.01, 0.01, 0.01, 0.01, 0.005, 0.005]
+
+# Rough averages used to size customer blocks to a chunk of rows
+MEAN_ROWS_PER_CUSTOMER = 20
+
+def _catalogue(seed, n_products=4000):
+    rng = np.random.default_rng([seed, 2**32 - 1])
+    codes = np.array([f"{code}" for code in rng.choice(np.arange(10000, 99999), n_products, replace=False)])
+    descriptions = np.array([f"PRODUCT {code}" for code in codes])
+    prices = np.round(rng.lognormal(0.8, 0.9, n_products), 2)
+    popularity = rng.dirichlet(np.full(n_products, 0.3))
+    return codes, descriptions, prices, popularity
+
+def _customer_block(rng, first_customer, n_customers, start, days, catalogue, params):
+    """
+    Transactions of one block of customers, each following a BG/NBD process.
+
+    Every customer arrives at a random time, buys at a gamma-distributed
+    rate and drops out after each purchase with a beta-distributed
+    probability; each purchase is an invoice of several product lines.
+    """
+    r, alpha, a, b = params
+    codes, descriptions, prices, popularity = catalogue
+
+    birth = rng.uniform(0, days, n_customers)
+    rate = rng.gamma(r, 1 / alpha, n_customers)
+    dropout = rng.beta(a, b, n_customers)
+    n_events = np.minimum(rng.geometric(dropout), 500)
+
+    # Purchase times: arrival, then exponential gaps until dropout or the end of the period
+    owner = np.repeat(np.arange(n_customers), n_events)
+    gaps = rng.exponential(1.0, len(owner)) / rate[owner]
+    starts = np.cumsum(n_events) - n_events
+    gaps[starts] = 0.0
+    cumulative = np.cumsum(gaps)
+    times = birth[owner] + cumulative - np.repeat(cumulative[starts], n_events)
+    keep = times < days
+    owner, times = owner[keep], times[keep]
+
+    # Invoice lines
+    n_invoices = len(owner)
+    lines = rng.geometric(0.2, n_invoices)
+    invoice = np.repeat(np.arange(n_invoices), lines)
+    product = rng.choice(len(codes), len(invoice), p=popularity)
+    quantity = rng.geometric(0.15, len(invoice))
+    unit_price = prices[product] * rng.choice([1.0, 0.85, 1.25], len(invoice), p=[0.8, 0.1, 0.1])
+
+    # About 2% of invoices are cancellations, and about a fifth have no customer attached
+    cancelled = rng.random(n_invoices) < 0.02
+    anonymous = rng.random(n_invoices) < 0.2
+    quantity = np.where(cancelled[invoice], -quantity, quantity)
+    customer_ids = np.where(anonymous, np.nan, first_customer + owner).astype(float)
+    country = rng.choice(len(COUNTRIES), n_customers, p=COUNTRY_WEIGHTS)[owner]
+    timestamps = pd.Timestamp(start) + pd.to_timedelta(np.round(times * 1440), unit='m')
+
+    frame = pd.DataFrame({
+        'invoice': invoice,
+        'cancelled': cancelled[invoice],
+        'StockCode': codes[product],
+        'Description': descriptions[product],
+        'Quantity': quantity,
+        'InvoiceDate': timestamps[invoice],
+        'UnitPrice': np.round(unit_price, 2),
+        'CustomerID': customer_ids[invoice],
+        'Country': np.asarray(COUNTRIES, dtype=object)[country[invoice]],
+    })
+    return frame
+
+def iter_transactions(n_rows, seed=0, chunk_size=1_000_000, start='2010-12-01', days=373,
+                      params=(0.8, 40.0, 0.5, 3.0)):
+    """
+    Yield deterministic Online Retail-shaped transactions in chunks.
+
+    Chunks hold about chunk_size rows and together exactly n_rows; each is
+    generated from its own seed, so memory stays bounded at any n_rows and
+    the same arguments always give the same data. params are the BG/NBD
+    (r, alpha, a, b) used to simulate customers, with time in days.
+    """
+    catalogue = _catalogue(seed)
+    customers_per_block = max(1, chunk_size // MEAN_ROWS_PER_CUSTOMER)
+    produced, next_customer, next_invoice, block = 0, 12346, 536365, 0
+    while produced < n_rows:
+        rng = np.random.default_rng([seed, block])
+        frame = _customer_block(rng, next_customer, customers_per_block, start, days, catalogue, params)
+        frame = frame.iloc[:n_rows - produced]
+        if len(frame):
+            invoice_numbers = (next_invoice + frame['invoice'].to_numpy()).astype(str)
+            frame.insert(0, 'InvoiceNo', np.where(frame['cancelled'], np.char.add('C', invoice_numbers),
+                                                  invoice_numbers).astype(object))
+            next_invoice += int(frame['invoice'].iloc[-1]) + 1
+            produced += len(frame)
+            yield frame[TRANSACTION_COLUMNS].reset_index(drop=True)
+        next_customer += customers_per_block
+        block += 1
+
+def generate_transactions(n_rows, seed=0, chunk_size=1_000_000, **kwargs):
+    """
+    Return n_rows of synthetic transactions as one DataFrame.
+    """
+    return pd.concat(list(iter_transactions(n_rows, seed, chunk_size, **kwargs)), ignore_index=True)
+
+def write_transactions(path, n_rows, seed=0, chunk_size=1_000_000, **kwargs):
+    """
+    Stream synthetic transactions to a CSV or Parquet file, chunk by chunk.
+
+    Parquet files get one row group per chunk, so they can be read back
+    with parquet_chunk_source.
+    """
+    tmp_path = f"{path}.tmp"
+    if path.endswith('.parquet'):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        writer = None
+        for chunk in iter_transactions(n_rows, seed, chunk_size, **kwargs):
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(tmp_path, table.schema)
+            writer.write_table(table)
+        writer.close()
+    else:
+        for i, chunk in enumerate(iter_transactions(n_rows, seed, chunk_size, **kwargs)):
+            chunk.to_csv(tmp_path, mode='w' if i == 0 else 'a', header=i == 0, index=False)
+    os.replace(tmp_path, path)
+    logger.info(f"Wrote {n_rows} synthetic transactions to {path}")
+    return path
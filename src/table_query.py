@@ -0,0 +1,222 @@
+import logging
+import math
+import re
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Dash filter queries look like "{CLV} s> 100 && {Country} contains Fra"; the
+# relational operators may carry an s (case-sensitive) or i (insensitive) prefix
+FILTER_PART = re.compile(
+    r"^\{(?P<column>[^}]+)\}\s*"
+    r"(?P<operator>[si]?(?:>=|<=|!=|<|>|=|eq|ne|lt|le|gt|ge|contains|datestartswith))\s*"
+    r"(?P<value>.*)$"
+)
+
+OPERATORS = {
+    '>=': 'ge', '<=': 'le', '!=': 'ne', '<': 'lt', '>': 'gt', '=': 'eq',
+    'eq': 'eq', 'ne': 'ne', 'lt': 'lt', 'le': 'le', 'gt': 'gt', 'ge': 'ge',
+    'contains': 'contains', 'datestartswith': 'datestartswith',
+}
+
+def parse_filter_query(filter_query):
+    """
+    Split a Dash filter_query into (column, operator, value) triples.
+
+    Parts that cannot be parsed are ignored, as the native filter does.
+    """
+    filters = []
+    for part in (filter_query or '').split(' && '):
+        match = FILTER_PART.match(part.strip())
+        if not match:
+            continue
+        operator = match.group('operator')
+        if operator[0] in 'si' and operator[1:] in OPERATORS:
+            operator = operator[1:]
+        value = match.group('value').strip()
+        if len(value) >= 2 and value[0] == value[-1] and value[0] in '\'"`':
+            value = value[1:-1]
+        else:
+            try:
+                value = float(value)
+            except ValueError:
+                pass
+        filters.append((match.group('column'), OPERATORS[operator], value))
+    return filters
+
+def _codes(values):
+    # Categorical (and string) columns as (codes, categories as strings); other columns as (values, None)
+    if values.dtype == object:
+        values = pd.Categorical(values)
+    array = values.array if hasattr(values, 'array') else values
+    if isinstance(array, pd.Categorical):
+        return np.asarray(array.codes), np.asarray(array.categories.astype(str), dtype=object)
+    return np.asarray(array), None
+
+def _sort_key(values, categories):
+    # Categories sort in category order with missing codes (-1) last, like NaN in a numeric column
+    if categories is None:
+        return values
+    return np.where(values < 0, len(categories), values)
+
+def _search_order(values, ascending, valid, value, side):
+    """
+    np.searchsorted over values[ascending[:valid]] without gathering it.
+
+    Only the O(log n) probed positions are read, so a mapped column is not
+    copied per query (bisect's key= would do the same, but needs Python 3.10).
+    """
+    lower, upper = 0, valid
+    while lower < upper:
+        middle = (lower + upper) // 2
+        probe = values[ascending[middle]]
+        if probe < value or (side == 'right' and probe == value):
+            lower = middle + 1
+        else:
+            upper = middle
+    return lower
+
+def sort_orders(df):
+    """
+    Stable ascending and descending row orders of every column and a named index.
+
+    Returns {column: (ascending, descending, n_valid)}. Missing values come
+    last in ascending order and first in descending order, and ties keep
+    table order in both. n_valid is the number of non-missing values, which
+    lead the ascending order.
+    """
+    columns = {df.index.name: df.index} if df.index.name else {}
+    columns.update({col: df[col] for col in df.columns})
+    orders = {}
+    for col, column in columns.items():
+        values, categories = _codes(column)
+        key = _sort_key(values, categories)
+        ascending = np.argsort(key, kind='stable')
+        sorted_values = key[ascending]
+        missing = pd.isna(sorted_values) if categories is None else sorted_values == len(categories)
+        # Dense ranks; every missing value counts as distinct, so they keep their table order
+        new_value = np.ones(len(sorted_values), dtype=bool)
+        new_value[1:] = (sorted_values[1:] != sorted_values[:-1]) | missing[1:]
+        ranks = np.empty(len(sorted_values), dtype=np.int64)
+        ranks[ascending] = np.cumsum(new_value) - 1
+        orders[col] = (ascending, np.argsort(-ranks, kind='stable'), int(len(missing) - missing.sum()))
+    return orders
+
+class ResultTable:
+    """
+    Pre-sorted, indexed table behind a server-side DataTable.
+
+    Every column has a stable ascending and descending order, either passed
+    in (the result store publishes them with each version, so workers map
+    them instead of sorting) or computed once at construction. Range
+    filters on numeric columns are answered with binary search through the
+    ascending order, single-column sorts reuse the orders, and only the
+    requested page is turned into records. The frame is read in place, not
+    copied: categorical columns stay as codes, and only the rows of a page
+    are decoded, so a memory-mapped result table stays shared. A named
+    index is shown as the first column.
+    """
+
+    def __init__(self, df, orders=None):
+        self.df = df
+        self.columns = ([df.index.name] if df.index.name else []) + list(df.columns)
+        columns = {df.index.name: df.index} if df.index.name else {}
+        columns.update({col: df[col] for col in df.columns})
+        self._values, self._categories = {}, {}
+        for col, column in columns.items():
+            self._values[col], self._categories[col] = _codes(column)
+        self._orders = orders if orders is not None else sort_orders(df)
+
+    def __len__(self):
+        return len(self.df)
+
+    def _numeric(self, column):
+        return self._categories[column] is None and np.issubdtype(self._values[column].dtype, np.number)
+
+    def _text_mask(self, column, operator, value):
+        categories = self._categories[column]
+        values = self._values[column]
+        if categories is None:
+            # Numeric column compared as text; only happens for a text operator or value
+            codes, categories = pd.factorize(values.astype(str))
+            values, categories = codes, np.asarray(categories, dtype=object)
+        text = pd.Series(categories, dtype=object).astype(str)
+        if operator == 'datestartswith':
+            matches = text.str.startswith(str(value)).to_numpy()
+        elif operator == 'contains':
+            matches = text.str.contains(str(value), regex=False).to_numpy()
+        elif operator in ('eq', 'ne'):
+            matches = (text == str(value)).to_numpy()
+        else:
+            return np.zeros(len(values), dtype=bool)
+        # Matching is decided once per category, then looked up by code
+        mask = np.isin(values, np.flatnonzero(matches))
+        return ~mask if operator == 'ne' else mask
+
+    def _filter_mask(self, column, operator, value):
+        values = self._values[column]
+        if operator in ('contains', 'datestartswith') or not self._numeric(column) or isinstance(value, str):
+            return self._text_mask(column, operator, value)
+        if operator == 'ne':
+            return values != value
+
+        # Binary search through the ascending order, then mark the matching positions
+        ascending, _, valid = self._orders[column]
+        lower, upper = 0, valid
+        if operator in ('eq', 'ge'):
+            lower = _search_order(values, ascending, valid, value, 'left')
+        elif operator == 'gt':
+            lower = _search_order(values, ascending, valid, value, 'right')
+        if operator in ('eq', 'le'):
+            upper = _search_order(values, ascending, valid, value, 'right')
+        elif operator == 'lt':
+            upper = _search_order(values, ascending, valid, value, 'left')
+        mask = np.zeros(len(values), dtype=bool)
+        mask[ascending[lower:upper]] = True
+        return mask
+
+    def _ranks(self, column, positions):
+        # Dense ranks of the selected rows only, so multi-column sorts need no per-column state
+        values = _sort_key(self._values[column][positions], self._categories[column])
+        _, ranks = np.unique(values, return_inverse=True)
+        return ranks
+
+    def query(self, filter_query=None, sort_by=None):
+        """
+        Return the row positions matching the filters, in display order.
+        """
+        mask = None
+        for column, operator, value in parse_filter_query(filter_query):
+            if column not in self._values:
+                continue
+            part = self._filter_mask(column, operator, value)
+            mask = part if mask is None else mask & part
+
+        sort_by = [s for s in (sort_by or []) if s.get('column_id') in self._values]
+        if len(sort_by) == 1:
+            ascending, descending, _ = self._orders[sort_by[0]['column_id']]
+            order = descending if sort_by[0].get('direction') == 'desc' else ascending
+            return order if mask is None else order[mask[order]]
+
+        positions = np.arange(len(self.df)) if mask is None else np.flatnonzero(mask)
+        if sort_by:
+            keys = []
+            for s in reversed(sort_by):
+                ranks = self._ranks(s['column_id'], positions)
+                keys.append(-ranks if s.get('direction') == 'desc' else ranks)
+            positions = positions[np.lexsort(keys)]
+        return positions
+
+    def page(self, page_current=0, page_size=10, sort_by=None, filter_query=None):
+        """
+        Return (records, page_count) for one page of a DataTable.
+        """
+        positions = self.query(filter_query, sort_by)
+        page_current = page_current or 0
+        start = page_current * page_size
+        rows = self.df.iloc[positions[start:start + page_size]]
+        rows = rows.reset_index(drop=not self.df.index.name)
+        page_count = max(1, math.ceil(len(positions) / page_size))
+        return rows.to_dict('records'), page_count
@@ -1,33 +1,22 @@
 import matplotlib.pyplot as plt
 import seaborn as sns
-from lifetimes.plotting import plot_frequency_recency_matrix, plot_probability_alive_matrix
+from src.matrix_engine import MatrixEngine
 
-def plot_frequency_recency_matrix(bg_nbd_model, summary_data, ax=None):
+def plot_frequency_recency_matrix(bg_nbd_model, summary_data, ax=None, model_version=None, bins=100, log=False):
     """
     Plot the frequency/recency matrix.
     """
     if ax is None:
         fig, ax = plt.subplots(figsize=(12, 8))
-    plot_frequency_recency_matrix(bg_nbd_model, 
-                                  T=summary_data['T'].max(), 
-                                  max_frequency=summary_data['frequency'].max(), 
-                                  max_recency=summary_data['T'].max(),
-                                  ax=ax)
-    ax.set_title('Expected Number of Future Purchases for 1 Unit of Time,\nby Frequency and Recency of a Customer')
-    return ax
+    return MatrixEngine(bg_nbd_model, model_version, bins=bins, log=log).plot('frequency_recency', summary_data, ax)
 
-def plot_probability_alive_matrix(bg_nbd_model, summary_data, ax=None):
+def plot_probability_alive_matrix(bg_nbd_model, summary_data, ax=None, model_version=None, bins=100, log=False):
     """
     Plot the probability alive matrix.
     """
     if ax is None:
         fig, ax = plt.subplots(figsize=(12, 8))
-    plot_probability_alive_matrix(bg_nbd_model, 
-                                  max_frequency=summary_data['frequency'].max(), 
-                                  max_recency=summary_data['T'].max(),
-                                  ax=ax)
-    ax.set_title('Probability Customer is Alive,\nby Frequency and Recency of a Customer')
-    return ax
+    return MatrixEngine(bg_nbd_model, model_version, bins=bins, log=log).plot('probability_alive', summary_data, ax)
 
 def plot_cltv_distribution(cltv_df, ax=None):
     """
@@ -35,34 +24,36 @@ def plot_cltv_distribution(cltv_df, ax=None):
     """
     if ax is None:
         fig, ax = plt.subplots(figsize=(10, 6))
-    sns.histplot(cltv_df['clv'], kde=True, ax=ax)
+    sns.histplot(cltv_df['CLV' if 'CLV' in cltv_df else 'clv'], kde=True, ax=ax)
     ax.set_title('Distribution of Customer Lifetime Value')
     ax.set_xlabel('Customer Lifetime Value')
     return ax
 
-def main():
-    # This is just a placeholder. In a real scenario, you would load the model, summary data, and CLTV results here.
-    import pandas as pd
-    from src.model_fitting import fit_bg_nbd_model
+def main(output_path='cltv_report.png'):
+    from src.model_fitting import DATA_PATH, fit_bg_nbd_model, fit_gamma_gamma_model
     from src.data_preparation import load_data, clean_data, prepare_data_for_modeling
     from src.cltv_calculation import calculate_cltv
     
-    df = load_data('data/online_retail.csv')
+    df = load_data(DATA_PATH)
     df_clean = clean_data(df)
     summary_data = prepare_data_for_modeling(df_clean)
     
-    bg_nbd_model = fit_bg_nbd_model(summary_data)
-    gamma_gamma_model = fit_gamma_gamma_model(summary_data)
+    bg_nbd_model = fit_bg_nbd_model(summary_data, compressed=True)
+    gamma_gamma_model = fit_gamma_gamma_model(summary_data, compressed=True)
+    if bg_nbd_model is None or gamma_gamma_model is None:
+        return
     
     cltv_df = calculate_cltv(bg_nbd_model, gamma_gamma_model, summary_data)
     
     fig, axes = plt.subplots(2, 2, figsize=(20, 16))
-    plot_frequency_recency_matrix(bg_nbd_model, summary_data, ax=axes[0, 0])
-    plot_probability_alive_matrix(bg_nbd_model, summary_data, ax=axes[0, 1])
+    plot_frequency_recency_matrix(bg_nbd_model, summary_data, ax=axes[0, 0], log=True)
+    plot_probability_alive_matrix(bg_nbd_model, summary_data, ax=axes[0, 1], log=True)
     plot_cltv_distribution(cltv_df, ax=axes[1, 0])
     
+    # Rendered without a display, so the report also runs on servers and in CI
     plt.tight_layout()
-    plt.show()
+    fig.savefig(output_path)
+    plt.close(fig)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+import pytest
+from src.aggregate_index import AggregateIndex
+
+@pytest.fixture
+def result_df():
+    rng = np.random.default_rng(0)
+    clv = rng.lognormal(5, 1, 300)
+    clv[:5] = np.nan
+    return pd.DataFrame({
+        'CLV': clv,
+        'Country': rng.choice(['France', 'Germany', 'United Kingdom'], 300),
+        'RFM_Score': rng.integers(3, 13, 300),
+    }, index=pd.Index(range(1000, 1300), name='CustomerID'))
+
+def test_top_matches_nlargest(result_df):
+    index = AggregateIndex.build(result_df)
+
+    pd.testing.assert_frame_equal(index.top(20), result_df.nlargest(20, 'CLV'))
+    germany = result_df[result_df['Country'] == 'Germany']
+    pd.testing.assert_frame_equal(index.top(15, 'Country', 'Germany'), germany.nlargest(15, 'CLV'))
+    assert len(index.top(1000, 'RFM_Score', 12)) == (result_df.dropna()['RFM_Score'] == 12).sum()
+    assert index.top(5, 'Country', 'Spain').empty
+    with pytest.raises(ValueError):
+        index.top(-1)
+    with pytest.raises(ValueError):
+        index.top(-1, 'Country', 'Germany')
+
+def test_distribution_and_totals(result_df):
+    index = AggregateIndex.build(result_df)
+    clv = result_df['CLV'].dropna()
+
+    assert index.percentile(clv.median()) == pytest.approx((clv <= clv.median()).mean())
+    assert index.count_between(100, 300) == clv.between(100, 300).sum()
+    assert sum(index.distribution()['histogram']['counts']) == len(clv)
+    np.testing.assert_allclose(index.distribution()['quantiles']['edges'], clv.quantile(np.linspace(0, 1, 11)))
+    totals = result_df.dropna().groupby('Country')['CLV'].agg(['count', 'sum', 'max'])
+    np.testing.assert_allclose(index.totals('Country')[['customers', 'total_CLV', 'max_CLV']], totals)
+
+def test_saved_index_is_memory_mapped(result_df, tmp_path):
+    built = AggregateIndex.build(result_df)
+    built.save(str(tmp_path))
+    loaded = AggregateIndex.load(str(tmp_path), result_df)
+
+    assert isinstance(loaded.order, np.memmap)
+    pd.testing.assert_frame_equal(loaded.top(10, 'Country', 'France'), built.top(10, 'Country', 'France'))
+    pd.testing.assert_frame_equal(loaded.totals('RFM_Score'), built.totals('RFM_Score'))
+    assert loaded.percentile(200.0) == built.percentile(200.0)
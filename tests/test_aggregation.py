@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+import pytest
+from src.aggregation import customer_state, fold_customer_state, merge_customer_states
+from src.data_preparation import prepare_data_for_modeling
+
+@pytest.fixture
+def cleaned_df():
+    return pd.DataFrame({
+        'CustomerID': [2, 1, 1, 2, 1, 3],
+        'InvoiceDate': pd.to_datetime(['2021-02-01', '2021-01-01 09:00', '2021-01-01 17:00',
+                                       '2021-02-15', '2021-01-15', '2021-03-01']),
+        'InvoiceNo': ['B001', 'A001', 'A002', 'B002', 'A003', 'C001'],
+        'TotalAmount': [90.0, 10.0, 40.0, 160.0, 20.0, 250.0]
+    })
+
+def test_prepare_data_for_modeling_matches_groupby(cleaned_df):
+    last_date = cleaned_df['InvoiceDate'].max()
+    expected = cleaned_df.groupby('CustomerID').agg({
+        'InvoiceDate': lambda x: (last_date - x.max()).days,
+        'InvoiceNo': 'count',
+        'TotalAmount': 'sum'
+    })
+    expected.columns = ['recency', 'frequency', 'monetary']
+    expected['T'] = (last_date - cleaned_df.groupby('CustomerID')['InvoiceDate'].min()).dt.days
+    expected = expected[expected['frequency'] > 1]
+    expected['monetary'] = np.log1p(expected['monetary'])
+
+    summary = prepare_data_for_modeling(cleaned_df)
+
+    pd.testing.assert_frame_equal(summary, expected[summary.columns])
+
+def test_customer_state_counts_distinct_days(cleaned_df):
+    state = customer_state(cleaned_df, frequency='days')
+
+    assert state.loc[1, 'frequency'] == 2
+    assert state.loc[2, 'frequency'] == 2
+    assert state.loc[1, 'monetary_sum'] == 70.0
+    assert state.loc[1, 'first_purchase'] == pd.Timestamp('2021-01-01 09:00')
+
+def test_fold_customer_state_matches_merge(cleaned_df):
+    history, new_rows = cleaned_df.iloc[:4], cleaned_df.iloc[4:]
+    expected = merge_customer_states([customer_state(history), customer_state(new_rows)])
+
+    state = customer_state(history)
+    before = state.copy()
+    returning_only = fold_customer_state(state, customer_state(new_rows[new_rows['CustomerID'] == 1]))
+    folded = fold_customer_state(returning_only, customer_state(new_rows[new_rows['CustomerID'] == 3]))
+
+    pd.testing.assert_frame_equal(folded, expected)
+    pd.testing.assert_frame_equal(state, before)
+    assert returning_only.loc[1, 'frequency'] == state.loc[1, 'frequency'] + 1
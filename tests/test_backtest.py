@@ -0,0 +1,35 @@
+import numpy as np
+import pandas as pd
+import pytest
+from src.aggregation import customer_state, summary_from_state
+from src.backtest import backtest, calibration_holdout_summaries, rolling_cutoffs
+from src.data_preparation import clean_data
+from src.synthetic import generate_transactions
+
+@pytest.fixture(scope='module')
+def transactions():
+    return clean_data(generate_transactions(100_000, seed=2))
+
+def test_incremental_windows_match_direct_aggregation(transactions):
+    cutoffs = rolling_cutoffs(transactions, n_cutoffs=3, holdout_days=60, step_days=45)
+    windows = calibration_holdout_summaries(transactions, cutoffs, holdout_days=60)
+
+    for cutoff in cutoffs:
+        calibration = transactions[transactions['InvoiceDate'] < cutoff]
+        holdout = transactions[(transactions['InvoiceDate'] >= cutoff)
+                               & (transactions['InvoiceDate'] < cutoff + pd.Timedelta(days=60))]
+        expected = summary_from_state(customer_state(calibration, frequency='days'), last_date=cutoff)
+        actual = customer_state(holdout, frequency='days').reindex(expected.index, fill_value=0)
+
+        pd.testing.assert_frame_equal(windows[cutoff][expected.columns], expected)
+        np.testing.assert_array_equal(windows[cutoff]['actual_purchases'], actual['frequency'])
+        np.testing.assert_allclose(windows[cutoff]['actual_spend'], actual['monetary_sum'])
+
+def test_backtest_reports_every_cutoff_and_candidate(transactions):
+    candidates = {'compressed': {'compressed': True}, 'lifetimes': {'compressed': False}}
+    results = backtest(transactions, candidates, n_cutoffs=2, holdout_days=60, n_jobs=2)
+
+    assert len(results) == 4
+    assert results['converged'].all()
+    assert (results['purchases_rmse'] >= results['purchases_mae']).all()
+    assert (results['spend_actual_total'] > 0).all()
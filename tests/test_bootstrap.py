@@ -0,0 +1,30 @@
+import os
+
+import pytest
+from lifetimes.datasets import load_cdnow_summary_data_with_monetary_value
+from src.bootstrap import bootstrap_cltv_intervals, bootstrap_params
+
+@pytest.fixture
+def summary_data():
+    summary = load_cdnow_summary_data_with_monetary_value()
+    return summary[summary['frequency'] > 0].rename(columns={'monetary_value': 'monetary'})
+
+def test_bootstrap_cltv_intervals(summary_data):
+    intervals = bootstrap_cltv_intervals(summary_data, n_replicates=4, n_jobs=2)
+
+    assert list(intervals.columns) == ['CLV_p5', 'CLV_p50', 'CLV_p95', 'n_replicates']
+    assert intervals.index.equals(summary_data.index)
+    assert (intervals['CLV_p5'] <= intervals['CLV_p50']).all()
+    assert (intervals['CLV_p50'] <= intervals['CLV_p95']).all()
+    assert (intervals['n_replicates'] == 4).all()
+
+def test_bootstrap_resumes_from_checkpoints(summary_data, tmp_path):
+    first = bootstrap_params(summary_data, n_replicates=2, n_jobs=2, checkpoint_dir=tmp_path)
+    os.remove(tmp_path / 'replicate_00001.json')
+    resumed = bootstrap_params(summary_data, n_replicates=3, n_jobs=2, checkpoint_dir=tmp_path)
+
+    assert resumed[:2] == first
+    assert sorted(os.listdir(tmp_path)) == ['config.json'] + [f'replicate_0000{i}.json' for i in range(3)]
+
+    with pytest.raises(ValueError):
+        bootstrap_params(summary_data, n_replicates=3, penalizer_coef=0.1, checkpoint_dir=tmp_path)
@@ -1,7 +1,8 @@
+import numpy as np
 import pandas as pd
 import pytest
 from src.model_fitting import fit_bg_nbd_model, fit_gamma_gamma_model
-from src.cltv_calculation import calculate_cltv
+from src.cltv_calculation import calculate_cltv, calculate_cltv_grid
 
 @pytest.fixture
 def sample_summary_data():
@@ -24,4 +25,24 @@ def test_calculate_cltv(sample_summary_data, fitted_models):
     
     assert 'clv' in cltv_df.columns
     assert len(cltv_df) == len(sample_summary_data)
-    assert (cltv_df['clv'] >= 0).all()
\ No newline at end of file
+    assert (cltv_df['clv'] >= 0).all()
+
+def test_calculate_cltv_grid_matches_lifetimes(sample_summary_data, fitted_models):
+    bg_nbd_model, gamma_gamma_model = fitted_models
+    grid = calculate_cltv_grid(bg_nbd_model, gamma_gamma_model, sample_summary_data,
+                               time_horizons=[3, 12], discount_rates=[0.01, 0.1], chunk_size=2)
+    
+    assert grid.shape == (len(sample_summary_data), 4)
+    for time_horizon in [3, 12]:
+        for discount_rate in [0.01, 0.1]:
+            expected = gamma_gamma_model.customer_lifetime_value(
+                bg_nbd_model,
+                sample_summary_data['frequency'],
+                sample_summary_data['recency'],
+                sample_summary_data['T'],
+                sample_summary_data['monetary'],
+                time=time_horizon,
+                freq='D',
+                discount_rate=discount_rate
+            )
+            np.testing.assert_allclose(grid[(time_horizon, discount_rate)], expected, rtol=1e-10)
\ No newline at end of file
@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+from lifetimes import BetaGeoFitter, GammaGammaFitter
+from lifetimes.datasets import load_cdnow_summary_data_with_monetary_value
+from src.compressed_fitters import CompressedBetaGeoFitter, CompressedGammaGammaFitter, check_inputs, compress_rows
+from src.model_fitting import fit_bg_nbd_model, fit_gamma_gamma_model
+
+@pytest.fixture
+def cdnow_summary():
+    return load_cdnow_summary_data_with_monetary_value()
+
+def test_compress_rows_sums_weights():
+    (frequency, recency), weights = compress_rows([1, 2, 1, 1], [5, 3, 5, 4])
+
+    assert frequency.tolist() == [1, 1, 2]
+    assert recency.tolist() == [4, 5, 3]
+    assert weights.tolist() == [1, 2, 1]
+
+def test_check_inputs_rejects_invalid_summaries():
+    check_inputs([0, 2], [0, 3], [4, 5], monetary_value=[1.0, 2.0])
+
+    with pytest.raises(ValueError, match="larger than T"):
+        check_inputs([1, 2], [5, 3], [4, 5])
+    with pytest.raises(ValueError, match="negative recency"):
+        check_inputs([1], [-1], [4])
+    with pytest.raises(ValueError, match="non-zero recency"):
+        check_inputs([0], [2], [4])
+    with pytest.raises(ValueError, match="non-integer"):
+        check_inputs([1.5], monetary_value=[2.0])
+    with pytest.raises(ValueError, match="non-integer"):
+        check_inputs([-1], monetary_value=[2.0])
+    with pytest.raises(ValueError, match="shape"):
+        check_inputs([1, 2], monetary_value=[2.0])
+    with pytest.raises(ValueError, match="non-positive"):
+        check_inputs([1], monetary_value=[0.0])
+
+def test_bg_nbd_parity_with_lifetimes(cdnow_summary):
+    args = (cdnow_summary['frequency'], cdnow_summary['recency'], cdnow_summary['T'])
+    reference = BetaGeoFitter(penalizer_coef=0.001).fit(*args)
+    model = CompressedBetaGeoFitter(penalizer_coef=0.001).fit(*args)
+
+    assert len(model.data) < len(cdnow_summary)
+    np.testing.assert_allclose(model.params_, reference.params_, rtol=1e-4)
+    np.testing.assert_allclose(model.predict(30, *args), reference.predict(30, *args), rtol=1e-4)
+
+def test_gamma_gamma_parity_with_lifetimes(cdnow_summary):
+    repeat = cdnow_summary[cdnow_summary['frequency'] > 0]
+    reference = GammaGammaFitter(penalizer_coef=0.001).fit(repeat['frequency'], repeat['monetary_value'])
+    model = CompressedGammaGammaFitter(penalizer_coef=0.001).fit(repeat['frequency'], repeat['monetary_value'])
+
+    np.testing.assert_allclose(model.params_, reference.params_, rtol=1e-4)
+    np.testing.assert_allclose(
+        model.conditional_expected_average_profit(repeat['frequency'], repeat['monetary_value']),
+        reference.conditional_expected_average_profit(repeat['frequency'], repeat['monetary_value']),
+        rtol=1e-4
+    )
+
+def test_model_fitting_compressed_option(cdnow_summary):
+    repeat = cdnow_summary[cdnow_summary['frequency'] > 0].rename(columns={'monetary_value': 'monetary'})
+    bgf = fit_bg_nbd_model(repeat, compressed=True)
+    ggf = fit_gamma_gamma_model(repeat, compressed=True)
+
+    assert isinstance(bgf, BetaGeoFitter)
+    assert isinstance(ggf, GammaGammaFitter)
+    assert len(bgf.params_) == 4
+    assert len(ggf.params_) == 3
+
+def test_prior_shrinks_towards_prior_params(cdnow_summary):
+    sample = cdnow_summary[:300]
+    args = (sample['frequency'], sample['recency'], sample['T'])
+    prior = [0.5, 10.0, 0.5, 2.0]
+    free = CompressedBetaGeoFitter(penalizer_coef=0.001).fit(*args)
+    shrunk = CompressedBetaGeoFitter(penalizer_coef=0.001, prior_params=prior, prior_strength=1e4).fit(*args)
+
+    np.testing.assert_allclose(shrunk.params_, prior, rtol=1e-2)
+    assert not np.allclose(free.params_, prior, rtol=0.5)
@@ -1,6 +1,8 @@
+import logging
+
 import pandas as pd
 import pytest
-from src.data_preparation import clean_data, prepare_data_for_modeling
+from src.data_preparation import calculate_rfm_scores, clean_data, prepare_data_for_modeling
 
 @pytest.fixture
 def sample_df():
@@ -29,4 +31,33 @@ def test_prepare_data_for_modeling(sample_df):
     assert len(summary_data) == len(sample_df['CustomerID'].unique())
     assert (summary_data['frequency'] > 0).all()
     assert (summary_data['monetary'] > 0).all()
-    assert (summary_data['T'] >= summary_data['recency']).all()
\ No newline at end of file
+    assert (summary_data['T'] >= summary_data['recency']).all()
+
+def test_low_memory_clean_matches_default(sample_df):
+    df = sample_df.assign(CustomerID=[1.0, 1.0, None, 2.0, 3.0], UnitPrice=[10.1, 20, 30, 40, 50],
+                          Description='item', Country='United Kingdom')
+    default = clean_data(df)
+    lean = clean_data(df, low_memory=True)
+
+    assert 'Description' not in lean.columns
+    assert lean['Country'].dtype == 'category'
+    assert lean['CustomerID'].dtype == 'int32'
+    assert lean['Quantity'].dtype == 'int32'
+    # 10.1 does not round-trip through float32, so prices stay float64
+    assert lean['UnitPrice'].dtype == 'float64'
+    pd.testing.assert_frame_equal(prepare_data_for_modeling(lean), prepare_data_for_modeling(default))
+    assert 'TotalAmount' not in df.columns
+
+def test_rfm_diagnostics_logged_only_at_debug(caplog):
+    summary = pd.DataFrame({'recency': [0, 10, 20, 30], 'frequency': [1, 2, 3, 4],
+                            'monetary': [5.0, 15.0, 25.0, 35.0], 'T': 40})
+
+    with caplog.at_level(logging.INFO, logger='src.data_preparation'):
+        calculate_rfm_scores(summary)
+    assert 'RFM score statistics' not in caplog.text
+
+    with caplog.at_level(logging.DEBUG, logger='src.data_preparation'):
+        scored = calculate_rfm_scores(summary)
+    assert 'RFM score statistics' in caplog.text
+    assert 'Sample of RFM scores' in caplog.text
+    assert 'RFM_Score' in scored.columns
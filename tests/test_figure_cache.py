@@ -0,0 +1,37 @@
+import numpy as np
+import pandas as pd
+import pytest
+from src.figure_cache import LRUCache, OverviewFigures
+
+@pytest.fixture
+def result_df():
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({
+        'frequency': rng.integers(1, 10, 200),
+        'recency': rng.integers(0, 300, 200),
+        'monetary_value': rng.uniform(10, 500, 200),
+        'CLV': rng.lognormal(5, 1, 200)
+    }, index=pd.Index(range(1000, 1200), name='CustomerID'))
+
+def test_lru_cache_evicts_least_recently_used():
+    cache = LRUCache(maxsize=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    cache.get('a')
+    cache.put('c', 3)
+
+    assert 'a' in cache and 'c' in cache and 'b' not in cache
+
+def test_overview_figures_are_reproducible_and_cached(result_df):
+    figures = OverviewFigures(result_df, 'v1')
+    first = figures.figures(30)
+
+    assert figures.figures(30) is first
+    assert figures.cache.hits == 1
+    assert sum(first[0]['data'][0]['y']) == 30
+    top = first[2]['data'][0]['y']
+    expected = figures.pool.iloc[:30].nlargest(10, 'CLV')['CLV'].to_numpy()
+    np.testing.assert_allclose(top, expected)
+
+    again = OverviewFigures(result_df, 'v2').figures(30)
+    np.testing.assert_allclose(again[2]['data'][0]['y'], top)
@@ -0,0 +1,39 @@
+import os
+import pandas as pd
+import pytest
+from src.ingest_cache import load_cached, cache_path_for
+
+@pytest.fixture
+def sample_csv(tmp_path):
+    path = tmp_path / 'transactions.csv'
+    pd.DataFrame({
+        'InvoiceNo': ['536365', 'C536379', '536366'],
+        'CustomerID': [1, 2, None],
+        'InvoiceDate': ['2021-01-01', '2021-01-15', '2021-02-01'],
+        'Quantity': [1, 2, 3],
+        'UnitPrice': [10.0, 20.0, 30.0]
+    }).to_csv(path, index=False)
+    return str(path)
+
+def test_load_cached_writes_and_reads_cache(sample_csv, tmp_path):
+    cache_dir = str(tmp_path / 'cache')
+    df = load_cached(sample_csv, cache_dir=cache_dir)
+    assert os.path.exists(cache_path_for(sample_csv, cache_dir))
+    assert df['InvoiceDate'].dtype == 'datetime64[ns]'
+
+    subset = load_cached(sample_csv, columns=['CustomerID', 'Quantity'], cache_dir=cache_dir)
+    assert list(subset.columns) == ['CustomerID', 'Quantity']
+    assert subset['Quantity'].tolist() == [1, 2, 3]
+
+def test_load_cached_rebuilds_when_source_changes(sample_csv, tmp_path):
+    cache_dir = str(tmp_path / 'cache')
+    old_path = cache_path_for(sample_csv, cache_dir)
+    load_cached(sample_csv, cache_dir=cache_dir)
+
+    with open(sample_csv, 'a') as f:
+        f.write('536367,3,2021-03-01,4,40.0\n')
+    df = load_cached(sample_csv, cache_dir=cache_dir)
+
+    assert len(df) == 4
+    assert not os.path.exists(old_path)
+    assert len(os.listdir(cache_dir)) == 1
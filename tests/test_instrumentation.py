@@ -0,0 +1,82 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+from src.data_preparation import clean_data
+from src.instrumentation import (JsonLinesSink, MemorySink, PrometheusTextSink, add_sink, remove_sink, rss_mb,
+                                 stage)
+from src.model_fitting import fit_gamma_gamma_model
+
+@pytest.fixture
+def sink():
+    sink = add_sink(MemorySink())
+    yield sink
+    remove_sink(sink)
+
+@pytest.fixture
+def sample_data():
+    return pd.DataFrame({
+        'InvoiceNo': ['1', '2', '3', '4', '5'],
+        'StockCode': ['A', 'B', 'C', 'D', 'E'],
+        'Description': ['Item A', 'Item B', 'Item C', 'Item D', 'Item E'],
+        'Quantity': [1, 2, -1, 3, 1],
+        'InvoiceDate': pd.date_range(start='2021-01-01', periods=5),
+        'UnitPrice': [10.0, 20.0, 15.0, 5.0, 12.0],
+        'CustomerID': [1, 2, 3, None, 5],
+        'Country': ['UK', 'USA', 'France', 'Germany', 'Spain']
+    })
+
+def test_stage_records_rows_and_time(sink, sample_data):
+    clean_data(sample_data)
+    record = sink.records[-1]
+
+    assert record['stage'] == 'clean_data'
+    assert record['rows_in'] == 5
+    assert record['rows_out'] == 3
+    assert record['seconds'] >= 0
+    assert record['process_peak_rss_mb'] > 0
+    assert record['peak_rss_increase_mb'] >= 0
+
+def test_stage_records_optimizer_iterations(sink):
+    summary = pd.DataFrame({'frequency': [1, 2, 3, 4, 5], 'monetary': [100, 200, 300, 400, 500]})
+    fit_gamma_gamma_model(summary, compressed=True)
+
+    assert sink.records[-1]['stage'] == 'fit_gamma_gamma_model'
+    assert sink.records[-1]['iterations'] > 0
+
+def test_lifetimes_fit_leaves_out_iterations(sink):
+    summary = pd.DataFrame({'frequency': [1, 2, 3, 4, 5], 'monetary': [100, 200, 300, 400, 500]})
+    fit_gamma_gamma_model(summary)
+
+    assert 'iterations' not in sink.records[-1]
+
+@pytest.mark.skipif(rss_mb() is None, reason="current RSS is only read on Linux")
+def test_stage_records_its_own_memory(sink):
+    with stage('allocate'):
+        block = np.ones(50 * 2**20 // 8)
+    del block
+
+    assert sink.records[-1]['rss_end_mb'] - sink.records[-1]['rss_start_mb'] > 40
+
+def test_failed_stage_is_recorded(sink):
+    with pytest.raises(KeyError):
+        with stage('broken', rows_in=3):
+            raise KeyError('CustomerID')
+
+    assert sink.records[-1]['error'] == 'KeyError'
+
+def test_json_lines_and_prometheus_sinks(tmp_path):
+    sinks = [add_sink(JsonLinesSink(tmp_path / 'metrics.jsonl')), add_sink(PrometheusTextSink(tmp_path / 'metrics.prom'))]
+    try:
+        with stage('score', rows_in=10) as record:
+            record['rows_out'] = 10
+    finally:
+        for sink in sinks:
+            remove_sink(sink)
+
+    line = json.loads((tmp_path / 'metrics.jsonl').read_text())
+    assert line['stage'] == 'score' and line['rows_out'] == 10
+    prom = (tmp_path / 'metrics.prom').read_text()
+    assert 'cltv_stage_rows_in{stage="score"} 10' in prom
+    assert '# TYPE cltv_stage_seconds gauge' in prom
@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+from lifetimes.datasets import load_cdnow_summary_data_with_monetary_value
+from src.compressed_fitters import CompressedBetaGeoFitter
+from src.matrix_engine import MatrixEngine, matrix_grid
+
+@pytest.fixture
+def summary_data():
+    return load_cdnow_summary_data_with_monetary_value()
+
+@pytest.fixture
+def bgf(summary_data):
+    return CompressedBetaGeoFitter(penalizer_coef=0.01).fit(
+        summary_data['frequency'], summary_data['recency'], summary_data['T'])
+
+def test_matrix_grid_is_bounded():
+    assert list(matrix_grid(5, bins=10)) == [0, 1, 2, 3, 4, 5]
+    grid = matrix_grid(100_000, bins=50, log=True)
+    assert len(grid) <= 50
+    assert grid[0] == 0 and grid[-1] == 100_000
+    assert list(grid[:5]) == [0, 1, 2, 3, 4]
+
+def test_matrix_matches_pointwise_model(bgf, summary_data):
+    frequency, recency, values = MatrixEngine(bgf, bins=20).matrix('frequency_recency', 30, 38)
+    i, j = 7, 11
+
+    assert values.shape == (len(recency), len(frequency))
+    expected = bgf.conditional_expected_number_of_purchases_up_to_time(1, frequency[j], recency[i], 38)
+    assert values[i, j] == pytest.approx(expected)
+
+def test_matrix_cached_per_model_version(bgf, summary_data):
+    engine = MatrixEngine(bgf, model_version='v1', log=True)
+    first = engine.matrix_for('probability_alive', summary_data)
+
+    assert engine.matrix_for('probability_alive', summary_data) is first
+    assert np.all((first[2] >= 0) & (first[2] <= 1))
+
+def test_headless_rendering(bgf, summary_data):
+    engine = MatrixEngine(bgf, bins=30)
+
+    assert engine.to_png('frequency_recency', summary_data).startswith(b'\x89PNG')
+    figure = engine.to_figure('probability_alive', summary_data)
+    assert figure['data'][0]['type'] == 'heatmap'
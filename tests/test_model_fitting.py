@@ -23,4 +23,19 @@ def test_fit_gamma_gamma_model(sample_summary_data):
     
     assert hasattr(model, 'conditional_expected_average_profit')
     assert hasattr(model, 'params_')
-    assert len(model.params_) == 3  # p, q, v
\ No newline at end of file
+    assert len(model.params_) == 3  # p, q, v
+
+def test_main_reuses_artifact_without_loading_data(sample_summary_data, monkeypatch):
+    from src import model_fitting
+    bgf = fit_bg_nbd_model(sample_summary_data)
+    ggf = fit_gamma_gamma_model(sample_summary_data)
+    artifact = type('Artifact', (), {'version': 'v1', 'bg_nbd_model': bgf, 'gamma_gamma_model': ggf})
+    monkeypatch.setattr(model_fitting, 'source_fingerprint', lambda path: 'source-fp')
+    monkeypatch.setattr(model_fitting, 'load_latest',
+                        lambda name, source_fingerprint=None, **kwargs: artifact if source_fingerprint == 'source-fp' else None)
+    monkeypatch.setattr(model_fitting, 'load_data', lambda path: pytest.fail("the source file was read"))
+
+    bg_nbd_model, gamma_gamma_model = model_fitting.main()
+
+    assert bg_nbd_model is artifact.bg_nbd_model
+    assert gamma_gamma_model is artifact.gamma_gamma_model
@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+import pytest
+from src.model_fitting import fit_bg_nbd_model, fit_gamma_gamma_model
+from src.model_registry import data_fingerprint, load_latest, save_artifact
+
+@pytest.fixture
+def sample_summary_data():
+    return pd.DataFrame({
+        'frequency': [1, 2, 3, 4, 5],
+        'recency': [10, 20, 30, 40, 50],
+        'T': [100, 100, 100, 100, 100],
+        'monetary': [100, 200, 300, 400, 500]
+    })
+
+def test_save_and_load_latest_artifact(sample_summary_data, tmp_path):
+    bgf = fit_bg_nbd_model(sample_summary_data)
+    ggf = fit_gamma_gamma_model(sample_summary_data)
+    results = sample_summary_data.assign(CLV=[1.0, 2.0, 3.0, 4.0, 5.0])
+    fingerprint = data_fingerprint(sample_summary_data)
+    version = save_artifact(bgf, ggf, results, fingerprint, registry_dir=str(tmp_path))
+
+    artifact = load_latest(registry_dir=str(tmp_path), data_fingerprint=fingerprint)
+
+    assert artifact.version == version
+    pd.testing.assert_frame_equal(artifact.results, results)
+    args = (sample_summary_data['frequency'], sample_summary_data['recency'], sample_summary_data['T'])
+    np.testing.assert_allclose(artifact.bg_nbd_model.predict(30, *args), bgf.predict(30, *args))
+    np.testing.assert_allclose(
+        artifact.gamma_gamma_model.conditional_expected_average_profit(
+            sample_summary_data['frequency'], sample_summary_data['monetary']),
+        ggf.conditional_expected_average_profit(sample_summary_data['frequency'], sample_summary_data['monetary'])
+    )
+
+def test_load_latest_requires_matching_fingerprint(sample_summary_data, tmp_path):
+    bgf = fit_bg_nbd_model(sample_summary_data)
+    ggf = fit_gamma_gamma_model(sample_summary_data)
+    save_artifact(bgf, ggf, sample_summary_data, data_fingerprint(sample_summary_data), registry_dir=str(tmp_path))
+
+    changed = sample_summary_data.assign(recency=[11, 20, 30, 40, 50])
+
+    assert data_fingerprint(changed) != data_fingerprint(sample_summary_data)
+    assert load_latest(registry_dir=str(tmp_path), data_fingerprint=data_fingerprint(changed)) is None
+    assert load_latest(name='other', registry_dir=str(tmp_path)) is None
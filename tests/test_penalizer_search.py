@@ -0,0 +1,33 @@
+import pytest
+from lifetimes.datasets import load_cdnow_summary_data_with_monetary_value
+from src.model_fitting import fit_bg_nbd_model, fit_gamma_gamma_model
+from src.penalizer_search import _nearest_converged, search_penalizer
+
+@pytest.fixture
+def summary_data():
+    summary = load_cdnow_summary_data_with_monetary_value()
+    return summary[summary['frequency'] > 0].rename(columns={'monetary_value': 'monetary'})
+
+def test_search_penalizer_picks_best_holdout(summary_data):
+    model = search_penalizer(summary_data, 'bg_nbd', [0.0, 0.01, 1.0], n_jobs=2)
+    search = model.penalizer_search_
+
+    assert search['converged'].all()
+    best = search.loc[search['holdout_nll'].idxmin(), 'penalizer_coef']
+    assert model.penalizer_coef == best
+    assert len(model.params_) == 4
+
+def test_fit_functions_search_mode(summary_data):
+    bgf = fit_bg_nbd_model(summary_data, max_attempts=2, search=True, n_jobs=2)
+    ggf = fit_gamma_gamma_model(summary_data, max_attempts=2, search=True, n_jobs=2)
+
+    assert list(bgf.penalizer_search_['penalizer_coef']) == [0.0, 0.001]
+    assert len(ggf.params_) == 3
+
+def test_nearest_converged_uses_log_distance():
+    converged = {0.0: 'zero', 0.01: 'small', 1.0: 'large'}
+    coefs = [0.0, 0.001, 0.01, 0.1, 1.0]
+
+    assert _nearest_converged(0.003, converged, coefs) == 'small'
+    assert _nearest_converged(0.0001, {0.0: 'zero', 1.0: 'large'}, coefs) == 'zero'
+    assert _nearest_converged(0.2, converged, coefs) == 'large'
@@ -0,0 +1,51 @@
+import pandas as pd
+import pytest
+from src.pipeline import Pipeline, Stage, build_stages, main, run
+from src.synthetic import write_transactions
+
+@pytest.fixture
+def data_path(tmp_path):
+    return write_transactions(str(tmp_path / 'transactions.csv'), 20_000, chunk_size=10_000)
+
+def test_changing_discount_rate_reruns_only_scoring(data_path, tmp_path):
+    cache_dir, output_dir = str(tmp_path / 'cache'), str(tmp_path / 'reports')
+    first = Pipeline(build_stages(data_path, frequency='days', output_dir=output_dir), cache_dir).run()
+    second = Pipeline(build_stages(data_path, frequency='days', discount_rate=0.05, output_dir=output_dir),
+                      cache_dir).run()
+
+    assert set(first.executed) == {'load', 'clean', 'summarize', 'fit_bg_nbd', 'fit_gamma_gamma', 'rfm', 'score',
+                                   'report'}
+    assert sorted(second.executed) == ['report', 'score']
+    assert first.outputs['report']['CLV'].notna().all()
+    assert (second.outputs['report']['CLV'] < first.outputs['report']['CLV']).all()
+    assert len(pd.read_csv(tmp_path / 'reports' / 'cltv_results.csv')) == len(second.outputs['report'])
+
+def test_cached_stages_are_not_loaded_unless_needed(tmp_path):
+    calls = []
+
+    def source():
+        calls.append('source')
+        return pd.DataFrame({'x': [1, 2, 3]})
+
+    def double(df, factor=2):
+        calls.append('double')
+        return df * factor
+
+    def stages(factor):
+        return [Stage('source', source), Stage('double', double, deps=['source'], params={'factor': factor}),
+                Stage('total', lambda df: {'total': int(df['x'].sum())}, deps=['double'], kind='json',
+                      cache=False)]
+
+    Pipeline(stages(2), str(tmp_path)).run()
+    run = Pipeline(stages(3), str(tmp_path)).run()
+
+    assert calls == ['source', 'double', 'double']
+    assert run.outputs['total'] == {'total': 18}
+    assert 'source' not in run.executed
+
+def test_main_exits_cleanly_and_run_returns_the_run(data_path, tmp_path):
+    argv = ['--data', data_path, '--frequency', 'days', '--cache-dir', str(tmp_path / 'cache'),
+            '--output-dir', str(tmp_path / 'reports')]
+
+    assert main(argv) == 0
+    assert run(argv).executed == ['report']
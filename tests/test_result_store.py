@@ -0,0 +1,73 @@
+import mmap
+
+import pandas as pd
+import pytest
+from src.result_store import ResultStore, current_version, open_snapshot, publish_results
+from src.serving import CLVService
+from src.table_query import ResultTable
+
+@pytest.fixture
+def results():
+    return pd.DataFrame({
+        'frequency': [3.0, 1.0, 2.0],
+        'CLV': [30.0, 10.0, 20.0],
+        'segment': ['UK', 'France', 'UK'],
+    }, index=pd.Index([12348, 12346, 12347], name='CustomerID'))
+
+def manifest(version):
+    return {
+        'version': version,
+        'models': {
+            'bg_nbd': {'class': 'BetaGeoFitter', 'penalizer_coef': 0.0,
+                       'params': {'r': 0.5, 'alpha': 10.0, 'a': 0.5, 'b': 2.0}},
+            'gamma_gamma': {'class': 'GammaGammaFitter', 'penalizer_coef': 0.0,
+                            'params': {'p': 6.0, 'q': 4.0, 'v': 15.0}},
+        },
+        'source_fingerprint': 'abc',
+    }
+
+def _mapping(values):
+    while getattr(values, 'base', None) is not None:
+        values = values.base
+    return values
+
+def test_published_results_are_memory_mapped(results, tmp_path):
+    publish_results(results, manifest('v1'), str(tmp_path))
+    snapshot = open_snapshot(current_version(str(tmp_path)), str(tmp_path))
+
+    pd.testing.assert_frame_equal(snapshot.results.astype({'segment': object}), results.sort_index())
+    assert isinstance(_mapping(snapshot.results['CLV'].to_numpy()), mmap.mmap)
+    assert snapshot.bg_nbd_model.params_['alpha'] == 10.0
+    assert list(snapshot.aggregates.top(2, 'segment', 'UK').index) == [12348, 12347]
+
+    service = CLVService(snapshot.results, snapshot.bg_nbd_model, snapshot.gamma_gamma_model, snapshot.version)
+    assert service.lookup('12348')['CLV'] == 30.0
+    assert service.lookup(99999) is None
+
+def test_table_and_service_use_mapped_orders_and_codes(results, tmp_path):
+    publish_results(results, manifest('v1'), str(tmp_path))
+    snapshot = open_snapshot('v1', str(tmp_path))
+    table = ResultTable(snapshot.results, orders=snapshot.orders)
+    service = CLVService(snapshot.results, snapshot.bg_nbd_model, snapshot.gamma_gamma_model, 'v1')
+
+    for values in [table._orders['CLV'][1], table._values['segment'], service._values['segment']]:
+        assert isinstance(_mapping(values), mmap.mmap)
+    reference = ResultTable(results.sort_index())
+    for sort_by, filter_query in [([{'column_id': 'CLV', 'direction': 'desc'}], '{segment} = UK'),
+                                  ([{'column_id': 'segment', 'direction': 'asc'}], '{CLV} >= 20')]:
+        assert table.page(0, 10, sort_by, filter_query) == reference.page(0, 10, sort_by, filter_query)
+    assert service.lookup(12346)['segment'] == 'France'
+
+def test_store_switches_to_new_version(results, tmp_path):
+    builds = []
+    store = ResultStore(str(tmp_path), check_interval=0, build=lambda snapshot: builds.append(snapshot.version))
+    publish_results(results, manifest('v1'), str(tmp_path), keep=1)
+    old = store.current()
+    store.current()
+    publish_results(results.assign(CLV=results['CLV'] * 2), manifest('v2'), str(tmp_path), keep=1)
+    new = store.current()
+
+    assert builds == ['v1', 'v2']
+    assert new.results.loc[12348, 'CLV'] == 60.0
+    # The pruned version stays readable by a process that still maps it
+    assert old.results.loc[12348, 'CLV'] == 30.0
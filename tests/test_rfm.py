@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+import pytest
+from src.model_fitting import fit_bg_nbd_model, fit_gamma_gamma_model
+from src.model_registry import load_latest, save_artifact
+from src.rfm import RFMScorer
+
+@pytest.fixture
+def summary_data():
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({
+        'frequency': rng.integers(2, 40, 500),
+        'recency': rng.integers(0, 365, 500),
+        'T': 365,
+        'monetary': np.log1p(rng.gamma(2.0, 50.0, 500)),
+    })
+
+def test_scores_match_qcut(summary_data):
+    scores = RFMScorer().fit_transform(summary_data)
+
+    expected_r = pd.qcut(summary_data['recency'], q=4, labels=[4, 3, 2, 1]).astype(int)
+    expected_m = pd.qcut(summary_data['monetary'], q=4, labels=[1, 2, 3, 4]).astype(int)
+    assert (scores['R_Score'] == expected_r).all()
+    assert (scores['M_Score'] == expected_m).all()
+    assert (scores['RFM_Score'] == scores[['R_Score', 'F_Score', 'M_Score']].sum(axis=1)).all()
+
+def test_single_customer_scored_like_batch(summary_data):
+    scorer = RFMScorer().fit(summary_data)
+    batch = scorer.transform(summary_data)
+    single = scorer.transform(summary_data.iloc[[7]])
+
+    pd.testing.assert_frame_equal(single, batch.iloc[[7]])
+    assert 'R_Score' not in summary_data
+
+def test_partial_fit_matches_fit(summary_data):
+    scorer = RFMScorer()
+    for start in range(0, len(summary_data), 100):
+        scorer.partial_fit(summary_data.iloc[start:start + 100])
+
+    assert scorer.edges_ == RFMScorer().fit(summary_data).edges_
+
+def test_edges_saved_with_artifact(summary_data, tmp_path):
+    bgf = fit_bg_nbd_model(summary_data)
+    ggf = fit_gamma_gamma_model(summary_data)
+    scorer = RFMScorer().fit(summary_data)
+    save_artifact(bgf, ggf, summary_data, 'fp', registry_dir=str(tmp_path), rfm_scorer=scorer)
+
+    restored = load_latest(registry_dir=str(tmp_path)).rfm_scorer
+
+    assert restored.edges_ == scorer.edges_
+    pd.testing.assert_frame_equal(restored.transform(summary_data), scorer.transform(summary_data))
@@ -0,0 +1,40 @@
+import numpy as np
+import pandas as pd
+import pytest
+from src.cltv_calculation import calculate_cltv_grid
+from src.data_preparation import clean_data, prepare_data_for_modeling
+from src.segmentation import fit_segmented_models, segment_labels
+from src.synthetic import generate_transactions
+
+@pytest.fixture(scope='module')
+def transactions():
+    return clean_data(generate_transactions(100_000, seed=1))
+
+def test_segment_labels():
+    df = pd.DataFrame({
+        'CustomerID': [1, 1, 1, 2],
+        'Country': ['France', 'Spain', 'France', 'EIRE'],
+        'InvoiceDate': pd.to_datetime(['2011-03-01', '2011-01-15', '2011-05-01', '2010-12-01']),
+    })
+
+    assert segment_labels(df, 'Country').to_dict() == {1: 'France', 2: 'EIRE'}
+    assert segment_labels(df, 'cohort').to_dict() == {1: '2011Q1', 2: '2010Q4'}
+
+def test_small_segments_fall_back_to_global_models(transactions):
+    summary = prepare_data_for_modeling(transactions, frequency='days')
+    labels = segment_labels(transactions, 'Country')
+    result = fit_segmented_models(summary, labels, min_customers=500, n_jobs=2)
+
+    segments = result.segments
+    global_bgf, global_ggf = result.global_models
+    assert segments['n_customers'].sum() == len(summary)
+    assert (segments.loc['United Kingdom', 'status']) == 'fitted'
+    small = segments[segments['n_customers'] < 500]
+    assert (small['status'] == 'too_small').all()
+    np.testing.assert_allclose(small[['r', 'alpha', 'a', 'b']], np.tile(global_bgf.params_, (len(small), 1)))
+
+    # CLV comes from each customer's own segment models
+    uk = result.clv['segment'] == 'United Kingdom'
+    expected = calculate_cltv_grid(*result.models('United Kingdom'), summary[uk], time_horizons=[12])
+    np.testing.assert_allclose(result.clv.loc[uk, 'CLV'], expected.iloc[:, 0])
+    assert result.clv['CLV'].notna().all()
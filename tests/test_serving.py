@@ -0,0 +1,95 @@
+import numpy as np
+import pandas as pd
+import pytest
+from flask import Flask
+from src.aggregate_index import AggregateIndex
+from src.cltv_calculation import calculate_cltv_grid
+from src.model_fitting import fit_bg_nbd_model, fit_gamma_gamma_model
+from src.rfm import RFMScorer
+from src.serving import MAX_SCORE_ROWS, CLVService, register_routes
+
+@pytest.fixture
+def sample_summary_data():
+    return pd.DataFrame({
+        'frequency': [1, 2, 3, 4, 5],
+        'recency': [10, 20, 30, 40, 50],
+        'T': [100, 100, 100, 100, 100],
+        'monetary': [100, 200, 300, 400, 500]
+    }, index=pd.Index([12346, 12347, 12348, 12349, 12350], name='CustomerID'))
+
+@pytest.fixture
+def client(sample_summary_data):
+    bgf = fit_bg_nbd_model(sample_summary_data)
+    ggf = fit_gamma_gamma_model(sample_summary_data)
+    clv = calculate_cltv_grid(bgf, ggf, sample_summary_data, [12], [0.01]).iloc[:, 0]
+    service = CLVService(sample_summary_data.assign(CLV=clv), bgf, ggf, 'v1')
+    server = Flask(__name__)
+    register_routes(server, lambda: service)
+    return server.test_client()
+
+def test_lookup_endpoint(client):
+    response = client.get('/api/clv/customers/12348')
+    body = response.get_json()
+
+    assert response.status_code == 200
+    assert body['model_version'] == 'v1'
+    assert body['customer']['CustomerID'] == 12348
+    assert body['customer']['frequency'] == 3
+    assert client.get('/api/clv/customers/99999').status_code == 404
+
+def test_score_endpoint_matches_table(client, sample_summary_data):
+    rows = sample_summary_data.reset_index(drop=True).to_dict('records')
+    response = client.post('/api/clv/score', json={'customers': rows})
+    expected = [client.get(f'/api/clv/customers/{i}').get_json()['customer']['CLV'] for i in sample_summary_data.index]
+
+    assert response.status_code == 200
+    np.testing.assert_allclose(response.get_json()['CLV'], expected)
+    assert client.post('/api/clv/score', json={'customers': [{'frequency': 1}]}).status_code == 400
+
+def test_score_endpoint_rejects_invalid_terms(client, sample_summary_data):
+    rows = sample_summary_data.reset_index(drop=True).to_dict('records')
+    for terms in [{'time_horizon': 0}, {'time_horizon': -3}, {'time_horizon': 1.5}, {'time_horizon': '12'},
+                  {'time_horizon': float('inf')}, {'time_horizon': 10 ** 9},
+                  {'discount_rate': -0.1}, {'discount_rate': float('inf')}]:
+        assert client.post('/api/clv/score', json={'customers': rows, **terms}).status_code == 400
+    oversized = rows * (MAX_SCORE_ROWS // len(rows) + 1)
+    assert client.post('/api/clv/score', json={'customers': oversized}).status_code == 400
+    assert client.post('/api/clv/score', json={'customers': rows, 'time_horizon': 1}).status_code == 200
+
+def test_latency_endpoint(client):
+    for _ in range(5):
+        client.get('/api/clv/customers/12346')
+    latency = client.get('/api/clv/latency').get_json()
+
+    assert latency['lookup']['count'] == 5
+    assert latency['lookup']['p99_ms'] >= latency['lookup']['p50_ms']
+
+def test_score_endpoint_includes_rfm(sample_summary_data):
+    bgf = fit_bg_nbd_model(sample_summary_data)
+    ggf = fit_gamma_gamma_model(sample_summary_data)
+    scorer = RFMScorer().fit(sample_summary_data)
+    service = CLVService(sample_summary_data.assign(CLV=0.0), bgf, ggf, 'v1', rfm_scorer=scorer)
+    server = Flask(__name__)
+    register_routes(server, lambda: service)
+
+    rows = sample_summary_data.reset_index(drop=True).to_dict('records')
+    body = server.test_client().post('/api/clv/score', json=rows).get_json()
+
+    assert body['RFM'] == scorer.transform(sample_summary_data).to_dict('records')
+
+def test_top_and_distribution_endpoints(sample_summary_data):
+    results = sample_summary_data.assign(CLV=[5.0, 1.0, 4.0, 2.0, 3.0], Country=['UK', 'FR', 'UK', 'FR', 'UK'])
+    service = CLVService(results, None, None, 'v1', aggregates=AggregateIndex.build(results))
+    server = Flask(__name__)
+    register_routes(server, lambda: service)
+    client = server.test_client()
+
+    top = client.get('/api/clv/top?n=2&column=Country&value=UK').get_json()['customers']
+    assert [row['CustomerID'] for row in top] == [12346, 12348]
+    assert client.get('/api/clv/distribution?clv=3').get_json()['percentile'] == 0.6
+    segments = client.get('/api/clv/segments/Country').get_json()['segments']
+    assert {row['Country']: row['total_CLV'] for row in segments} == {'FR': 3.0, 'UK': 12.0}
+    assert client.get('/api/clv/segments/Region').status_code == 404
+    assert client.get('/api/clv/top?n=-1').status_code == 400
+    assert client.get('/api/clv/top?n=-1&column=Country&value=UK').status_code == 400
+    assert client.get('/api/clv/distribution?clv=nan').status_code == 400
@@ -0,0 +1,34 @@
+import numpy as np
+import pandas as pd
+import pytest
+from src.data_preparation import clean_data, prepare_data_for_modeling
+from src.streaming import csv_chunk_source, streaming_prepare_data_for_modeling
+
+@pytest.fixture
+def transactions():
+    rng = np.random.default_rng(0)
+    n = 5000
+    return pd.DataFrame({
+        'InvoiceNo': rng.integers(0, 2000, n).astype(str),
+        'InvoiceDate': pd.Timestamp('2021-01-01') + pd.to_timedelta(rng.integers(0, 365 * 24, n), unit='h'),
+        'CustomerID': np.where(rng.random(n) < 0.05, np.nan, rng.integers(1, 300, n)),
+        'Quantity': rng.integers(-5, 60, n),
+        'UnitPrice': np.round(rng.lognormal(1, 1, n), 2)
+    })
+
+def test_streaming_matches_in_memory_summary(transactions):
+    expected = prepare_data_for_modeling(clean_data(transactions.copy()))
+    chunks = [transactions.iloc[i:i + 700] for i in range(0, len(transactions), 700)]
+    summary = streaming_prepare_data_for_modeling(lambda: iter(chunks))
+
+    pd.testing.assert_index_equal(summary.index, expected.index)
+    pd.testing.assert_frame_equal(summary, expected[summary.columns], check_exact=False)
+
+def test_streaming_from_csv_chunks(transactions, tmp_path):
+    path = tmp_path / 'transactions.csv'
+    transactions.to_csv(path, index=False)
+    expected = prepare_data_for_modeling(clean_data(transactions.copy()))
+    summary = streaming_prepare_data_for_modeling(csv_chunk_source(str(path), chunksize=1000))
+
+    assert len(summary) == len(expected)
+    assert np.allclose(summary['monetary'], expected['monetary'])
@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+import pytest
+from src.data_preparation import clean_data, prepare_data_for_modeling
+from src.summary_store import CustomerSummaryStore, update_summary
+
+@pytest.fixture
+def transactions():
+    rng = np.random.default_rng(1)
+    n = 3000
+    return pd.DataFrame({
+        'InvoiceNo': rng.integers(0, 1000, n).astype(str),
+        'InvoiceDate': pd.Timestamp('2021-01-01') + pd.to_timedelta(np.sort(rng.integers(0, 100 * 24, n)), unit='h'),
+        'CustomerID': rng.integers(1, 200, n).astype(float),
+        'Quantity': rng.integers(1, 12, n),
+        'UnitPrice': rng.choice([1.25, 2.5, 3.75, 5.0], n)
+    })
+
+def test_update_summary_matches_full_rebuild(transactions, tmp_path):
+    history = transactions[transactions['InvoiceDate'] < '2021-04-10']
+    new_day = transactions[transactions['InvoiceDate'] >= '2021-04-10']
+    CustomerSummaryStore.from_dataframe(history).save(str(tmp_path))
+
+    summary = update_summary(new_day, store_dir=str(tmp_path),
+                             rebuild_source=lambda: iter([transactions]))
+    expected = prepare_data_for_modeling(clean_data(transactions.copy()))
+
+    pd.testing.assert_frame_equal(summary, expected[summary.columns], check_exact=False)
+    reloaded = CustomerSummaryStore.load(str(tmp_path)).summary()
+    pd.testing.assert_frame_equal(reloaded, summary)
+
+def test_update_summary_rebuilds_when_history_is_refiltered(transactions):
+    store = CustomerSummaryStore.from_dataframe(transactions)
+    # Enough single-unit rows to collapse the Quantity IQR and drop most of the history
+    new_rows = pd.concat([transactions] * 3).assign(Quantity=1, InvoiceDate=pd.Timestamp('2021-05-01'))
+    combined = pd.concat([transactions, new_rows])
+
+    with pytest.raises(ValueError):
+        store.update_summary(new_rows)
+    summary = store.update_summary(new_rows, rebuild_source=lambda: iter([combined]))
+
+    expected = prepare_data_for_modeling(clean_data(combined.copy()))
+    pd.testing.assert_frame_equal(summary, expected[summary.columns], check_exact=False)
+
+def test_save_replaces_the_store(transactions, tmp_path):
+    store_dir = str(tmp_path / 'store')
+    CustomerSummaryStore.from_dataframe(transactions.iloc[:1000]).save(store_dir)
+    store = CustomerSummaryStore.from_dataframe(transactions)
+    store.save(store_dir)
+
+    pd.testing.assert_frame_equal(CustomerSummaryStore.load(store_dir).summary(), store.summary())
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['store']
@@ -0,0 +1,33 @@
+import pandas as pd
+from src.streaming import parquet_chunk_source
+from src.synthetic import TRANSACTION_COLUMNS, generate_transactions, iter_transactions, write_transactions
+
+def test_generate_transactions_is_deterministic():
+    df = generate_transactions(5000, seed=1, chunk_size=1000)
+
+    assert list(df.columns) == TRANSACTION_COLUMNS
+    assert len(df) == 5000
+    pd.testing.assert_frame_equal(df, generate_transactions(5000, seed=1, chunk_size=1000))
+    assert not df.equals(generate_transactions(5000, seed=2, chunk_size=1000))
+
+def test_transactions_look_like_online_retail():
+    df = generate_transactions(5000, chunk_size=1000)
+    cancelled = df['InvoiceNo'].str.startswith('C')
+
+    assert (df.loc[cancelled, 'Quantity'] < 0).all()
+    assert (df.loc[~cancelled, 'Quantity'] > 0).all()
+    assert df['CustomerID'].isna().any()
+    assert df['InvoiceDate'].between('2010-12-01', '2011-12-09').all()
+
+def test_chunks_are_bounded():
+    sizes = [len(chunk) for chunk in iter_transactions(5000, chunk_size=1000)]
+
+    assert sum(sizes) == 5000
+    assert len(sizes) > 1
+
+def test_write_parquet_row_groups(tmp_path):
+    path = write_transactions(str(tmp_path / 'transactions.parquet'), 3000, chunk_size=1000)
+    chunks = list(parquet_chunk_source(path)())
+
+    assert len(chunks) > 1
+    assert sum(len(chunk) for chunk in chunks) == 3000
@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+import pytest
+from src.table_query import ResultTable, parse_filter_query
+
+@pytest.fixture
+def result_df():
+    return pd.DataFrame({
+        'frequency': [2.0, 5.0, 1.0, 5.0, 3.0],
+        'recency': [10.0, 50.0, np.nan, 40.0, 30.0],
+        'CLV': [120.5, 80.0, 15.25, 300.0, 80.0]
+    }, index=pd.Index([101, 102, 103, 104, 105], name='CustomerID'))
+
+def test_parse_filter_query():
+    filters = parse_filter_query('{CLV} s> 100 && {Country} contains "United K" && {recency} <= 30')
+
+    assert filters == [('CLV', 'gt', 100.0), ('Country', 'contains', 'United K'), ('recency', 'le', 30.0)]
+
+def test_page_matches_pandas(result_df):
+    table = ResultTable(result_df)
+    records, page_count = table.page(0, 2, [{'column_id': 'CLV', 'direction': 'desc'}], '{frequency} >= 2')
+
+    expected = result_df.reset_index()
+    expected = expected[expected['frequency'] >= 2].sort_values('CLV', ascending=False, kind='stable')
+    assert records == expected.head(2).to_dict('records')
+    assert page_count == 2
+
+def test_range_filters_skip_missing_values(result_df):
+    table = ResultTable(result_df)
+    records, _ = table.page(0, 10, [{'column_id': 'recency', 'direction': 'asc'}], '{recency} >= 0')
+
+    assert [r['CustomerID'] for r in records] == [101, 105, 104, 102]
+
+def test_multi_column_sort(result_df):
+    table = ResultTable(result_df)
+    sort_by = [{'column_id': 'CLV', 'direction': 'asc'}, {'column_id': 'frequency', 'direction': 'desc'}]
+    records, _ = table.page(0, 10, sort_by)
+
+    assert [r['CustomerID'] for r in records] == [103, 102, 105, 101, 104]
+
+def test_range_filters_match_pandas():
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({'CLV': rng.integers(0, 20, 500).astype(float)}, index=pd.Index(range(500), name='CustomerID'))
+    df.loc[::7, 'CLV'] = np.nan
+    table = ResultTable(df)
+    operators = {'=': 'eq', '>=': 'ge', '>': 'gt', '<=': 'le', '<': 'lt'}
+
+    for symbol, operator in operators.items():
+        for value in [-1, 0, 7, 7.5, 19, 25]:
+            records, _ = table.page(0, 1000, [], f'{{CLV}} {symbol} {value}')
+            expected = df.index[getattr(df['CLV'], operator)(value)]
+            assert [r['CustomerID'] for r in records] == list(expected), (symbol, value)